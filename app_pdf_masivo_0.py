@@ -1,90 +1,140 @@
 # app_streamlit.py
 import streamlit as st
-import pandas as pd
+import atexit
 import os
-import glob
-import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from PyPDF2 import PdfReader, PdfWriter
-import fitz  # PyMuPDF
+import json
+from functools import partial
 import tempfile
+import time
+import uuid
 import zipfile
-from pathlib import Path
+from itertools import islice
+
+from pdf_masivo import (
+    POSICIONES_POR_DEFECTO,
+    Plantilla,
+    SelloPreparado,
+    cargar_plantilla,
+    cargar_tabla,
+    construir_datos,
+    cruzar_nombres,
+    datos_cruzados,
+    filtrar_trabajos,
+    generar_vista_previa,
+    iterar_lote,
+    iterar_lote_reanudable,
+    leer_datos_por_bloques,
+    leer_encabezado,
+    mapear_columnas,
+    medidas_primera_pagina,
+    origen_desde_subida,
+    perfiles_disponibles,
+    plantilla_desde_posiciones,
+    trabajos_desde_ruta,
+    trabajos_desde_subidas,
+)
+from pdf_masivo.diferido import importar_diferido
+from pdf_masivo.entrada import base_de_fuente
+from pdf_masivo.indice import DIRECTORIO_CACHE, huella_archivo, obtener_indice
+from pdf_masivo.metricas import exportar_metricas, resumir_metricas
+from pdf_masivo.plantilla import ANCLAS, CAMPOS_BASE, FUENTES, ROTACIONES
+from pdf_masivo.salida import escribir_en_zip, escribir_portadas
+from pdf_masivo.tareas import CANCELADA, EN_COLA, EN_CURSO, FALLIDA, TERMINADA, GestorTareas
+
+# Se importa al usarlo por primera vez: la primera pantalla no lo necesita
+pd = importar_diferido('pandas')
+
+# Dónde buscar Arial, en orden
+RUTAS_ARIAL = [
+    'arial.ttf',
+    'Arial.ttf',
+    '/usr/share/fonts/truetype/msttcorefonts/Arial.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+    '/Library/Fonts/Arial.ttf'
+]
+
+
+@st.cache_resource
+def registrar_fuente():
+    """Busca y registra Arial en reportlab una sola vez por proceso; devuelve la fuente a usar"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFError, TTFont
+    
+    for ruta in RUTAS_ARIAL:
+        # Solo se lee y analiza el TTF de las rutas que existen
+        if not os.path.isfile(ruta):
+            continue
+        try:
+            pdfmetrics.registerFont(TTFont('Arial', ruta))
+            return "Arial"
+        except (OSError, TTFError):
+            continue
+    return "Helvetica"
 
 class PDFEditorStreamlit:
     def __init__(self):
         self.datos = {}
         self.orientacion = "vertical"
-        self.fuente = "Helvetica"
-        self.configurar_fuente()
+        self.plantilla = None
+        self.segundos_datos = None
+        self._fuente = None
+    
+    @property
+    def fuente(self):
+        """Fuente disponible; se configura la primera vez que se pide"""
+        if self._fuente is None:
+            self.configurar_fuente()
+        return self._fuente
     
     def configurar_fuente(self):
-        """Configura la fuente Arial si está disponible"""
+        """Configura la fuente Arial si está disponible (la búsqueda se hace una vez por proceso)"""
+        self._fuente = registrar_fuente()
+        return True
+
+    def leer_datos_excel(self, uploaded_file, por_bloques=True, campos=None):
+        """Lee los datos del archivo Excel, CSV o Parquet subido
+        
+        Con por_bloques=True solo se leen las columnas mapeadas, en bloques de
+        filas, para que la memoria no dependa del ancho del libro. El resultado
+        se guarda como índice compacto en la caché: si el mismo archivo ya fue
+        procesado (en esta u otra sesión) no se vuelve a leer. campos son las
+        columnas adicionales para las plantillas de sello (campo -> encabezado).
+        """
         try:
-            font_paths = [
-                'arial.ttf',
-                'Arial.ttf',
-                '/usr/share/fonts/truetype/msttcorefonts/Arial.ttf',
-                'C:/Windows/Fonts/arial.ttf',
-                '/Library/Fonts/Arial.ttf'
-            ]
+            if por_bloques:
+                lector = partial(leer_datos_por_bloques, campos=campos)
+            else:
+                lector = partial(self._leer_tabla_completa, campos=campos)
+            # Cada lector (y cada juego de columnas adicionales) tiene su propio índice en la caché
+            variante = json.dumps({'por_bloques': por_bloques, 'campos': campos}, sort_keys=True)
+            inicio = time.perf_counter()
+            indice, desde_cache = obtener_indice(uploaded_file, lector, variante=variante)
+            self.segundos_datos = time.perf_counter() - inicio
             
-            for font_path in font_paths:
-                try:
-                    pdfmetrics.registerFont(TTFont('Arial', font_path))
-                    self.fuente = "Arial"
-                    return True
-                except:
-                    continue
+            columnas = indice.info['columnas']
+            columnas_mapeadas = indice.info['columnas_mapeadas']
+            total_filas = indice.info['filas']
+            datos = indice
             
-            self.fuente = "Helvetica"
-            return True
-            
-        except Exception as e:
-            st.warning(f"No se pudo cargar Arial: {e}")
-            self.fuente = "Helvetica"
-            return True
-
-    def leer_datos_excel(self, uploaded_file):
-        """Lee los datos del archivo Excel subido"""
-        try:
-            # Leer el archivo Excel
-            df = pd.read_excel(uploaded_file)
+            if desde_cache:
+                st.info("⚡ Archivo ya procesado anteriormente: datos cargados desde la caché")
             
             # Mostrar información del archivo
             st.success(f"✅ Archivo Excel cargado correctamente")
             st.info(f"**Información del archivo:**")
-            st.info(f"- Total de filas: {len(df)}")
-            st.info(f"- Total de columnas: {len(df.columns)}")
-            st.info(f"- Columnas encontradas: {list(df.columns)}")
-            
-            # CORRECCIÓN: Buscar columnas mejorado (incluye acentos y mayúsculas)
-            columnas_mapeadas = self._mapear_columnas(df)
+            st.info(f"- Total de filas: {total_filas}")
+            st.info(f"- Total de columnas: {len(columnas)}")
+            st.info(f"- Tiempo de lectura: {self.segundos_datos:.2f} s")
+            st.info(f"- Columnas encontradas: {columnas}")
             
             # Mostrar mapeo de columnas
             st.info("**Mapeo de columnas detectado:**")
             for campo, idx in columnas_mapeadas.items():
                 if idx is not None:
-                    st.info(f"- {campo.upper()}: Columna '{df.columns[idx]}' (índice {idx})")
-            
-            # Procesar datos
-            datos = {}
-            registros_procesados = 0
-            
-            for index, row in df.iterrows():
-                codigo = self._obtener_valor(row, columnas_mapeadas['codigo'])
-                sistema = self._obtener_valor(row, columnas_mapeadas['sistema'])
-                subsistema = self._obtener_valor(row, columnas_mapeadas['subsistema'])
-                
-                if codigo and codigo != 'nan':
-                    datos[str(codigo).strip()] = {
-                        'sistema': sistema,
-                        'subsistema': subsistema
-                    }
-                    registros_procesados += 1
+                    st.info(f"- {campo.upper()}: Columna '{columnas[idx]}' (índice {idx})")
+            faltantes = [campos[campo] for campo in campos or {} if columnas_mapeadas.get(campo) is None]
+            if faltantes:
+                st.warning(f"⚠ No se encontraron las columnas: {', '.join(faltantes)}")
             
             self.datos = datos
             
@@ -98,9 +148,10 @@ class PDFEditorStreamlit:
                     {
                         'Código': codigo,
                         'Sistema': info['sistema'],
-                        'Subsistema': info['subsistema']
+                        'Subsistema': info['subsistema'],
+                        **{campo: valor for campo, valor in info.items() if campo not in CAMPOS_BASE}
                     }
-                    for codigo, info in list(self.datos.items())[:20]  # Mostrar primeros 20
+                    for codigo, info in islice(self.datos.items(), 20)  # Mostrar primeros 20
                 ])
                 
                 st.dataframe(mostrar_df, use_container_width=True)
@@ -114,211 +165,549 @@ class PDFEditorStreamlit:
             st.error(f"❌ Error al leer el archivo Excel: {str(e)}")
             return False
 
-    def _mapear_columnas(self, df):
-        """Mapea automáticamente las columnas del Excel - VERSIÓN MEJORADA"""
-        columnas_mapeadas = {'codigo': None, 'sistema': None, 'subsistema': None}
-        
-        # Listas más completas incluyendo acentos
-        nombres_codigo = ['código', 'codigo', 'code', 'id', 'número', 'numero', 'n°', 'no']
-        nombres_sistema = ['sistema', 'system', 'sist']
-        nombres_subsistema = ['subsistema', 'sub-sistema', 'subsystem', 'subsist']
-        
-        for idx, col_name in enumerate(df.columns):
-            col_name_str = str(col_name)
-            col_name_clean = col_name_str.lower().strip()
-            
-            # Eliminar espacios extra y caracteres especiales
-            col_name_clean = col_name_clean.replace('_', ' ').replace('-', ' ').replace('.', ' ')
-            
-            # Buscar coincidencias
-            if any(nombre in col_name_clean for nombre in nombres_codigo):
-                if columnas_mapeadas['codigo'] is None:  # Solo asignar si no está asignado
-                    columnas_mapeadas['codigo'] = idx
-            elif any(nombre in col_name_clean for nombre in nombres_sistema):
-                if columnas_mapeadas['sistema'] is None:
-                    columnas_mapeadas['sistema'] = idx
-            elif any(nombre in col_name_clean for nombre in nombres_subsistema):
-                if columnas_mapeadas['subsistema'] is None:
-                    columnas_mapeadas['subsistema'] = idx
-        
-        # Si no se encontraron algunas columnas, usar las primeras disponibles
-        if columnas_mapeadas['codigo'] is None and len(df.columns) >= 1:
-            columnas_mapeadas['codigo'] = 0
-        if columnas_mapeadas['sistema'] is None and len(df.columns) >= 2:
-            columnas_mapeadas['sistema'] = 1
-        if columnas_mapeadas['subsistema'] is None and len(df.columns) >= 3:
-            columnas_mapeadas['subsistema'] = 2
-            
-        return columnas_mapeadas
-
-    def _obtener_valor(self, row, idx):
-        """Obtiene y limpia un valor de la fila"""
-        if idx is not None and idx < len(row):
-            valor = row.iloc[idx]
-            if pd.notna(valor):
-                return str(valor).strip()
-        return ""
-
-    def generar_pdf_coordenadas(self, pdf_file):
-        """Genera un PDF con cuadrícula de coordenadas para referencia"""
+    def _leer_tabla_completa(self, uploaded_file, campos=None):
+        """Lee la tabla completa con pandas y devuelve (datos, info)"""
+        df = cargar_tabla(uploaded_file)
+        # CORRECCIÓN: Buscar columnas mejorado (incluye acentos y mayúsculas)
+        columnas_mapeadas = mapear_columnas(df.columns, campos)
+        info = {
+            'columnas': list(df.columns),
+            'columnas_mapeadas': columnas_mapeadas,
+            'filas': len(df)
+        }
+        return construir_datos(df, columnas_mapeadas), info
+
+    def campos_cargados(self):
+        """Campos de cada registro de la tabla cargada (sistema, subsistema y adicionales)"""
+        if hasattr(self.datos, 'campos'):
+            return self.datos.campos
+        return list(next(iter(self.datos.values()), None) or ('sistema', 'subsistema'))
+
+    def medidas_pagina(self, pdf_file):
+        """(ancho, alto, rotación) de la primera página de un PDF subido o de una ruta"""
+        origen = origen_desde_subida(pdf_file) if hasattr(pdf_file, 'getbuffer') else pdf_file
+        return medidas_primera_pagina(origen)
+
+    def generar_pdf_coordenadas(self, pdf_file, posiciones=None, formato="pdf", plantilla=None):
+        """Genera la primera página con cuadrícula de coordenadas para referencia (bytes PDF o PNG)
+
+        PNG y PDF se dibujan juntos y quedan en caché por archivo, posiciones
+        y plantilla: la imagen y la descarga de un mismo rerun cuestan una
+        sola vista previa.
+        """
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                temp_path = tmp.name
-            
-            doc = fitz.open(pdf_file)
-            packet = io.BytesIO()
-            can = canvas.Canvas(packet, pagesize=letter)
-            can.setFont("Helvetica", 6)
-            
-            # Dibujar cuadrícula
-            for x in range(50, 600, 50):
-                for y in range(50, 750, 50):
-                    can.drawString(x, y, f"({x},{y})")
-            
-            # Marcadores de referencia
-            can.setFillColorRGB(1, 0, 0)
-            puntos = [(100, 500), (200, 500), (300, 500), (400, 500)]
-            for x, y in puntos:
-                can.circle(x, y, 3, fill=1)
-                can.setFillColorRGB(0, 0, 0)
-                can.drawString(x + 5, y, f"REF({x},{y})")
-                can.setFillColorRGB(1, 0, 0)
-            
-            can.save()
-            packet.seek(0)
-            
-            # Fusionar con PDF original
-            nuevo_pdf = PdfReader(packet)
-            pdf_existente = PdfReader(open(pdf_file, "rb"))
-            output = PdfWriter()
-            
-            for pagina in pdf_existente.pages:
-                pagina.merge_page(nuevo_pdf.pages[0])
-                output.add_page(pagina)
-            
-            with open(temp_path, "wb") as f:
-                output.write(f)
-            
-            doc.close()
-            
-            return temp_path
+            # Ruta o archivo subido: el subido se abre desde su buffer, sin copiarlo
+            if hasattr(pdf_file, 'getbuffer'):
+                origen = origen_desde_subida(pdf_file)
+                clave = getattr(pdf_file, 'file_id', None) or huella_archivo(pdf_file)
+            else:
+                origen, clave = pdf_file, (pdf_file, os.path.getmtime(pdf_file))
+            png, pdf = vista_previa_en_cache(
+                clave, origen, posiciones, self.orientacion,
+                plantilla.huella() if plantilla is not None else None, plantilla
+            )
+            return pdf if formato == "pdf" else png
             
         except Exception as e:
             st.error(f"Error generando PDF con coordenadas: {e}")
             return None
 
-    def editar_pdf(self, archivo_pdf_entrada, archivo_pdf_salida, posiciones):
-        """Edita SOLO la primera página del PDF con los datos correspondientes"""
-        try:
-            codigo_pdf = os.path.splitext(os.path.basename(archivo_pdf_entrada))[0]
-            
-            if codigo_pdf not in self.datos:
-                st.warning(f"No hay datos para: {codigo_pdf}")
-                return False
-            
-            sistema = self.datos[codigo_pdf]['sistema']
-            subsistema = self.datos[codigo_pdf]['subsistema']
-            
-            # Usar PyMuPDF para edición
-            doc = fitz.open(archivo_pdf_entrada)
-            
-            # SOLO EDITAR LA PRIMERA PÁGINA
-            if len(doc) > 0:
-                primera_pagina = doc[0]
-                
-                if self.orientacion == "vertical":
-                    # Texto vertical (90° derecha)
-                    if sistema:
-                        primera_pagina.insert_text(
-                            (posiciones[0]['x'], posiciones[0]['y']),
-                            sistema, fontsize=8, fontname="helv",
-                            color=(0, 0, 0), rotate=90
-                        )
-                    
-                    if subsistema:
-                        primera_pagina.insert_text(
-                            (posiciones[1]['x'], posiciones[1]['y']),
-                            subsistema, fontsize=8, fontname="helv",
-                            color=(0, 0, 0), rotate=90
-                        )
-                    
-                    primera_pagina.insert_text(
-                        (posiciones[2]['x'], posiciones[2]['y']),
-                        codigo_pdf, fontsize=8, fontname="helv",
-                        color=(0, 0, 0), rotate=90
-                    )
-                    
-                else:
-                    # Texto horizontal
-                    if sistema:
-                        primera_pagina.insert_text(
-                            (posiciones[0]['x'], posiciones[0]['y']),
-                            sistema, fontsize=8, fontname="helv",
-                            color=(0, 0, 0), rotate=0
-                        )
-                    
-                    if subsistema:
-                        primera_pagina.insert_text(
-                            (posiciones[1]['x'], posiciones[1]['y']),
-                            subsistema, fontsize=8, fontname="helv",
-                            color=(0, 0, 0), rotate=0
-                        )
-                    
-                    primera_pagina.insert_text(
-                        (posiciones[2]['x'], posiciones[2]['y']),
-                        codigo_pdf, fontsize=8, fontname="helv",
-                        color=(0, 0, 0), rotate=0
-                    )
+    def crear_lote(self, pdf_files, posiciones, archivo_zip=None, comprimir=False,
+                   guardado='completo', directorio_trabajo=None, cruce=None,
+                   perfil_salida='rapido', nivel_zip=None, portada=False, archivo_portadas=None,
+                   indice_portadas=False):
+        """Prepara el lote y devuelve crear(max_workers) -> iterador de resultados
+        
+        Los datos y la orientación se toman en este momento: cambiarlos en la
+        interfaz después de enviar el lote no lo afecta. Si se indica
+        archivo_zip, cada PDF estampado se escribe directo en ese ZIP al
+        terminar, sin archivos temporales por PDF. Con guardado='incremental'
+        solo se agrega el cambio de la primera página al PDF original en lugar
+        de reescribirlo completo. Con directorio_trabajo el lote es
+        reanudable: los PDFs se estampan en ese directorio y se omiten los que
+        ya están terminados con los mismos datos y posiciones. Con el cruce
+        previo de nombres (cruzar_archivos) solo se procesan los PDFs que
+        coincidieron con la tabla. Si hay una plantilla guardada se estampan
+        sus campos en lugar de los tres textos en las posiciones.
+        perfil_salida elige cómo se guarda cada PDF (ver PERFILES_SALIDA) y
+        nivel_zip el nivel de deflate del ZIP cuando se comprime. Con
+        portada=True se guarda solo la primera página de cada PDF; con
+        archivo_portadas, las primeras páginas se unen además en ese PDF
+        (con un índice al principio si indice_portadas=True).
+        """
+        datos = self.datos
+        orientacion = self.orientacion
+        pdf_files = list(pdf_files)
+        if cruce is not None:
+            pdf_files = [f for f in pdf_files if f.name in cruce['coincidencias']]
+            datos = datos_cruzados(cruce, datos)
+        sello = self.crear_sello(posiciones, orientacion)
+        
+        def crear(max_workers=None):
+            if len(pdf_files) == 1:
+                max_workers = 1
+            # Los PDFs se abren directo desde el buffer de la subida, sin copiarlos
+            trabajos = trabajos_desde_subidas(pdf_files)
+            if directorio_trabajo:
+                lote = iterar_lote_reanudable(
+                    trabajos, datos, posiciones, orientacion, directorio_trabajo,
+                    max_workers, sello=sello, guardado=guardado, perfil_salida=perfil_salida,
+                    portada=portada
+                )
             else:
-                st.error(f"El PDF {archivo_pdf_entrada} no tiene páginas")
-                doc.close()
-                return False
-            
-            doc.save(archivo_pdf_salida)
-            doc.close()
-            
-            return True
-            
-        except Exception as e:
-            st.error(f"Error editando PDF: {e}")
-            return False
+                lote = iterar_lote(
+                    trabajos, datos, posiciones, orientacion, max_workers,
+                    en_memoria=archivo_zip is not None, sello=sello, guardado=guardado,
+                    perfil_salida=perfil_salida, portada=portada
+                )
+            if archivo_portadas is not None:
+                lote = escribir_portadas(lote, archivo_portadas, indice_portadas, perfil_salida)
+            if archivo_zip is not None:
+                lote = escribir_en_zip(lote, archivo_zip, comprimir=comprimir, nivel=nivel_zip)
+            return lote
+        
+        return crear
+
+    def crear_sello(self, posiciones, orientacion):
+        """SelloPreparado con la plantilla guardada o, si no hay, con las posiciones"""
+        return SelloPreparado(posiciones, orientacion, plantilla=self.plantilla)
 
-    def procesar_lote(self, pdf_files, posiciones, progress_bar, status_text):
-        """Procesa un lote de archivos PDF"""
-        resultados = []
+    def enviar_lote(self, gestor, pdf_files, posiciones, propietario=None, comprimir=False,
+                    guardado='completo', directorio_trabajo=None, cruce=None,
+                    perfil_salida='rapido', nivel_zip=None, en_disco=False, portada=False,
+                    unir_portadas=False, indice_portadas=False):
+        """Envía el lote al gestor de tareas en segundo plano y devuelve la Tarea
         
-        for i, pdf_file in enumerate(pdf_files):
-            try:
-                # Actualizar progreso
-                progress_bar.progress((i + 1) / len(pdf_files))
-                status_text.text(f"Procesando {i+1}/{len(pdf_files)}: {pdf_file.name}")
-                
-                # Crear archivo temporal de salida
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                    temp_output = tmp.name
-                
-                # Editar PDF
-                if self.editar_pdf(pdf_file, temp_output, posiciones):
-                    resultados.append({
-                        'nombre': pdf_file.name,
-                        'ruta': temp_output,
-                        'estado': '✅ Completado'
-                    })
-                else:
-                    resultados.append({
-                        'nombre': pdf_file.name,
-                        'ruta': None,
-                        'estado': '❌ Error'
-                    })
-                    
-            except Exception as e:
-                resultados.append({
-                    'nombre': pdf_file.name,
-                    'ruta': None,
-                    'estado': f'❌ Error: {str(e)}'
-                })
+        El ZIP de salida queda en un archivo temporal que el gestor borra al
+        olvidar la tarea. El cruce, si se pasa, queda en tarea.info['cruce'].
+        Con en_disco=True los resultados de la tarea se guardan en disco. Con
+        unir_portadas=True las primeras páginas se unen en un PDF temporal,
+        en tarea.adjuntos['portadas'].
+        """
+        if cruce is not None:
+            pdf_files = [f for f in pdf_files if f.name in cruce['coincidencias']]
+        with tempfile.NamedTemporaryFile(delete=False, prefix='pdfs_editados_', suffix='.zip') as tmp:
+            ruta_zip = tmp.name
+        adjuntos = {}
+        if unir_portadas:
+            with tempfile.NamedTemporaryFile(delete=False, prefix='portadas_', suffix='.pdf') as tmp:
+                adjuntos['portadas'] = tmp.name
+        crear = self.crear_lote(
+            pdf_files, posiciones, ruta_zip, comprimir, guardado, directorio_trabajo, cruce,
+            perfil_salida, nivel_zip, portada, adjuntos.get('portadas'), indice_portadas
+        )
+        return gestor.enviar(
+            crear, len(pdf_files),
+            descripcion=f"{len(pdf_files)} PDFs ({self.orientacion})",
+            propietario=propietario,
+            archivo=ruta_zip,
+            info={'cruce': cruce} if cruce is not None else None,
+            en_disco=en_disco,
+            adjuntos=adjuntos
+        )
+
+    def cruzar_archivos(self, nombres, normalizacion=None):
+        """Cruce previo de nombres de archivo con la tabla cargada, sin abrir ningún PDF"""
+        return cruzar_nombres(nombres, self.datos, **(normalizacion or {}))
+
+    def cruzar_carpeta(self, fuente, recursivo=False, normalizacion=None):
+        """Pares (nombre, ruta) de una carpeta o patrón del servidor y su cruce con la tabla"""
+        pares = list(trabajos_desde_ruta(fuente, recursivo=recursivo))
+        return pares, self.cruzar_archivos((nombre for nombre, _ in pares), normalizacion)
+
+    def enviar_lote_servidor(self, gestor, fuente, directorio_salida, posiciones, recursivo=False,
+                             propietario=None, guardado='completo', normalizacion=None,
+                             perfil_salida='rapido', en_disco=False, portada=False,
+                             unir_portadas=False, indice_portadas=False):
+        """Envía al gestor un lote tomado de una carpeta o patrón glob del servidor
         
-        return resultados
+        Los PDFs no pasan por el navegador: al empezar la tarea se listan los
+        nombres, se cruzan con la tabla y solo se abren los que coinciden.
+        Los estampados quedan en directorio_salida (el lote es reanudable) y
+        el cruce en tarea.info['cruce']. Con unir_portadas=True las primeras
+        páginas se unen en ARCHIVO_PORTADAS dentro de directorio_salida
+        (también las de los PDFs omitidos por estar ya terminados).
+        """
+        datos = self.datos
+        orientacion = self.orientacion
+        sello = self.crear_sello(posiciones, orientacion)
+        info = {'directorio_salida': directorio_salida}
+        if unir_portadas:
+            info['portadas'] = os.path.join(directorio_salida, ARCHIVO_PORTADAS)
+        
+        def crear(max_workers=None):
+            pares = list(trabajos_desde_ruta(fuente, recursivo=recursivo))
+            cruce = cruzar_nombres((nombre for nombre, _ in pares), datos, **(normalizacion or {}))
+            info['cruce'] = cruce
+            lote = iterar_lote_reanudable(
+                filtrar_trabajos(pares, cruce), datos_cruzados(cruce, datos), posiciones, orientacion,
+                directorio_salida, max_workers, sello=sello, guardado=guardado,
+                perfil_salida=perfil_salida, portada=portada
+            )
+            if unir_portadas:
+                lote = escribir_portadas(lote, info['portadas'], indice_portadas, perfil_salida)
+            return lote
+        
+        return gestor.enviar(
+            crear, None,
+            descripcion=f"{fuente} ({orientacion})",
+            propietario=propietario,
+            info=info,
+            en_disco=en_disco
+        )
+
+
+def raices_servidor():
+    """Carpetas del servidor habilitadas (PDF_MASIVO_RAIZ_SERVIDOR, separadas por os.pathsep)"""
+    valor = os.environ.get('PDF_MASIVO_RAIZ_SERVIDOR', '')
+    return [os.path.realpath(os.path.expanduser(r)) for r in valor.split(os.pathsep) if r]
+
+
+def ruta_dentro_de(ruta, carpeta):
+    """Indica si ruta es carpeta o está dentro de ella"""
+    ruta = os.path.realpath(os.path.expanduser(ruta))
+    carpeta = os.path.realpath(os.path.expanduser(carpeta))
+    return os.path.commonpath([ruta, carpeta]) == carpeta
+
+
+def ruta_permitida(ruta):
+    """Indica si la ruta está dentro de alguna raíz habilitada (sin raíces, ninguna lo está)"""
+    return bool(ruta) and any(ruta_dentro_de(ruta, raiz) for raiz in raices_servidor())
+
+
+COLUMNAS_PLANTILLA = ['campo', 'ancla', 'x', 'y', 'tamano', 'rotacion', 'fuente', 'color', 'formato']
+
+ANCLAS_APP = {
+    None: "Posición fija (solo para páginas como la del ejemplo)",
+    'superior-izquierda': "Esquina superior izquierda",
+    'superior-derecha': "Esquina superior derecha",
+    'inferior-izquierda': "Esquina inferior izquierda",
+    'inferior-derecha': "Esquina inferior derecha",
+    'relativa': "Proporcional al tamaño de la página",
+}
+
+# PDF de portadas unidas de los lotes de carpetas del servidor (dentro de la carpeta de salida)
+ARCHIVO_PORTADAS = 'portadas_unidas.pdf'
+
+ETIQUETAS_PERFIL = {
+    'rapido': "Rápido (sin recomprimir)",
+    'compacto': "Compacto (archivos más chicos)",
+    'web': "Web (linealizado)",
+}
+
+
+def color_hex(color):
+    """Color [r, g, b] entre 0 y 1 como texto '#rrggbb'"""
+    return '#' + ''.join(f"{round(c * 255):02x}" for c in color)
+
+
+def color_rgb(texto):
+    """Texto '#rrggbb' como color [r, g, b] entre 0 y 1"""
+    texto = str(texto).strip().lstrip('#')
+    if len(texto) != 6:
+        raise ValueError(f"Color inválido '{texto}' (usar #rrggbb)")
+    return [int(texto[i:i + 2], 16) / 255 for i in (0, 2, 4)]
+
+
+def tabla_de_campos(campos):
+    """Campos de una plantilla como tabla para st.data_editor"""
+    return pd.DataFrame(
+        [dict(campo, color=color_hex(campo['color'])) for campo in campos],
+        columns=COLUMNAS_PLANTILLA
+    )
+
+
+def campos_de_tabla(tabla, columnas=None):
+    """Campos de plantilla desde la tabla editada (se omiten las filas sin campo)
+
+    columnas (campo -> encabezado) conserva la 'columna' de la plantilla
+    original, que no se edita en la tabla.
+    """
+    campos = []
+    for fila in tabla.to_dict('records'):
+        fila = {clave: valor for clave, valor in fila.items() if not pd.isna(valor) and valor != ''}
+        if not fila.get('campo'):
+            continue
+        campo = {'campo': fila['campo']}
+        if 'ancla' in fila:
+            campo['ancla'] = fila['ancla']
+        for clave in ('x', 'y', 'tamano'):
+            if clave in fila:
+                campo[clave] = float(fila[clave])
+        if 'rotacion' in fila:
+            campo['rotacion'] = int(fila['rotacion'])
+        if 'fuente' in fila:
+            campo['fuente'] = fila['fuente']
+        if 'color' in fila:
+            campo['color'] = color_rgb(fila['color'])
+        if 'formato' in fila:
+            campo['formato'] = str(fila['formato'])
+        if columnas and campo['campo'] in columnas:
+            campo['columna'] = columnas[campo['campo']]
+        campos.append(campo)
+    return campos
+
+
+def resultado_para_tabla(resultado):
+    """Registro de resultado del núcleo con la columna 'estado' de la interfaz"""
+    return {
+        'nombre': resultado['nombre'],
+        'ruta': resultado['ruta'],
+        'en_zip': resultado.get('en_zip'),
+        'omitido': resultado.get('omitido', False),
+        'estado': '✅ Completado' if resultado['ok'] else f"❌ Error: {resultado['error']}"
+    }
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def vista_previa_en_cache(clave_archivo, _origen, posiciones, orientacion, huella_plantilla, _plantilla):
+    """(PNG, PDF) de la vista previa; el origen y la plantilla entran a la clave por su id y su huella"""
+    return generar_vista_previa(_origen, posiciones, orientacion, formato=('png', 'pdf'), plantilla=_plantilla)
+
+
+@st.cache_resource
+def obtener_gestor():
+    """Gestor de tareas compartido por todas las sesiones del servidor
+
+    Al apagar el servidor se borran los ZIP y registros temporales de las tareas.
+    """
+    gestor = GestorTareas(max_tareas=int(os.environ.get('PDF_MASIVO_MAX_TAREAS', 2)))
+    atexit.register(gestor.cerrar)
+    return gestor
+
+
+ETIQUETAS_ESTADO = {
+    EN_COLA: "⏳ En cola",
+    EN_CURSO: "⚙️ En curso",
+    TERMINADA: "✅ Terminada",
+    CANCELADA: "🛑 Cancelada",
+    FALLIDA: "❌ Fallida",
+}
+
+
+# Filas de la tabla de resultados por página
+RESULTADOS_POR_PAGINA = 100
+
+
+NORMALIZACIONES_APP = {
+    'mayusculas': "Mayúsculas/minúsculas",
+    'espacios': "Espacios",
+    'revision': "Sufijos de revisión (-R02)",
+    'ceros': "Ceros a la izquierda",
+}
+
+
+def mostrar_cruce(cruce, clave):
+    """Resumen del cruce de nombres con la tabla y, a pedido, las listas de archivos"""
+    col1, col2, col3 = st.columns(3)
+    normalizadas = len(cruce['normalizadas'])
+    col1.metric(
+        "Con datos", f"{len(cruce['coincidencias'])}/{cruce['total']}",
+        f"{normalizadas} al normalizar" if normalizadas else None, delta_color="off"
+    )
+    col2.metric("Sin datos", len(cruce['sin_datos']))
+    col3.metric("Ambiguos", len(cruce['ambiguos']))
+    
+    if (cruce['sin_datos'] or cruce['ambiguos'] or normalizadas) and st.checkbox(
+        "Ver archivos sin datos, ambiguos y normalizados", key=f"detalle_cruce_{clave}"
+    ):
+        filas = (
+            [{'archivo': nombre, 'cruce': "Sin datos", 'códigos': ""} for nombre in cruce['sin_datos']]
+            + [{'archivo': nombre, 'cruce': "Ambiguo", 'códigos': ", ".join(codigos)}
+               for nombre, codigos in cruce['ambiguos'].items()]
+            + [{'archivo': nombre, 'cruce': "Normalizado", 'códigos': cruce['coincidencias'][nombre]}
+               for nombre in cruce['normalizadas']]
+        )
+        st.dataframe(pd.DataFrame(filas), use_container_width=True)
+
+
+def mostrar_metricas(tarea, etapas_lote=None):
+    """Resumen de tiempos por etapa de una tarea y descarga de las métricas"""
+    resultados = tarea.obtener_resultados()
+    segundos = tarea.fin - tarea.inicio if tarea.inicio and tarea.fin else None
+    resumen = resumir_metricas(resultados, segundos, etapas_lote)
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Archivos/s", resumen['archivos_por_segundo'] or 0)
+    col2.metric("MB entrada → salida", f"{resumen['bytes_entrada'] / 1e6:.1f} → {resumen['bytes_salida'] / 1e6:.1f}")
+    col3.metric("Pico de memoria por proceso", f"{(resumen['rss_pico'] or 0) / 1e6:.0f} MB")
+    
+    if resumen['etapas']:
+        st.dataframe(
+            pd.DataFrame([
+                {'Etapa': etapa, 'p50 (ms)': e['p50'] * 1000, 'p95 (ms)': e['p95'] * 1000,
+                 'Máx (ms)': e['max'] * 1000, 'Total (s)': e['total']}
+                for etapa, e in resumen['etapas'].items()
+            ]),
+            use_container_width=True
+        )
+    if len(resumen['tamanos_pagina']) > 1:
+        st.caption(
+            "Tamaños de página: "
+            + ", ".join(f"{tamano} ({cantidad})" for tamano, cantidad in resumen['tamanos_pagina'].items())
+        )
+    if resumen['mas_lentos']:
+        st.caption("Archivos más lentos")
+        st.dataframe(pd.DataFrame(resumen['mas_lentos']), use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "📥 Métricas (JSON)",
+            data=exportar_metricas(resultados, 'json', segundos, etapas_lote),
+            file_name=f"metricas_{tarea.id}.json",
+            mime="application/json",
+            key=f"metricas_json_{tarea.id}"
+        )
+    with col2:
+        st.download_button(
+            "📥 Métricas por archivo (CSV)",
+            data=exportar_metricas(resultados, 'csv'),
+            file_name=f"metricas_{tarea.id}.csv",
+            mime="text/csv",
+            key=f"metricas_csv_{tarea.id}"
+        )
+
+
+def mostrar_resultados(tarea, etapas_lote=None):
+    """Tabla de resultados por páginas y descargas de una tarea terminada"""
+    total = tarea.procesados
+    if not total:
+        return
+    
+    # Solo se lee la página visible (con los resultados en disco, del archivo)
+    paginas = (total - 1) // RESULTADOS_POR_PAGINA + 1
+    pagina = 1
+    if paginas > 1:
+        pagina = st.number_input(
+            f"Página de resultados (de {paginas}):", min_value=1, max_value=paginas, value=1,
+            key=f"pagina_{tarea.id}"
+        )
+    inicio = (pagina - 1) * RESULTADOS_POR_PAGINA
+    resultados = [resultado_para_tabla(r) for r in tarea.pagina_resultados(inicio, RESULTADOS_POR_PAGINA)]
+    resultados_df = pd.DataFrame(resultados)
+    st.dataframe(resultados_df[['nombre', 'estado']], use_container_width=True)
+    
+    # Estadísticas
+    completados = tarea.completados
+    st.success(f"✅ {completados}/{total} archivos procesados correctamente")
+    if tarea.omitidos:
+        st.info(f"♻️ {tarea.omitidos} archivos sin cambios desde la ejecución anterior (no se volvieron a estampar)")
+    
+    if st.checkbox("⏱️ Ver métricas por etapa", key=f"ver_metricas_{tarea.id}"):
+        mostrar_metricas(tarea, etapas_lote)
+    
+    cruce = tarea.info.get('cruce')
+    if cruce and (cruce['sin_datos'] or cruce['ambiguos']):
+        st.warning(
+            f"⚠ {len(cruce['sin_datos'])} PDFs sin datos y {len(cruce['ambiguos'])} ambiguos "
+            f"no se procesaron (no se abrieron)"
+        )
+        mostrar_cruce(cruce, tarea.id)
+    if tarea.info.get('directorio_salida') and completados > 0:
+        st.info(f"📁 PDFs estampados en el servidor: {tarea.info['directorio_salida']}")
+    if tarea.info.get('portadas') and os.path.exists(tarea.info['portadas']):
+        st.info(f"📑 Portadas unidas en el servidor: {tarea.info['portadas']}")
+    
+    # Cada archivo se borra del servidor apenas se descarga (Streamlit ya tiene una copia)
+    descargados = [etiqueta for nombre, etiqueta in ((None, "el ZIP"), ('portadas', "las portadas"))
+                   if nombre in tarea.borradas]
+    if descargados:
+        st.caption(f"📦 Ya se descargó y se borró del servidor: {', '.join(descargados)}")
+    
+    # Las portadas unidas se descargan aparte (siguen disponibles aunque ya se haya bajado el ZIP)
+    portadas = tarea.adjuntos.get('portadas')
+    if portadas and os.path.exists(portadas) and os.path.getsize(portadas) > 0 and (not tarea.en_disco or st.checkbox(
+        f"Preparar la descarga de las portadas ({os.path.getsize(portadas) / 1e6:.0f} MB)",
+        key=f"preparar_portadas_{tarea.id}"
+    )):
+        with open(portadas, 'rb') as archivo_portadas:
+            st.download_button(
+                label="📑 Descargar las portadas unidas (PDF)",
+                data=archivo_portadas,
+                file_name="portadas_unidas.pdf",
+                mime="application/pdf",
+                key=f"portadas_{tarea.id}",
+                on_click=partial(tarea.borrar_salida, 'portadas')
+            )
+    
+    # Descargar el ZIP ya armado durante el procesamiento
+    if completados > 0 and tarea.archivo and os.path.exists(tarea.archivo):
+        st.subheader("📦 Descargar Resultados")
+        
+        # Streamlit guarda en memoria lo que se ofrece para descargar: con
+        # memoria acotada el ZIP solo se carga cuando se pide
+        tamano = os.path.getsize(tarea.archivo) / 1e6
+        if not tarea.en_disco or st.checkbox(
+            f"Preparar la descarga del ZIP ({tamano:.0f} MB)", key=f"preparar_{tarea.id}"
+        ):
+            with open(tarea.archivo, 'rb') as archivo_zip:
+                st.download_button(
+                    label="📥 Descargar todos los PDFs editados (ZIP)",
+                    data=archivo_zip,
+                    file_name="pdfs_editados.zip",
+                    mime="application/zip",
+                    key=f"zip_{tarea.id}",
+                    on_click=tarea.borrar_salida
+                )
+        
+        # Un PDF de la página visible, leído desde el mismo ZIP
+        en_zip = {r['nombre']: r['en_zip'] for r in resultados if r['en_zip']}
+        if en_zip:
+            st.subheader("Descargar individualmente")
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                nombre = st.selectbox("PDF de esta página:", list(en_zip), key=f"individual_{tarea.id}")
+            with col2:
+                with zipfile.ZipFile(tarea.archivo) as zipf:
+                    st.download_button(
+                        label="📥 Descargar PDF",
+                        data=zipf.read(en_zip[nombre]),
+                        file_name=f"editado_{nombre}",
+                        mime="application/pdf",
+                        key=f"pdf_{tarea.id}"
+                    )
+
+
+def mostrar_tareas(gestor, propietario, etapas_lote=None):
+    """Estado de las tareas de la sesión; devuelve True si alguna sigue pendiente"""
+    tareas = gestor.listar(propietario)
+    if not tareas:
+        return False
+    
+    st.subheader("📋 Tareas")
+    en_curso = sum(1 for t in gestor.listar() if t.estado == EN_CURSO)
+    st.caption(f"Servidor: {en_curso}/{gestor.max_tareas} tareas en curso, {gestor.en_cola()} en cola")
+    
+    pendientes = False
+    for tarea in tareas:
+        resumen = tarea.resumen()
+        total = resumen['total'] if resumen['total'] is not None else '?'
+        with st.expander(
+            f"{ETIQUETAS_ESTADO[tarea.estado]} · {resumen['descripcion']} · "
+            f"{resumen['procesados']}/{total}",
+            expanded=not tarea.terminada or tarea is tareas[0]
+        ):
+            st.progress(tarea.progreso)
+            if tarea.estado == EN_CURSO and resumen['ultimo']:
+                total = resumen['total'] if resumen['total'] is not None else '?'
+                st.text(f"Procesando {resumen['procesados']}/{total}: {resumen['ultimo']}")
+            if resumen['error']:
+                st.error(f"Error en la tarea: {resumen['error']}")
+            
+            if not tarea.terminada:
+                pendientes = True
+                if st.button("🛑 Cancelar", key=f"cancelar_{tarea.id}", disabled=tarea.cancelada):
+                    tarea.cancelar()
+                    st.rerun()
+            else:
+                st.caption(f"Duración: {resumen['segundos']} s")
+                if st.button("🗑️ Descartar", key=f"descartar_{tarea.id}",
+                             help="Quita la tarea y borra sus archivos del servidor"):
+                    gestor.olvidar(tarea.id)
+                    st.rerun()
+                mostrar_resultados(tarea, etapas_lote)
+    return pendientes
 
 def main():
     """Función principal de la aplicación Streamlit"""
@@ -339,8 +728,13 @@ def main():
         st.session_state.posiciones = None
     if 'datos_cargados' not in st.session_state:
         st.session_state.datos_cargados = False
+    if 'id_sesion' not in st.session_state:
+        st.session_state.id_sesion = uuid.uuid4().hex
+    if 'ronda_subidas' not in st.session_state:
+        st.session_state.ronda_subidas = 0
     
     editor = st.session_state.editor
+    gestor = obtener_gestor()
     
     # Sidebar para configuración
     with st.sidebar:
@@ -357,19 +751,81 @@ def main():
         
         st.info(f"**Orientación actual:** {editor.orientacion.upper()}")
         
+        # Procesos en paralelo para el lote
+        st.subheader("Rendimiento")
+        st.caption(
+            f"Cada lote usa {gestor.workers_por_tarea} procesos; "
+            f"el servidor corre hasta {gestor.max_tareas} lotes a la vez"
+        )
+        perfil_salida = st.selectbox(
+            "Perfil de salida:",
+            perfiles_disponibles(),
+            format_func=ETIQUETAS_PERFIL.get,
+            help="Rápido guarda sin recomprimir. Compacto recomprime contenido, imágenes y fuentes "
+                 "(más lento, archivos más chicos). Web además linealiza para abrir en el navegador"
+        )
+        comprimir_zip = st.checkbox(
+            "Comprimir PDFs dentro del ZIP",
+            value=False,
+            help="Los PDFs ya vienen comprimidos: sin esta opción el ZIP se arma más rápido"
+        )
+        nivel_zip = None
+        if comprimir_zip:
+            nivel_zip = st.slider(
+                "Nivel de compresión del ZIP:", 1, 9, 6,
+                help="1 es el más rápido; 9 el más chico"
+            )
+        solo_portada = st.radio(
+            "Salida:",
+            ["Documentos completos", "Solo la primera página (portadas)"],
+            help="Solo la primera página no carga el resto de cada PDF: mucho más rápido en PDFs largos"
+        ) != "Documentos completos"
+        unir_portadas = st.checkbox(
+            "Unir las portadas en un PDF",
+            value=False,
+            help="Además de los PDFs, arma un solo PDF con la primera página estampada de cada uno"
+        )
+        indice_portadas = st.checkbox(
+            "Índice al principio del PDF unido",
+            value=False,
+            disabled=not unir_portadas,
+            help="Una lista de los documentos con enlaces a su portada"
+        ) and unir_portadas
+        incremental_posible = perfil_salida == 'rapido' and not solo_portada
+        guardado_incremental = st.checkbox(
+            "Guardado incremental",
+            value=False,
+            disabled=not incremental_posible,
+            help="Solo agrega el cambio de la primera página al PDF original (recomendado para PDFs grandes). "
+                 "Solo con el perfil rápido y documentos completos"
+        ) and incremental_posible
+        reanudable = st.checkbox(
+            "Trabajo reanudable",
+            value=False,
+            help="Guarda cada PDF terminado en un directorio de trabajo. Si el proceso se corta, "
+                 "o se vuelve a procesar el mismo lote, solo se estampan los PDFs nuevos o modificados"
+        )
+        memoria_acotada = st.checkbox(
+            "Memoria acotada",
+            value=False,
+            help="Para lotes muy grandes: los resultados se guardan en disco y se muestran por páginas, "
+                 "y los PDFs subidos se liberan al enviar el lote"
+        )
+        directorio_trabajo = None
+        trabajo_valido = True
+        if reanudable:
+            # Por defecto cada sesión tiene el suyo: dos usuarios no comparten salidas ni manifiesto
+            trabajo_sesion = os.path.join(DIRECTORIO_CACHE, 'trabajo', st.session_state.id_sesion)
+            directorio_trabajo = st.text_input("Directorio de trabajo:", value=trabajo_sesion)
+            # Otro directorio tiene que estar dentro de las carpetas habilitadas del servidor
+            if not directorio_trabajo or not (
+                ruta_dentro_de(directorio_trabajo, trabajo_sesion) or ruta_permitida(directorio_trabajo)
+            ):
+                st.error("❌ El directorio de trabajo no está dentro de las carpetas habilitadas del servidor")
+                trabajo_valido = False
+        
         # Posiciones por defecto según orientación
-        if editor.orientacion == "vertical":
-            posiciones_default = [
-                {'x': 50, 'y': 500},   # Sistema
-                {'x': 50, 'y': 470},   # Subsistema
-                {'x': 50, 'y': 440}    # Código
-            ]
-        else:
-            posiciones_default = [
-                {'x': 100, 'y': 35},   # Sistema
-                {'x': 250, 'y': 35},   # Subsistema
-                {'x': 430, 'y': 35}    # Código
-            ]
+        posiciones_default = POSICIONES_POR_DEFECTO[editor.orientacion]
     
     # Contenedor principal
     tab1, tab2, tab3 = st.tabs(["📊 Cargar Datos", "📍 Configurar Posiciones", "🚀 Procesar PDFs"])
@@ -379,15 +835,46 @@ def main():
         
         # Subir archivo Excel
         uploaded_excel = st.file_uploader(
-            "Carga tu archivo Excel (.xlsx o .xls)",
-            type=['xlsx', 'xls'],
+            "Carga tu archivo Excel (.xlsx o .xls), CSV o Parquet",
+            type=['xlsx', 'xls', 'csv', 'parquet'],
             key="excel_uploader"
         )
         
+        por_bloques = st.checkbox(
+            "Lectura por bloques (recomendado para archivos grandes)",
+            value=True,
+            help="Lee solo las columnas de código, sistema y subsistema (y las adicionales elegidas)"
+        )
+
         if uploaded_excel is not None:
+            # El encabezado se lee una vez por archivo
+            clave_tabla = (uploaded_excel.name, uploaded_excel.size)
+            encabezado = st.session_state.get('encabezado_tabla')
+            if encabezado is None or encabezado[0] != clave_tabla:
+                try:
+                    encabezado = (clave_tabla, leer_encabezado(uploaded_excel))
+                except Exception as e:
+                    st.error(f"❌ No se pudo leer el encabezado: {e}")
+                    encabezado = (clave_tabla, [])
+                st.session_state.encabezado_tabla = encabezado
+
+            adicionales = st.multiselect(
+                "Columnas adicionales para el sello (revisión, fecha, área...):",
+                encabezado[1],
+                help="Se pueden estampar con una plantilla de campos en 'Configurar Posiciones'"
+            )
+            campos = {columna: columna for columna in adicionales}
+            if editor.plantilla is not None:
+                campos.update(editor.plantilla.columnas())
+                if editor.plantilla.columnas():
+                    st.caption(
+                        "También se leen las columnas de la plantilla guardada: "
+                        + ", ".join(editor.plantilla.columnas().values())
+                    )
+
             if st.button("📥 Procesar Datos del Excel", type="primary"):
                 with st.spinner("Procesando archivo Excel..."):
-                    if editor.leer_datos_excel(uploaded_excel):
+                    if editor.leer_datos_excel(uploaded_excel, por_bloques=por_bloques, campos=campos):
                         st.session_state.datos_cargados = True
                         st.success("✅ Datos cargados correctamente")
                         
@@ -415,27 +902,15 @@ def main():
                 key="pdf_ejemplo_uploader"
             )
             
-            if pdf_ejemplo:
-                # Guardar PDF temporalmente
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                    tmp.write(pdf_ejemplo.getvalue())
-                    pdf_path = tmp.name
-                
-                # Opción para generar PDF con coordenadas
-                if st.button("🛠️ Generar PDF con coordenadas", type="secondary"):
-                    with st.spinner("Generando PDF con cuadrícula de coordenadas..."):
-                        pdf_coords = editor.generar_pdf_coordenadas(pdf_path)
-                        
-                        if pdf_coords:
-                            with open(pdf_coords, "rb") as f:
-                                st.download_button(
-                                    label="📥 Descargar PDF con coordenadas",
-                                    data=f,
-                                    file_name="pdf_con_coordenadas.pdf",
-                                    mime="application/pdf"
-                                )
-                            st.info("📋 Abre el PDF descargado para ver las coordenadas y configurar las posiciones")
-                
+            modo_sello = st.radio(
+                "Campos del sello:",
+                ["Sistema, subsistema y código", "Plantilla de campos"],
+                horizontal=True,
+                help="Con una plantilla se estampa cualquier columna de la tabla, cada una con su "
+                     "posición, tamaño, rotación, fuente, color y formato"
+            )
+            
+            if pdf_ejemplo and modo_sello == "Sistema, subsistema y código":
                 # Configurar posiciones manualmente
                 st.subheader("Configurar Coordenadas")
                 st.info(f"Configura las coordenadas para texto **{editor.orientacion.upper()}**")
@@ -451,15 +926,129 @@ def main():
                         y = st.number_input(f"Coordenada Y", value=posiciones_default[i]['y'], key=f"y_{i}")
                         posiciones.append({'x': x, 'y': y})
                 
+                # Vista previa en vivo: se vuelve a dibujar al cambiar las coordenadas
+                vista_previa = editor.generar_pdf_coordenadas(pdf_ejemplo, posiciones, formato="png")
+                if vista_previa:
+                    st.image(vista_previa, caption="Primera página con cuadrícula y posiciones", use_column_width=True)
+                
+                # Opción para descargar el PDF con coordenadas
+                pdf_coords = editor.generar_pdf_coordenadas(pdf_ejemplo, posiciones)
+                if pdf_coords:
+                    st.download_button(
+                        label="📥 Descargar PDF con coordenadas",
+                        data=pdf_coords,
+                        file_name="pdf_con_coordenadas.pdf",
+                        mime="application/pdf"
+                    )
+                
+                # Lotes con varios tamaños de página: posiciones respecto de una esquina
+                ancla = st.selectbox(
+                    "Medir las posiciones desde:",
+                    list(ANCLAS_APP),
+                    format_func=ANCLAS_APP.get,
+                    help="Para lotes que mezclan tamaños de página (A3, A1, carta) o páginas rotadas: "
+                         "las posiciones medidas en este PDF se recalculan una vez por cada tamaño"
+                )
+                
                 # Guardar posiciones
                 if st.button("💾 Guardar Posiciones", type="primary"):
                     st.session_state.posiciones = posiciones
+                    editor.plantilla = None
+                    if ancla is not None:
+                        editor.plantilla = plantilla_desde_posiciones(posiciones, editor.orientacion).anclada(
+                            ancla, *editor.medidas_pagina(pdf_ejemplo)
+                        )
                     st.success("✅ Posiciones guardadas correctamente")
                     
                     # Mostrar resumen
                     st.subheader("Resumen de Posiciones")
                     for i, pos in enumerate(posiciones):
                         st.info(f"**{textos[i]}**: ({pos['x']}, {pos['y']})")
+            
+            elif pdf_ejemplo:
+                st.subheader("Plantilla de campos")
+                archivo_plantilla = st.file_uploader(
+                    "Carga una plantilla (JSON) o edita la actual",
+                    type=['json'],
+                    key="plantilla_uploader"
+                )
+                try:
+                    if archivo_plantilla is not None:
+                        base = cargar_plantilla(archivo_plantilla.getvalue().decode('utf-8'))
+                    else:
+                        base = editor.plantilla or plantilla_desde_posiciones(
+                            st.session_state.posiciones or posiciones_default, editor.orientacion
+                        )
+                except ValueError as e:
+                    st.error(f"❌ Plantilla inválida: {e}")
+                    base = None
+                
+                if base is not None:
+                    cargados = editor.campos_cargados()
+                    opciones_campo = list(dict.fromkeys(
+                        ['codigo', *cargados, *(campo['campo'] for campo in base.campos)]
+                    ))
+                    # La clave cambia con la plantilla base para no mezclar ediciones de otra
+                    tabla = st.data_editor(
+                        tabla_de_campos(base.campos),
+                        num_rows="dynamic",
+                        use_container_width=True,
+                        key=f"tabla_plantilla_{base.huella()[:12]}",
+                        column_config={
+                            'campo': st.column_config.SelectboxColumn("Campo", options=opciones_campo, required=True),
+                            'ancla': st.column_config.SelectboxColumn(
+                                "Ancla", options=list(ANCLAS),
+                                help="Vacío: x e y fijas. Esquina: distancia desde esa esquina de la página. "
+                                     "Relativa: x e y entre 0 y 1 del ancho y el alto"
+                            ),
+                            'x': st.column_config.NumberColumn("X", required=True),
+                            'y': st.column_config.NumberColumn("Y", required=True),
+                            'tamano': st.column_config.NumberColumn("Tamaño", min_value=1, default=8),
+                            'rotacion': st.column_config.SelectboxColumn("Rotación", options=list(ROTACIONES), default=0),
+                            'fuente': st.column_config.SelectboxColumn("Fuente", options=list(FUENTES), default='helv'),
+                            'color': st.column_config.TextColumn("Color", default='#000000', help="#rrggbb"),
+                            'formato': st.column_config.TextColumn("Formato", default='{}', help="Por ejemplo 'Rev. {}'"),
+                        }
+                    )
+                    if base.variantes:
+                        st.caption(
+                            f"La plantilla tiene {len(base.variantes)} variantes para otros tamaños u "
+                            "orientaciones de página; se conservan tal cual (se editan en el JSON)"
+                        )
+                    
+                    try:
+                        plantilla = Plantilla(campos_de_tabla(tabla, base.columnas()), base.variantes)
+                    except ValueError as e:
+                        st.error(f"❌ {e}")
+                        plantilla = None
+                    
+                    if plantilla is not None:
+                        faltantes = [
+                            columna for campo, columna in plantilla.columnas().items()
+                            if campo not in CAMPOS_BASE and campo not in cargados
+                        ]
+                        if faltantes:
+                            st.warning(
+                                f"⚠ Columnas que no están en los datos cargados: {', '.join(faltantes)}. "
+                                "Guarda la plantilla y vuelve a procesar la tabla en 'Cargar Datos'"
+                            )
+                        
+                        vista_previa = editor.generar_pdf_coordenadas(pdf_ejemplo, formato="png", plantilla=plantilla)
+                        if vista_previa:
+                            st.image(vista_previa, caption="Primera página con cuadrícula y campos", use_column_width=True)
+                        
+                        st.download_button(
+                            label="📥 Descargar plantilla (JSON)",
+                            data=json.dumps(plantilla.como_dict(), ensure_ascii=False, indent=2),
+                            file_name="plantilla_sello.json",
+                            mime="application/json"
+                        )
+                        
+                        if st.button("💾 Guardar Plantilla", type="primary"):
+                            editor.plantilla = plantilla
+                            if st.session_state.posiciones is None:
+                                st.session_state.posiciones = posiciones_default
+                            st.success(f"✅ Plantilla guardada: {len(plantilla.campos)} campos")
     
     with tab3:
         st.header("3. Procesar Archivos PDF")
@@ -469,88 +1058,141 @@ def main():
         elif st.session_state.posiciones is None:
             st.warning("⚠ Configura las posiciones desde la pestaña 'Configurar Posiciones'")
         else:
-            # Subir archivos PDF
-            st.subheader("Cargar Archivos PDF")
-            uploaded_pdfs = st.file_uploader(
-                "Selecciona los archivos PDF a procesar",
-                type=['pdf'],
-                accept_multiple_files=True,
-                key="pdfs_uploader"
+            normalizar = st.multiselect(
+                "Al cruzar los nombres de los PDFs con la tabla, ignorar:",
+                list(NORMALIZACIONES_APP),
+                format_func=NORMALIZACIONES_APP.get,
+                help="Los nombres que coinciden tal cual siempre tienen prioridad. "
+                     "Se estampa el código tal como figura en la tabla"
             )
+            normalizacion = {opcion: True for opcion in normalizar}
             
-            if uploaded_pdfs:
-                st.success(f"✅ {len(uploaded_pdfs)} archivos PDF listos para procesar")
+            # Leer carpetas del servidor solo si el administrador habilitó alguna
+            origen_pdfs = "Subir archivos"
+            if raices_servidor():
+                origen_pdfs = st.radio(
+                    "Origen de los PDFs:",
+                    ["Subir archivos", "Carpeta del servidor"],
+                    horizontal=True,
+                    help="Con 'Carpeta del servidor' los PDFs se leen directo del disco del servidor, "
+                         "sin pasar por el navegador (para juegos de planos grandes)"
+                )
+            
+            if origen_pdfs == "Subir archivos":
+                # Subir archivos PDF
+                st.subheader("Cargar Archivos PDF")
+                uploaded_pdfs = st.file_uploader(
+                    "Selecciona los archivos PDF a procesar",
+                    type=['pdf'],
+                    accept_multiple_files=True,
+                    key=f"pdfs_uploader_{st.session_state.ronda_subidas}"
+                )
+            
+                if uploaded_pdfs:
+                    # Cruce previo: solo con los nombres, antes de abrir ningún PDF
+                    cruce = editor.cruzar_archivos((f.name for f in uploaded_pdfs), normalizacion)
+                    st.subheader("Cruce con la tabla")
+                    mostrar_cruce(cruce, "subidas")
+                    a_procesar = sum(1 for f in uploaded_pdfs if f.name in cruce['coincidencias'])
                 
-                # Mostrar configuración
-                st.subheader("Configuración Actual")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.info(f"**Datos cargados:** {len(editor.datos)} registros")
-                    st.info(f"**Posiciones configuradas:** Sí")
-                with col2:
-                    st.info(f"**Orientación:** {editor.orientacion}")
-                    st.info(f"**PDFs a procesar:** {len(uploaded_pdfs)}")
+                    # Mostrar configuración
+                    st.subheader("Configuración Actual")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.info(f"**Datos cargados:** {len(editor.datos)} registros")
+                        if editor.plantilla is not None:
+                            st.info(f"**Sello:** plantilla de {len(editor.plantilla.campos)} campos")
+                        else:
+                            st.info(f"**Posiciones configuradas:** Sí")
+                    with col2:
+                        st.info(f"**Orientación:** {editor.orientacion}")
+                        st.info(f"**PDFs a procesar:** {a_procesar} de {len(uploaded_pdfs)}")
                 
-                # Iniciar procesamiento
-                if st.button("🚀 Iniciar Procesamiento", type="primary"):
-                    # Barra de progreso
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    # Procesar archivos
-                    resultados = editor.procesar_lote(
-                        uploaded_pdfs,
-                        st.session_state.posiciones,
-                        progress_bar,
-                        status_text
-                    )
-                    
-                    # Mostrar resultados
-                    st.subheader("📊 Resultados del Procesamiento")
-                    
-                    # Crear DataFrame de resultados
-                    resultados_df = pd.DataFrame(resultados)
-                    st.dataframe(resultados_df[['nombre', 'estado']], use_container_width=True)
-                    
-                    # Estadísticas
-                    completados = sum(1 for r in resultados if '✅' in r['estado'])
-                    st.success(f"✅ {completados}/{len(resultados)} archivos procesados correctamente")
-                    
-                    # Crear archivo ZIP con resultados
-                    if completados > 0:
-                        st.subheader("📦 Descargar Resultados")
-                        
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_zip:
-                            zip_path = tmp_zip.name
-                        
-                        with zipfile.ZipFile(zip_path, 'w') as zipf:
-                            for resultado in resultados:
-                                if resultado['ruta'] and os.path.exists(resultado['ruta']):
-                                    arcname = f"editados/{resultado['nombre']}"
-                                    zipf.write(resultado['ruta'], arcname)
-                        
-                        # Botón de descarga
-                        with open(zip_path, "rb") as f:
-                            st.download_button(
-                                label="📥 Descargar todos los PDFs editados (ZIP)",
-                                data=f,
-                                file_name="pdfs_editados.zip",
-                                mime="application/zip"
+                    # Enviar el lote al gestor: sigue corriendo aunque la página se vuelva a ejecutar
+                    if st.button(
+                        "🚀 Iniciar Procesamiento", type="primary",
+                        disabled=a_procesar == 0 or not trabajo_valido
+                    ):
+                        editor.enviar_lote(
+                            gestor,
+                            uploaded_pdfs,
+                            st.session_state.posiciones,
+                            propietario=st.session_state.id_sesion,
+                            comprimir=comprimir_zip,
+                            guardado='incremental' if guardado_incremental else 'completo',
+                            directorio_trabajo=directorio_trabajo,
+                            cruce=cruce,
+                            perfil_salida=perfil_salida,
+                            nivel_zip=nivel_zip,
+                            en_disco=memoria_acotada,
+                            portada=solo_portada,
+                            unir_portadas=unir_portadas,
+                            indice_portadas=indice_portadas
+                        )
+                        st.success("✅ Lote enviado. Puedes seguir usando la aplicación mientras se procesa")
+                        if memoria_acotada:
+                            # Un uploader nuevo suelta los PDFs de la sesión; el lote los libera al terminar
+                            st.session_state.ronda_subidas += 1
+            
+            else:
+                st.subheader("PDFs en el servidor")
+                fuente = st.text_input(
+                    "Carpeta o patrón (por ejemplo /planos/**/*.pdf):",
+                    key="fuente_servidor"
+                )
+                recursivo = st.checkbox("Incluir subcarpetas", value=False)
+                salida_servidor = st.text_input(
+                    "Carpeta de salida en el servidor:",
+                    key="salida_servidor"
+                )
+                
+                if fuente and salida_servidor:
+                    base = base_de_fuente(fuente)
+                    if not ruta_permitida(base) or not ruta_permitida(salida_servidor):
+                        st.error("❌ La carpeta no está dentro de las carpetas habilitadas del servidor")
+                    elif ruta_dentro_de(salida_servidor, base):
+                        st.error("❌ La carpeta de salida no puede estar dentro de la carpeta de los PDFs")
+                    elif not os.path.isdir(base):
+                        st.error(f"❌ No existe la carpeta: {base}")
+                    else:
+                        st.info(
+                            "Al empezar se cruzan los nombres con la tabla y solo se abren los PDFs que "
+                            "coinciden. Si se vuelve a lanzar, solo se estampan los nuevos o modificados."
+                        )
+                        # El cruce solo lista nombres, pero en carpetas enormes se hace a pedido
+                        consulta = (fuente, recursivo, tuple(normalizar))
+                        if st.button("🔍 Revisar cruce con la tabla", key="revisar_servidor"):
+                            _, cruce = editor.cruzar_carpeta(fuente, recursivo, normalizacion)
+                            st.session_state.cruce_servidor = (consulta, cruce)
+                        revisado = st.session_state.get('cruce_servidor')
+                        if revisado and revisado[0] == consulta:
+                            mostrar_cruce(revisado[1], "servidor")
+                        if st.button("🚀 Iniciar Procesamiento", type="primary", key="iniciar_servidor"):
+                            editor.enviar_lote_servidor(
+                                gestor,
+                                fuente,
+                                salida_servidor,
+                                st.session_state.posiciones,
+                                recursivo=recursivo,
+                                propietario=st.session_state.id_sesion,
+                                guardado='incremental' if guardado_incremental else 'completo',
+                                normalizacion=normalizacion,
+                                perfil_salida=perfil_salida,
+                                en_disco=memoria_acotada,
+                                portada=solo_portada,
+                                unir_portadas=unir_portadas,
+                                indice_portadas=indice_portadas
                             )
-                        
-                        # Botones para descargar individuales
-                        st.subheader("Descargar individualmente")
-                        cols = st.columns(3)
-                        for idx, resultado in enumerate(resultados):
-                            if resultado['ruta'] and os.path.exists(resultado['ruta']):
-                                with cols[idx % 3]:
-                                    with open(resultado['ruta'], "rb") as f:
-                                        st.download_button(
-                                            label=f"📥 {resultado['nombre'][:20]}...",
-                                            data=f,
-                                            file_name=f"editado_{resultado['nombre']}",
-                                            mime="application/pdf"
-                                        )
+                            st.success("✅ Lote enviado. Puedes seguir usando la aplicación mientras se procesa")
+            
+            # Estado de las tareas de esta sesión
+            etapas_lote = {'datos': editor.segundos_datos} if editor.segundos_datos is not None else None
+            if mostrar_tareas(gestor, st.session_state.id_sesion, etapas_lote):
+                if st.checkbox("Actualizar automáticamente", value=True, key="actualizar_tareas"):
+                    time.sleep(1)
+                    st.rerun()
+                else:
+                    st.button("🔄 Actualizar estado")
 
 if __name__ == "__main__":
     main()
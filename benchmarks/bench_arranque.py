@@ -0,0 +1,101 @@
+# bench_arranque.py
+"""Arranque en frío de la aplicación: primera pantalla y costo por sesión
+
+Cada medida corre en un proceso nuevo con streamlit ya importado, como en
+un servidor recién levantado (por ejemplo, un pod nuevo al escalar):
+
+- primera pantalla: primera ejecución del script, con las importaciones
+  del paquete y de la aplicación; es lo que espera el primer usuario
+- sesión nueva: ejecución del script para otra sesión, con el proceso ya
+  caliente (incluye crear el editor de la sesión)
+- bibliotecas pesadas (PyMuPDF, pandas, numpy, reportlab) que quedaron
+  cargadas después de la primera pantalla
+
+Compara con OBJETIVO_PRIMERA_PANTALLA y OBJETIVO_SESION y termina con
+código 1 si alguno se excede.
+
+Uso: python benchmarks/bench_arranque.py --repeticiones 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, 'app_pdf_masivo_0.py')
+
+# Segundos (mediana de las repeticiones)
+OBJETIVO_PRIMERA_PANTALLA = 0.3
+OBJETIVO_SESION = 0.05
+
+PESADAS = ('fitz', 'pandas', 'numpy', 'reportlab')
+
+
+# Ejecuta el script como lo hace Streamlit (compilar y ejecutar como __main__) y guarda
+# los segundos en la sesión, para no contar el tiempo del propio AppTest
+SCRIPT = """
+import time
+import streamlit as st
+inicio = time.perf_counter()
+with open({app!r}, encoding='utf-8') as f:
+    exec(compile(f.read(), {app!r}, 'exec'), {{'__name__': '__main__', '__file__': {app!r}}})
+st.session_state['_segundos_bench'] = time.perf_counter() - inicio
+"""
+
+
+def _ejecutar_sesion(app):
+    """Segundos de una ejecución del script en una sesión nueva"""
+    from streamlit.testing.v1 import AppTest
+
+    prueba = AppTest.from_string(SCRIPT.format(app=app), default_timeout=60)
+    prueba.run()
+    if prueba.exception:
+        raise RuntimeError(prueba.exception[0].value)
+    return prueba.session_state['_segundos_bench']
+
+
+def medir(app, sesiones):
+    """Corre la primera pantalla y varias sesiones en este proceso e imprime JSON"""
+    import streamlit  # noqa: F401  (ya cargado en el servidor)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(app)))
+    primera = _ejecutar_sesion(app)
+    cargadas = [nombre for nombre in PESADAS if nombre in sys.modules]
+    tiempos = [_ejecutar_sesion(app) for _ in range(sesiones)]
+    print(json.dumps({'primera': primera, 'sesion': statistics.median(tiempos), 'cargadas': cargadas}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeticiones', type=int, default=5, help="Procesos nuevos a medir")
+    parser.add_argument('--sesiones', type=int, default=3, help="Sesiones nuevas por proceso")
+    parser.add_argument('--app', default=APP)
+    parser.add_argument('--medir', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.app, args.sesiones)
+        return 0
+
+    medidas = []
+    for _ in range(args.repeticiones):
+        salida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--medir', '--app', args.app,
+             '--sesiones', str(args.sesiones)],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(args.app))
+        ).stdout
+        medidas.append(json.loads(salida.strip().splitlines()[-1]))
+
+    primera = statistics.median(m['primera'] for m in medidas)
+    sesion = statistics.median(m['sesion'] for m in medidas)
+    cargadas = medidas[-1]['cargadas']
+    print(f"Primera pantalla: {primera * 1000:7.0f} ms  (objetivo {OBJETIVO_PRIMERA_PANTALLA * 1000:.0f} ms)")
+    print(f"Sesión nueva:     {sesion * 1000:7.0f} ms  (objetivo {OBJETIVO_SESION * 1000:.0f} ms)")
+    print(f"Cargadas tras la primera pantalla: {', '.join(cargadas) or 'ninguna'}")
+    return 0 if primera <= OBJETIVO_PRIMERA_PANTALLA and sesion <= OBJETIVO_SESION else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# bench_guardado.py
+"""Guardado completo vs. incremental en PDFs grandes de muchas páginas
+
+Uso: python benchmarks/bench_guardado.py --paginas 200 800 --repeticiones 3
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_masivo import POSICIONES_POR_DEFECTO, SelloPreparado, procesar_documento
+
+
+def generar_pdf_grande(ruta, paginas):
+    """Genera un PDF con texto y una imagen de ruido distinta por página"""
+    doc = fitz.open()
+    for i in range(paginas):
+        pagina = doc.new_page(width=1191, height=842)
+        texto = "\n".join(f"As-built {i + 1} - línea {linea}" for linea in range(30))
+        pagina.insert_text((40, 40), texto, fontsize=9)
+        # Ruido: la imagen no se comprime y el archivo pesa como un plano escaneado
+        muestras = random.Random(i).randbytes(192 * 192 * 3)
+        pixmap = fitz.Pixmap(fitz.csRGB, 192, 192, muestras, False)
+        pagina.insert_image(fitz.Rect(600, 100, 1100, 600), pixmap=pixmap)
+    doc.save(ruta, deflate=True)
+    doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--paginas', type=int, nargs='*', default=[200, 800])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    posiciones = POSICIONES_POR_DEFECTO['vertical']
+    sello = SelloPreparado(posiciones, 'vertical')
+    datos = {'PLANO': {'sistema': 'SIS-1', 'subsistema': 'SUB-1'}}
+
+    print(f"{'páginas':>8} {'entrada MB':>11} {'modo':>12} {'segundos':>9} {'salida MB':>10} {'agregado KB':>12}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for paginas in args.paginas:
+            entrada = os.path.join(directorio, 'PLANO.pdf')
+            generar_pdf_grande(entrada, paginas)
+            tamano_entrada = os.path.getsize(entrada)
+
+            for guardado in ('completo', 'incremental'):
+                salida = os.path.join(directorio, guardado)
+                os.makedirs(salida, exist_ok=True)
+
+                inicio = time.perf_counter()
+                for _ in range(args.repeticiones):
+                    resultado = procesar_documento(
+                        'PLANO.pdf', entrada, datos, posiciones, 'vertical',
+                        directorio_salida=salida, sello=sello, guardado=guardado
+                    )
+                    assert resultado['ok'], resultado['error']
+                duracion = (time.perf_counter() - inicio) / args.repeticiones
+
+                tamano_salida = os.path.getsize(resultado['ruta'])
+                print(
+                    f"{paginas:>8} {tamano_entrada / 1e6:>11.1f} {guardado:>12} {duracion:>9.3f} "
+                    f"{tamano_salida / 1e6:>10.1f} {(tamano_salida - tamano_entrada) / 1e3:>12.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# bench_leer_datos.py
+"""Compara la construcción del diccionario de datos fila por fila vs. por columnas
+
+Uso: python benchmarks/bench_leer_datos.py --filas 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_masivo import construir_datos, mapear_columnas, obtener_valor
+
+
+def construir_datos_por_filas(df, columnas_mapeadas):
+    """Implementación anterior con df.iterrows(), como referencia"""
+    datos = {}
+    for index, row in df.iterrows():
+        codigo = obtener_valor(row, columnas_mapeadas['codigo'])
+        sistema = obtener_valor(row, columnas_mapeadas['sistema'])
+        subsistema = obtener_valor(row, columnas_mapeadas['subsistema'])
+
+        if codigo and codigo != 'nan':
+            datos[str(codigo).strip()] = {
+                'sistema': sistema,
+                'subsistema': subsistema
+            }
+    return datos
+
+
+def generar_tabla(filas, semilla=0):
+    """Genera una hoja sintética con vacíos, espacios y códigos duplicados"""
+    rng = np.random.default_rng(semilla)
+    codigos = pd.Series([f" EQ-{i:07d} " for i in rng.integers(0, filas, filas)], dtype=object)
+    codigos[rng.random(filas) < 0.01] = None
+    sistemas = pd.Series([f"SIS-{i}" for i in rng.integers(0, 40, filas)], dtype=object)
+    subsistemas = pd.Series([f"SUB-{i}" for i in rng.integers(0, 400, filas)], dtype=object)
+    subsistemas[rng.random(filas) < 0.05] = None
+    return pd.DataFrame({'Código': codigos, 'Sistema': sistemas, 'Subsistema': subsistemas})
+
+
+def medir(funcion, *args):
+    """Devuelve (segundos, resultado) de una llamada"""
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, nargs='*', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--sin-filas', action='store_true', help="Omitir la versión con iterrows")
+    args = parser.parse_args()
+
+    print(f"{'filas':>9} {'iterrows (s)':>13} {'columnas (s)':>13} {'mejora':>8}")
+    for filas in args.filas:
+        df = generar_tabla(filas)
+        columnas_mapeadas = mapear_columnas(df.columns)
+
+        t_columnas, nuevo = medir(construir_datos, df, columnas_mapeadas)
+        if args.sin_filas:
+            print(f"{filas:>9} {'-':>13} {t_columnas:>13.3f} {'-':>8}")
+            continue
+
+        t_filas, anterior = medir(construir_datos_por_filas, df, columnas_mapeadas)
+        assert anterior == nuevo, "Las dos implementaciones no coinciden"
+        print(f"{filas:>9} {t_filas:>13.3f} {t_columnas:>13.3f} {t_filas / t_columnas:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# bench_memoria.py
+"""Pico de memoria del proceso principal según la cantidad de PDFs del lote
+
+Estampa lotes de distinto tamaño directo a un ZIP y junta los resultados
+en una lista o en un RegistroResultados (en disco), como hace la
+aplicación con y sin memoria acotada. Cada medida corre en un proceso
+nuevo para que el pico (VmHWM) sea solo de ese lote; los PDFs se generan a
+medida que el lote los pide.
+
+Uso: python benchmarks/bench_memoria.py --archivos 100 1000 10000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_masivo import (
+    POSICIONES_POR_DEFECTO,
+    RegistroResultados,
+    escribir_en_zip,
+    iterar_lote,
+    resumir_metricas,
+)
+from pdf_masivo.metricas import rss_pico
+
+
+class DatosSinteticos(dict):
+    """Un registro para cualquier código, sin guardar la tabla en memoria"""
+
+    def __contains__(self, codigo):
+        return True
+
+    def __getitem__(self, codigo):
+        return {'sistema': f"SIS-{codigo[-2:]}", 'subsistema': f"SUB-{codigo[-3:]}"}
+
+
+def generar_pdf():
+    """PDF de una página, para que el lote mida el manejo de resultados y no el estampado"""
+    doc = fitz.open()
+    pagina = doc.new_page()
+    pagina.insert_text((72, 72), "Plano de prueba", fontsize=12)
+    contenido = doc.tobytes()
+    doc.close()
+    return contenido
+
+
+def medir(archivos, modo, workers):
+    """Corre un lote en este proceso e imprime 'segundos pico_rss'"""
+    contenido = generar_pdf()
+    trabajos = ((f"COD-{i:06d}.pdf", contenido) for i in range(archivos))
+    resultados = RegistroResultados() if modo == 'disco' else []
+
+    with tempfile.TemporaryDirectory() as directorio:
+        inicio = time.perf_counter()
+        lote = iterar_lote(
+            trabajos, DatosSinteticos(), POSICIONES_POR_DEFECTO['vertical'], 'vertical', workers,
+            en_memoria=True
+        )
+        for resultado in escribir_en_zip(lote, os.path.join(directorio, 'lote.zip')):
+            resultados.append(resultado)
+        segundos = time.perf_counter() - inicio
+        resumen = resumir_metricas(resultados, segundos)
+        assert resumen['completados'] == archivos
+
+    if modo == 'disco':
+        resultados.borrar()
+    print(f"{segundos} {rss_pico()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--archivos', type=int, nargs='*', default=[100, 1000, 10000])
+    parser.add_argument('--modos', nargs='*', choices=['lista', 'disco'], default=['lista', 'disco'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--medir', nargs=2, metavar=('ARCHIVOS', 'MODO'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(int(args.medir[0]), args.medir[1], args.workers)
+        return
+
+    print(f"{'archivos':>9} {'modo':>6} {'segundos':>9} {'archivos/s':>11} {'pico RSS (MB)':>14}")
+    for archivos in args.archivos:
+        for modo in args.modos:
+            comando = [sys.executable, os.path.abspath(__file__), '--medir', str(archivos), modo]
+            if args.workers:
+                comando += ['--workers', str(args.workers)]
+            salida = subprocess.run(comando, capture_output=True, text=True, check=True).stdout
+            segundos, pico = salida.split()[-2:]
+            segundos = float(segundos)
+            print(
+                f"{archivos:>9} {modo:>6} {segundos:>9.2f} {archivos / segundos:>11.1f} "
+                f"{int(pico) / 1e6:>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# bench_perfiles.py
+"""Perfiles de salida y nivel del ZIP: tiempo vs. tamaño
+
+Estampa el mismo lote con cada perfil de salida disponible (rapido,
+compacto y, si el PyMuPDF instalado linealiza, web) y lo escribe en un ZIP
+sin comprimir y con deflate de los niveles indicados. Informa segundos,
+archivos por segundo y megabytes de los PDFs y del ZIP.
+
+Con --expandir los PDFs de entrada se guardan sin comprimir, como los que
+generan algunos programas de CAD o escáneres.
+
+Uso: python benchmarks/bench_perfiles.py --archivos 40 --paginas 20 --niveles 0 1 6 9
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus
+from pdf_masivo import (
+    POSICIONES_POR_DEFECTO,
+    SelloPreparado,
+    escribir_en_zip,
+    iterar_lote,
+    perfiles_disponibles,
+    resumir_metricas,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--archivos', type=int, default=40)
+    parser.add_argument('--paginas', type=int, default=20)
+    parser.add_argument('--imagenes', action='store_true', help="Una imagen de ruido por página")
+    parser.add_argument('--expandir', action='store_true', help="PDFs de entrada sin comprimir")
+    parser.add_argument('--niveles', type=int, nargs='*', default=[0, 1, 6, 9], help="0 = ZIP sin comprimir")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    ruta_pdf = corpus.obtener_pdf(args.paginas, args.imagenes)
+    if args.expandir:
+        doc = fitz.open(ruta_pdf)
+        contenido = doc.tobytes(expand=255)
+        doc.close()
+    else:
+        with open(ruta_pdf, 'rb') as f:
+            contenido = f.read()
+
+    trabajos = [(f"{corpus.codigo_sintetico(i)}.pdf", contenido) for i in range(args.archivos)]
+    datos = {
+        corpus.codigo_sintetico(i): {'sistema': f"SIS-{i % 50}", 'subsistema': f"SUB-{i % 300}"}
+        for i in range(args.archivos)
+    }
+    posiciones = POSICIONES_POR_DEFECTO['vertical']
+    sello = SelloPreparado(posiciones, 'vertical')
+
+    print(f"{args.archivos} PDFs de {len(contenido) / 1e6:.2f} MB ({args.paginas} páginas)")
+    print(
+        f"{'perfil':>9} {'zip':>4} {'segundos':>9} {'archivos/s':>11} {'MB PDFs':>8} "
+        f"{'MB ZIP':>7} {'% entrada':>10} {'guardar p50':>12} {'zip p50':>8}"
+    )
+    with tempfile.TemporaryDirectory() as directorio:
+        for perfil in perfiles_disponibles():
+            for nivel in args.niveles:
+                ruta_zip = os.path.join(directorio, f"{perfil}-{nivel}.zip")
+                inicio = time.perf_counter()
+                resultados = list(escribir_en_zip(
+                    iterar_lote(
+                        trabajos, datos, posiciones, 'vertical', args.workers,
+                        en_memoria=True, sello=sello, perfil_salida=perfil
+                    ),
+                    ruta_zip, comprimir=nivel > 0, nivel=nivel or None
+                ))
+                segundos = time.perf_counter() - inicio
+                assert all(r['ok'] for r in resultados), [r['error'] for r in resultados if not r['ok']]
+
+                resumen = resumir_metricas(resultados, segundos)
+                tamano_zip = os.path.getsize(ruta_zip)
+                print(
+                    f"{perfil:>9} {nivel or '-':>4} {segundos:>9.2f} {resumen['archivos_por_segundo']:>11.1f} "
+                    f"{resumen['bytes_salida'] / 1e6:>8.2f} {tamano_zip / 1e6:>7.2f} "
+                    f"{tamano_zip / resumen['bytes_entrada']:>10.0%} "
+                    f"{resumen['etapas']['guardar']['p50'] * 1000:>10.1f}ms "
+                    f"{resumen['etapas']['zip']['p50'] * 1000:>6.1f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
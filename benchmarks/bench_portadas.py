@@ -0,0 +1,92 @@
+# bench_portadas.py
+"""Documentos completos vs. solo la primera página (portadas)
+
+Estampa el mismo lote guardando cada PDF completo y guardando solo su
+primera página, y en este modo también une las portadas en un PDF (con y
+sin índice). Informa segundos, archivos por segundo, megabytes de salida
+y la mediana por archivo de las etapas principales.
+
+Uso: python benchmarks/bench_portadas.py --archivos 40 --paginas 300 --imagenes
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus
+from pdf_masivo import (
+    POSICIONES_POR_DEFECTO,
+    SelloPreparado,
+    escribir_portadas,
+    iterar_lote,
+    resumir_metricas,
+)
+
+# (etiqueta, solo la primera página, unir las portadas, índice)
+MODOS = [
+    ('completo', False, False, False),
+    ('portada', True, False, False),
+    ('portada+unir', True, True, False),
+    ('portada+indice', True, True, True),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--archivos', type=int, default=40)
+    parser.add_argument('--paginas', type=int, default=300)
+    parser.add_argument('--imagenes', action='store_true', help="Una imagen de ruido por página")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    ruta_pdf = corpus.obtener_pdf(args.paginas, args.imagenes)
+    with open(ruta_pdf, 'rb') as f:
+        contenido = f.read()
+
+    trabajos = [(f"{corpus.codigo_sintetico(i)}.pdf", contenido) for i in range(args.archivos)]
+    datos = {
+        corpus.codigo_sintetico(i): {'sistema': f"SIS-{i % 50}", 'subsistema': f"SUB-{i % 300}"}
+        for i in range(args.archivos)
+    }
+    posiciones = POSICIONES_POR_DEFECTO['vertical']
+    sello = SelloPreparado(posiciones, 'vertical')
+
+    print(f"{args.archivos} PDFs de {len(contenido) / 1e6:.2f} MB ({args.paginas} páginas)")
+    print(
+        f"{'modo':>15} {'segundos':>9} {'archivos/s':>11} {'MB PDFs':>8} {'MB unido':>9} "
+        f"{'abrir p50':>10} {'extraer p50':>12} {'guardar p50':>12}"
+    )
+    base = None
+    with tempfile.TemporaryDirectory() as directorio:
+        for etiqueta, portada, unir, indice in MODOS:
+            ruta_unido = os.path.join(directorio, f"{etiqueta}.pdf")
+            inicio = time.perf_counter()
+            lote = iterar_lote(
+                trabajos, datos, posiciones, 'vertical', args.workers,
+                en_memoria=True, sello=sello, portada=portada
+            )
+            if unir:
+                lote = escribir_portadas(lote, ruta_unido, indice)
+            resultados = list(lote)
+            segundos = time.perf_counter() - inicio
+            assert all(r['ok'] for r in resultados), [r['error'] for r in resultados if not r['ok']]
+
+            resumen = resumir_metricas(resultados, segundos)
+            etapas = resumen['etapas']
+            base = base or segundos
+            mb_unido = f"{os.path.getsize(ruta_unido) / 1e6:>9.2f}" if unir else f"{'-':>9}"
+            extraer = f"{etapas['extraer']['p50'] * 1000:>10.1f}ms" if 'extraer' in etapas else f"{'-':>12}"
+            print(
+                f"{etiqueta:>15} {segundos:>9.2f} {resumen['archivos_por_segundo']:>11.1f} "
+                f"{resumen['bytes_salida'] / 1e6:>8.2f} {mb_unido} "
+                f"{etapas['abrir']['p50'] * 1000:>8.1f}ms {extraer} "
+                f"{etapas['guardar']['p50'] * 1000:>10.1f}ms  ({base / segundos:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench_procesar_lote.py
+"""Mide archivos/segundo del motor de lotes según la cantidad de procesos
+
+Como en la aplicación, el pool de procesos queda vivo entre lotes: antes de
+medir cada cantidad se corre un lote de calentamiento que arranca los
+trabajadores, y se mide el lote siguiente. iterar_lote no usa más procesos
+que CPUs: en una máquina de un CPU todas las filas miden lo mismo.
+
+Uso: python benchmarks/bench_procesar_lote.py --archivos 200 --paginas 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_masivo import cerrar_procesos, iterar_lote
+
+
+def generar_pdf(paginas):
+    """Genera un PDF sintético con texto en cada página"""
+    doc = fitz.open()
+    for i in range(paginas):
+        pagina = doc.new_page()
+        pagina.insert_text((72, 72), f"Plano de prueba - página {i + 1}", fontsize=12)
+    contenido = doc.tobytes()
+    doc.close()
+    return contenido
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--archivos', type=int, default=200)
+    parser.add_argument('--paginas', type=int, default=5)
+    parser.add_argument('--workers', type=int, nargs='*', default=None)
+    args = parser.parse_args()
+
+    contenido = generar_pdf(args.paginas)
+    archivos = [(f"COD-{i:06d}.pdf", contenido) for i in range(args.archivos)]
+
+    datos = {
+        f"COD-{i:06d}": {'sistema': f"SIS-{i % 50}", 'subsistema': f"SUB-{i % 300}"}
+        for i in range(args.archivos)
+    }
+    posiciones = [{'x': 50, 'y': 500}, {'x': 50, 'y': 470}, {'x': 50, 'y': 440}]
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, 2, 4, 8, 16, cpus} & set(range(1, cpus + 1)))
+
+    print(f"CPUs: {cpus}")
+    print(f"{'procesos':>8} {'segundos':>9} {'archivos/s':>11} {'escala':>7}")
+    base = None
+    try:
+        for n in workers:
+            # El primer lote arranca los trabajadores; se mide el segundo
+            for _ in range(2):
+                inicio = time.perf_counter()
+                resultados = list(iterar_lote(archivos, datos, posiciones, 'vertical', max_workers=n))
+                duracion = time.perf_counter() - inicio
+
+                for resultado in resultados:
+                    if resultado['ruta']:
+                        os.remove(resultado['ruta'])
+
+            tasa = len(archivos) / duracion
+            base = base or tasa
+            print(f"{n:>8} {duracion:>9.2f} {tasa:>11.1f} {tasa / base:>6.2f}x")
+    finally:
+        cerrar_procesos()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_sello.py
+"""Tiempo de estampado por documento: insert_text vs. SelloPreparado
+
+Mide abrir+estampar+guardar y, aparte, solo la llamada de estampado; cada
+modo se corre --rondas veces y se toma la más rápida (el promedio de una sola
+corrida varía mucho con la carga de la máquina).
+
+Uso: python benchmarks/bench_sello.py --documentos 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_masivo import POSICIONES_POR_DEFECTO, SelloPreparado, estampar_primera_pagina
+
+
+def generar_pdf(paginas=1):
+    """Genera un PDF sintético con algo de contenido en cada página"""
+    doc = fitz.open()
+    for i in range(paginas):
+        pagina = doc.new_page()
+        for linea in range(40):
+            pagina.insert_text((72, 72 + linea * 18), f"Plano de prueba {i + 1} - línea {linea}", fontsize=10)
+    contenido = doc.tobytes()
+    doc.close()
+    return contenido
+
+
+def medir(contenido, documentos, estampar, rondas):
+    """(total, estampado): microsegundos por documento de la ronda más rápida"""
+    mejor = None
+    for _ in range(rondas):
+        estampado = 0.0
+        inicio = time.perf_counter()
+        for i in range(documentos):
+            doc = fitz.open(stream=contenido, filetype="pdf")
+            antes = time.perf_counter()
+            estampar(doc, [f"SIS-{i % 40}", f"SUB-{i % 300}", f"COD-{i:06d}"])
+            estampado += time.perf_counter() - antes
+            doc.tobytes()
+            doc.close()
+        ronda = ((time.perf_counter() - inicio) / documentos * 1e6, estampado / documentos * 1e6)
+        mejor = ronda if mejor is None or ronda < mejor else mejor
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documentos', type=int, default=500)
+    parser.add_argument('--paginas', type=int, default=1)
+    parser.add_argument('--orientacion', choices=['vertical', 'horizontal'], default='vertical')
+    parser.add_argument('--rondas', type=int, default=5)
+    args = parser.parse_args()
+
+    contenido = generar_pdf(args.paginas)
+    posiciones = POSICIONES_POR_DEFECTO[args.orientacion]
+    sello = SelloPreparado(posiciones, args.orientacion)
+
+    base, _ = medir(contenido, args.documentos, lambda doc, textos: None, args.rondas)
+    clasico, estampado_clasico = medir(
+        contenido, args.documentos,
+        lambda doc, textos: estampar_primera_pagina(doc, textos, posiciones, args.orientacion), args.rondas
+    )
+    preparado, estampado_preparado = medir(contenido, args.documentos, sello.aplicar, args.rondas)
+
+    print(f"{'modo':<22} {'µs/doc':>9} {'estampado µs':>13}")
+    print(f"{'abrir + guardar':<22} {base:>9.0f} {'-':>13}")
+    print(f"{'insert_text':<22} {clasico:>9.0f} {estampado_clasico:>13.0f}")
+    print(f"{'SelloPreparado':<22} {preparado:>9.0f} {estampado_preparado:>13.0f}")
+    print(f"Estampado {estampado_clasico / estampado_preparado:.1f}x más rápido, "
+          f"documento completo {clasico / preparado:.1f}x")
+
+if __name__ == "__main__":
+    main()
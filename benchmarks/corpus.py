@@ -0,0 +1,146 @@
+# corpus.py
+"""Corpus sintético y reproducible para los benchmarks
+
+Genera tablas de datos (estrechas o anchas, en xlsx, csv o parquet) y PDFs
+(de 1 a miles de páginas, con o sin imágenes, verticales u horizontales)
+siempre con la misma semilla. Cada archivo se guarda una sola vez en el
+directorio del corpus con sus parámetros en el nombre y se reutiliza en
+las siguientes ejecuciones.
+
+Uso: python benchmarks/corpus.py --perfil rapido   (pre-genera el corpus)
+"""
+import argparse
+import os
+import random
+import sys
+
+import fitz  # PyMuPDF
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_masivo.indice import DIRECTORIO_CACHE
+
+# Cambiar si cambia la forma de generar el corpus (regenera los archivos)
+VERSION_CORPUS = 1
+
+DIRECTORIO_CORPUS = os.environ.get(
+    'PDF_MASIVO_CORPUS',
+    os.path.join(DIRECTORIO_CACHE, f'corpus-v{VERSION_CORPUS}')
+)
+
+# Columnas de relleno de una tabla ancha (las mapeadas quedan al final)
+COLUMNAS_RELLENO = 40
+
+# Tamaños de página en puntos
+PAGINAS = {
+    'vertical': (595, 842),     # A4
+    'horizontal': (842, 595),   # A4 apaisado
+    'plano': (2384, 1684),      # A1 apaisado
+}
+
+
+def codigo_sintetico(i):
+    """Código del i-ésimo registro (el mismo que lleva el nombre del PDF)"""
+    return f"EQ-{i:07d}"
+
+
+def generar_tabla(filas, ancho='estrecha', semilla=0):
+    """Tabla de códigos con vacíos, espacios y duplicados, como las reales"""
+    rng = np.random.default_rng(semilla)
+    codigos = pd.Series([f" {codigo_sintetico(i)} " for i in range(filas)], dtype=object)
+    codigos[rng.random(filas) < 0.01] = None
+    sistemas = pd.Series([f"SIS-{i}" for i in rng.integers(0, 40, filas)], dtype=object)
+    subsistemas = pd.Series([f"SUB-{i}" for i in rng.integers(0, 400, filas)], dtype=object)
+    subsistemas[rng.random(filas) < 0.05] = None
+
+    columnas = {}
+    if ancho == 'ancha':
+        for j in range(COLUMNAS_RELLENO):
+            if j % 2:
+                columnas[f"Campo {j:02d}"] = rng.integers(0, 1_000_000, filas)
+            else:
+                columnas[f"Campo {j:02d}"] = [f"Texto {v}" for v in rng.integers(0, 5000, filas)]
+    columnas.update({'Código': codigos, 'Sistema': sistemas, 'Subsistema': subsistemas})
+    return pd.DataFrame(columnas)
+
+
+def escribir_tabla(df, ruta):
+    """Guarda la tabla según la extensión (.xlsx, .csv o .parquet)"""
+    if ruta.endswith('.csv'):
+        df.to_csv(ruta, index=False)
+    elif ruta.endswith('.parquet'):
+        df.astype(str).where(df.notna(), None).to_parquet(ruta, index=False)
+    else:
+        # write_only para no tener todo el libro en memoria al generarlo
+        from openpyxl import Workbook
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet()
+        hoja.append(list(df.columns))
+        for fila in df.itertuples(index=False, name=None):
+            hoja.append([None if pd.isna(v) else v for v in fila])
+        libro.save(ruta)
+
+
+def generar_pdf(ruta, paginas=1, imagenes=False, orientacion='vertical', semilla=0):
+    """PDF con texto en cada página y, opcionalmente, una imagen de ruido por página"""
+    ancho, alto = PAGINAS[orientacion]
+    aleatorio = random.Random(semilla)
+    doc = fitz.open()
+    for i in range(paginas):
+        pagina = doc.new_page(width=ancho, height=alto)
+        texto = "\n".join(f"Plano sintético - página {i + 1} - línea {linea}" for linea in range(25))
+        pagina.insert_text((40, 40), texto, fontsize=9)
+        if imagenes:
+            # Ruido: no se comprime, así que pesa como un plano escaneado
+            muestras = aleatorio.randbytes(160 * 160 * 3)
+            pixmap = fitz.Pixmap(fitz.csRGB, 160, 160, muestras, False)
+            pagina.insert_image(fitz.Rect(ancho / 2, 60, ancho - 40, alto / 2), pixmap=pixmap)
+    doc.save(ruta, deflate=True)
+    doc.close()
+
+
+def _ruta(nombre):
+    os.makedirs(DIRECTORIO_CORPUS, exist_ok=True)
+    return os.path.join(DIRECTORIO_CORPUS, nombre)
+
+
+def _generar_una_vez(ruta, generar):
+    """Genera el archivo si no existe (escribiendo a un temporal para no dejar archivos a medias)"""
+    if not os.path.exists(ruta):
+        base, extension = os.path.splitext(ruta)
+        temporal = f"{base}.tmp{os.getpid()}{extension}"
+        generar(temporal)
+        os.replace(temporal, ruta)
+    return ruta
+
+
+def obtener_tabla(filas, ancho='estrecha', formato='xlsx'):
+    """Ruta de la tabla sintética, generándola si hace falta"""
+    ruta = _ruta(f"tabla-{filas}-{ancho}.{formato}")
+    return _generar_una_vez(ruta, lambda destino: escribir_tabla(generar_tabla(filas, ancho), destino))
+
+
+def obtener_pdf(paginas=1, imagenes=False, orientacion='vertical'):
+    """Ruta del PDF sintético, generándolo si hace falta"""
+    sufijo = '-imagenes' if imagenes else ''
+    ruta = _ruta(f"pdf-{paginas}p-{orientacion}{sufijo}.pdf")
+    return _generar_una_vez(ruta, lambda destino: generar_pdf(destino, paginas, imagenes, orientacion))
+
+
+def main():
+    from suite import PERFILES, casos_del_perfil
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--perfil', choices=sorted(PERFILES), default='rapido')
+    args = parser.parse_args()
+
+    for caso in casos_del_perfil(args.perfil):
+        caso.preparar()
+        print(f"listo: {caso.nombre}")
+    print(f"Corpus en {DIRECTORIO_CORPUS}")
+
+
+if __name__ == "__main__":
+    main()
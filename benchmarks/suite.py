@@ -0,0 +1,363 @@
+# suite.py
+"""Suite de benchmarks reproducible con línea base y detección de regresiones
+
+Mide los puntos de entrada de la aplicación sobre el corpus sintético
+(corpus.py): lectura de la tabla de datos (leer_datos_excel), estampado de
+un PDF (editar_pdf), lote completo a ZIP (procesar_lote) y vista previa
+de coordenadas (generar_pdf_coordenadas). Cada caso corre en un proceso
+nuevo para que la memoria medida (pico de RSS) sea solo la suya.
+
+Los resultados se comparan con la línea base guardada del perfil: un caso
+es regresión si su tiempo mínimo es más lento (o su pico de memoria mayor)
+que la línea base más la tolerancia. Termina con código 1 si hay
+regresiones. La línea base depende de la máquina: se fija en el mismo
+equipo donde se va a comparar (por ejemplo, el servidor de integración).
+
+Uso:
+    python benchmarks/suite.py                          # perfil rápido, compara
+    python benchmarks/suite.py --guardar-linea-base     # fija la línea base
+    python benchmarks/suite.py --perfil completo --casos leer_datos
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus
+
+DIRECTORIO_LINEAS_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lineas_base')
+
+
+class Caso:
+    """Un benchmark: función a medir, archivos del corpus que usa y unidad de rendimiento"""
+
+    def __init__(self, nombre, funcion, unidad, tabla=None, pdf=None, repeticiones=3, **parametros):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.unidad = unidad
+        self.tabla = tabla
+        self.pdf = pdf
+        self.repeticiones = repeticiones
+        self.parametros = parametros
+
+    def preparar(self):
+        """Genera (o reutiliza) los archivos del corpus y devuelve los argumentos del caso"""
+        argumentos = dict(self.parametros)
+        if self.tabla:
+            argumentos['ruta_tabla'] = corpus.obtener_tabla(*self.tabla)
+        if self.pdf:
+            argumentos['ruta_pdf'] = corpus.obtener_pdf(*self.pdf)
+        return argumentos
+
+
+# --- Puntos de entrada medidos (corren en el proceso hijo) ---
+
+def _posiciones(orientacion):
+    from pdf_masivo import POSICIONES_POR_DEFECTO
+    return POSICIONES_POR_DEFECTO[orientacion]
+
+
+def medir_leer_datos(ruta_tabla):
+    """leer_datos_excel: tabla -> índice de códigos (sin caché)"""
+    from pdf_masivo import leer_datos_por_bloques
+
+    def correr():
+        _, info = leer_datos_por_bloques(ruta_tabla)
+        return info['filas']
+    return correr
+
+
+def medir_editar(ruta_pdf, estampado='clasico', guardado='completo', orientacion='vertical', veces=1):
+    """editar_pdf: estampar un PDF y guardarlo en disco (veces seguidas por repetición)"""
+    from pdf_masivo import SelloPreparado, procesar_documento
+
+    posiciones = _posiciones(orientacion)
+    sello = SelloPreparado(posiciones, orientacion) if estampado == 'preparado' else None
+    datos = {'PLANO': {'sistema': 'SIS-1', 'subsistema': 'SUB-1'}}
+    # Se borra al terminar el proceso hijo
+    directorio = tempfile.TemporaryDirectory()
+
+    def correr():
+        for _ in range(veces):
+            resultado = procesar_documento(
+                'PLANO.pdf', ruta_pdf, datos, posiciones, orientacion,
+                directorio_salida=directorio.name, sello=sello, guardado=guardado
+            )
+            assert resultado['ok'], resultado['error']
+        return resultado['metricas']['paginas'] * veces
+    return correr
+
+
+def medir_procesar_lote(ruta_pdf, archivos, workers=None, orientacion='vertical'):
+    """procesar_lote: muchos PDFs en paralelo directo a un ZIP"""
+    from pdf_masivo import SelloPreparado, escribir_en_zip, iterar_lote
+
+    with open(ruta_pdf, 'rb') as f:
+        contenido = f.read()
+    posiciones = _posiciones(orientacion)
+    codigos = [corpus.codigo_sintetico(i) for i in range(archivos)]
+    datos = {codigo: {'sistema': 'SIS-1', 'subsistema': 'SUB-1'} for codigo in codigos}
+
+    def correr():
+        with tempfile.TemporaryFile() as destino:
+            lote = iterar_lote(
+                ((f"{codigo}.pdf", contenido) for codigo in codigos), datos, posiciones, orientacion,
+                max_workers=workers, en_memoria=True, sello=SelloPreparado(posiciones, orientacion)
+            )
+            completados = sum(1 for r in escribir_en_zip(lote, destino) if r['ok'])
+        assert completados == archivos
+        return archivos
+    return correr
+
+
+def medir_vista_previa(ruta_pdf, formato='png', veces=1):
+    """generar_pdf_coordenadas: primera página con cuadrícula"""
+    from pdf_masivo import generar_vista_previa
+
+    def correr():
+        for _ in range(veces):
+            generar_vista_previa(ruta_pdf, _posiciones('vertical'), formato=formato)
+        return veces
+    return correr
+
+
+# --- Perfiles ---
+
+def _casos_rapidos():
+    return [
+        Caso('leer_datos/10k-estrecha-xlsx', 'medir_leer_datos', 'filas', tabla=(10_000, 'estrecha', 'xlsx')),
+        Caso('leer_datos/10k-ancha-xlsx', 'medir_leer_datos', 'filas', tabla=(10_000, 'ancha', 'xlsx')),
+        Caso('leer_datos/100k-estrecha-csv', 'medir_leer_datos', 'filas', tabla=(100_000, 'estrecha', 'csv')),
+        Caso('leer_datos/100k-ancha-csv', 'medir_leer_datos', 'filas', tabla=(100_000, 'ancha', 'csv')),
+        Caso('editar/1p-vertical-clasico', 'medir_editar', 'páginas', pdf=(1, False, 'vertical'),
+             repeticiones=5, veces=100),
+        Caso('editar/1p-horizontal-preparado', 'medir_editar', 'páginas', pdf=(1, False, 'horizontal'),
+             repeticiones=5, veces=100, estampado='preparado', orientacion='horizontal'),
+        Caso('editar/100p-imagenes-completo', 'medir_editar', 'páginas', pdf=(100, True, 'horizontal'),
+             repeticiones=5, veces=10, estampado='preparado'),
+        Caso('editar/100p-imagenes-incremental', 'medir_editar', 'páginas', pdf=(100, True, 'horizontal'),
+             repeticiones=5, veces=10, estampado='preparado', guardado='incremental'),
+        Caso('procesar_lote/200x1p', 'medir_procesar_lote', 'archivos', pdf=(1, False, 'vertical'), archivos=200),
+        Caso('vista_previa/a4', 'medir_vista_previa', 'vistas', pdf=(1, False, 'vertical'), repeticiones=5, veces=3),
+        Caso('vista_previa/a1', 'medir_vista_previa', 'vistas', pdf=(1, True, 'plano'), repeticiones=5, veces=3),
+    ]
+
+
+def _casos_completos():
+    casos = _casos_rapidos()
+    for filas in (100_000, 1_000_000):
+        for ancho in ('estrecha', 'ancha'):
+            casos.append(Caso(
+                f'leer_datos/{filas // 1000}k-{ancho}-xlsx', 'medir_leer_datos', 'filas',
+                tabla=(filas, ancho, 'xlsx'), repeticiones=1
+            ))
+    casos += [
+        Caso('leer_datos/1000k-ancha-csv', 'medir_leer_datos', 'filas', tabla=(1_000_000, 'ancha', 'csv'),
+             repeticiones=1),
+        Caso('leer_datos/1000k-ancha-parquet', 'medir_leer_datos', 'filas',
+             tabla=(1_000_000, 'ancha', 'parquet'), repeticiones=1),
+        Caso('editar/1000p-vertical-completo', 'medir_editar', 'páginas', pdf=(1000, False, 'vertical'),
+             estampado='preparado'),
+        Caso('editar/1000p-imagenes-completo', 'medir_editar', 'páginas', pdf=(1000, True, 'horizontal'),
+             estampado='preparado'),
+        Caso('editar/1000p-imagenes-incremental', 'medir_editar', 'páginas', pdf=(1000, True, 'horizontal'),
+             estampado='preparado', guardado='incremental'),
+        Caso('procesar_lote/2000x1p', 'medir_procesar_lote', 'archivos', pdf=(1, False, 'vertical'),
+             archivos=2000, repeticiones=1),
+        Caso('procesar_lote/200x100p-imagenes', 'medir_procesar_lote', 'archivos', pdf=(100, True, 'horizontal'),
+             archivos=200, repeticiones=1),
+    ]
+    return casos
+
+
+PERFILES = {
+    'rapido': _casos_rapidos,
+    'completo': _casos_completos,
+}
+
+
+def casos_del_perfil(perfil, filtros=None):
+    """Casos del perfil cuyo nombre empieza con alguno de los filtros"""
+    casos = PERFILES[perfil]()
+    if filtros:
+        casos = [c for c in casos if any(c.nombre.startswith(f) for f in filtros)]
+    return casos
+
+
+# --- Ejecución ---
+
+def _correr_en_hijo(funcion, argumentos, repeticiones, conexion):
+    """Cuerpo del proceso hijo: prepara, mide cada repetición y devuelve tiempos y memoria"""
+    try:
+        from pdf_masivo.metricas import rss_pico
+
+        correr = globals()[funcion](**argumentos)
+        if repeticiones >= 3:
+            # Calentamiento: importaciones perezosas, fuentes y cachés de PyMuPDF
+            correr()
+        segundos = []
+        unidades = 0
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            unidades = correr()
+            segundos.append(time.perf_counter() - inicio)
+        conexion.send({'segundos': segundos, 'unidades': unidades, 'rss_pico': rss_pico()})
+    except Exception as e:
+        conexion.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conexion.close()
+
+
+def correr_caso(caso):
+    """Mide un caso en un proceso nuevo y devuelve su registro"""
+    argumentos = caso.preparar()
+    contexto = multiprocessing.get_context('spawn')
+    recibir, enviar = contexto.Pipe(duplex=False)
+    proceso = contexto.Process(
+        target=_correr_en_hijo, args=(caso.funcion, argumentos, caso.repeticiones, enviar)
+    )
+    proceso.start()
+    enviar.close()
+    try:
+        medicion = recibir.recv()
+    except EOFError:
+        # El hijo terminó sin enviar nada (por ejemplo, lo mató el sistema por memoria)
+        medicion = None
+    proceso.join()
+    if medicion is None:
+        return {'caso': caso.nombre, 'error': f"el proceso terminó sin medir (código {proceso.exitcode})"}
+
+    if 'error' in medicion:
+        return {'caso': caso.nombre, 'error': medicion['error']}
+
+    mediana = statistics.median(medicion['segundos'])
+    return {
+        'caso': caso.nombre,
+        'repeticiones': len(medicion['segundos']),
+        'mediana': round(mediana, 6),
+        'minimo': round(min(medicion['segundos']), 6),
+        'rendimiento': round(medicion['unidades'] / mediana, 2) if mediana else None,
+        'unidad': caso.unidad,
+        'rss_pico': medicion['rss_pico'],
+    }
+
+
+def datos_del_equipo():
+    """Datos de la máquina: una línea base solo es comparable en el mismo equipo"""
+    import fitz
+    import pandas as pd
+    return {
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pymupdf': fitz.VersionBind,
+        'pandas': pd.__version__,
+    }
+
+
+def comparar(mediciones, linea_base, tolerancia, tolerancia_memoria):
+    """Agrega a cada medición la variación contra la línea base y marca las regresiones"""
+    anteriores = {m['caso']: m for m in linea_base.get('mediciones', [])}
+    regresiones = []
+    for medicion in mediciones:
+        anterior = anteriores.get(medicion['caso'])
+        if 'error' in medicion or not anterior or 'error' in anterior:
+            continue
+        # Se compara el mínimo: es el menos sensible al ruido de la máquina
+        medicion['variacion'] = round(medicion['minimo'] / anterior['minimo'] - 1, 4)
+        lenta = medicion['variacion'] > tolerancia
+        pesada = bool(
+            medicion['rss_pico'] and anterior.get('rss_pico')
+            and medicion['rss_pico'] > anterior['rss_pico'] * (1 + tolerancia_memoria)
+        )
+        medicion['regresion'] = lenta or pesada
+        if medicion['regresion']:
+            regresiones.append(medicion['caso'])
+    return regresiones
+
+
+def _formato_variacion(medicion):
+    if 'variacion' not in medicion:
+        return '-'
+    marca = '  REGRESIÓN' if medicion.get('regresion') else ''
+    return f"{medicion['variacion'] * 100:+.1f}%{marca}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--perfil', choices=sorted(PERFILES), default='rapido')
+    parser.add_argument('--casos', nargs='*', help="Prefijos de los casos a correr (por ejemplo leer_datos editar/1p)")
+    parser.add_argument('--linea-base', help="Archivo de línea base (por defecto lineas_base/<perfil>.json)")
+    parser.add_argument('--guardar-linea-base', action='store_true', help="Guardar estas mediciones como línea base")
+    parser.add_argument('--tolerancia', type=float, default=0.20, help="Lentitud admitida antes de marcar regresión")
+    parser.add_argument('--tolerancia-memoria', type=float, default=0.25)
+    parser.add_argument('--salida', help="Guardar las mediciones de esta ejecución en un JSON")
+    args = parser.parse_args()
+
+    ruta_base = args.linea_base or os.path.join(DIRECTORIO_LINEAS_BASE, f"{args.perfil}.json")
+    linea_base = {}
+    if os.path.exists(ruta_base):
+        with open(ruta_base, encoding='utf-8') as f:
+            linea_base = json.load(f)
+
+    equipo = datos_del_equipo()
+    if linea_base and linea_base.get('equipo') != equipo:
+        print("Aviso: la línea base es de otro equipo o de otras versiones; las comparaciones son orientativas",
+              file=sys.stderr)
+
+    print(f"{'caso':<36} {'mediana s':>10} {'mínimo s':>10} {'rendimiento':>20} {'RSS MB':>8} {'vs. base':>18}")
+    mediciones = []
+    for caso in casos_del_perfil(args.perfil, args.casos):
+        medicion = correr_caso(caso)
+        mediciones.append(medicion)
+        comparar([medicion], linea_base, args.tolerancia, args.tolerancia_memoria)
+        if 'error' in medicion:
+            print(f"{caso.nombre:<36} ERROR: {medicion['error']}")
+            continue
+        rendimiento = f"{medicion['rendimiento']:,.1f} {medicion['unidad']}/s"
+        print(
+            f"{caso.nombre:<36} {medicion['mediana']:>10.4f} {medicion['minimo']:>10.4f} {rendimiento:>20} "
+            f"{(medicion['rss_pico'] or 0) / 1e6:>8.0f} {_formato_variacion(medicion):>18}"
+        )
+
+    regresiones = [m['caso'] for m in mediciones if m.get('regresion')]
+    errores = [m['caso'] for m in mediciones if 'error' in m]
+    ejecucion = {'perfil': args.perfil, 'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'), 'equipo': equipo,
+                 'mediciones': mediciones}
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(ejecucion, f, ensure_ascii=False, indent=2)
+
+    if args.guardar_linea_base:
+        # Se conservan los casos de la línea base que no se corrieron esta vez
+        medidos = {m['caso'] for m in mediciones}
+        anteriores = [m for m in linea_base.get('mediciones', []) if m['caso'] not in medidos]
+        nuevas = [
+            {clave: valor for clave, valor in m.items() if clave not in ('variacion', 'regresion')}
+            for m in mediciones if 'error' not in m
+        ]
+        ejecucion['mediciones'] = anteriores + nuevas
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_base)), exist_ok=True)
+        with open(ruta_base, 'w', encoding='utf-8') as f:
+            json.dump(ejecucion, f, ensure_ascii=False, indent=2)
+        print(f"Línea base guardada en {ruta_base}")
+    elif not linea_base:
+        print("Sin línea base para comparar: usar --guardar-linea-base para fijarla")
+
+    if regresiones:
+        print(f"{len(regresiones)} regresiones: {', '.join(regresiones)}", file=sys.stderr)
+    return 1 if regresiones or errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
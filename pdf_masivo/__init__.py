@@ -0,0 +1,159 @@
+# __init__.py
+"""Estampado masivo de PDFs con datos de Excel, sin interfaz"""
+from .nucleo import (
+    PERFILES_SALIDA,
+    POSICIONES_POR_DEFECTO,
+    abrir_documento,
+    armar_resultado,
+    cargar_tabla,
+    cerrar_procesos,
+    codigo_desde_nombre,
+    columna_limpia,
+    construir_datos,
+    copiar_original,
+    escribir_reporte,
+    estampar_campos,
+    estampar_primera_pagina,
+    extraer_portada,
+    guardar_incremental,
+    iterar_lote,
+    leer_datos,
+    listar_pdfs,
+    mapear_columnas,
+    medidas_primera_pagina,
+    obtener_valor,
+    opciones_guardado,
+    perfiles_disponibles,
+    procesar_documento,
+    ruta_salida_para,
+)
+from .cruce import (
+    NORMALIZACIONES,
+    DatosCruzados,
+    IndiceNormalizado,
+    cruzar_nombres,
+    datos_cruzados,
+    filtrar_trabajos,
+    normalizar_codigo,
+    obtener_indice_normalizado,
+)
+from .entrada import (
+    iterar_pdfs,
+    origen_desde_subida,
+    trabajos_desde_directorio,
+    trabajos_desde_ruta,
+    trabajos_desde_subidas,
+)
+from .indice import (
+    IndiceCodigos,
+    huella_archivo,
+    limpiar_cache,
+    obtener_indice,
+)
+from .lectura import (
+    leer_datos_por_bloques,
+    leer_encabezado,
+    tipo_tabla,
+)
+from .manifiesto import (
+    Manifiesto,
+    huella_ajustes,
+    iterar_lote_reanudable,
+)
+from .metricas import (
+    escribir_metricas,
+    exportar_metricas,
+    perfilar,
+    resumir_metricas,
+)
+from .plantilla import (
+    ANCLAS,
+    TAMANOS_PAPEL,
+    Plantilla,
+    cargar_plantilla,
+    descripcion_pagina,
+    nombre_papel,
+    plantilla_desde_posiciones,
+)
+from .registro import RegistroResultados
+from .sello import SelloPreparado
+from .tareas import (
+    GestorTareas,
+    Tarea,
+)
+from .salida import (
+    escribir_en_zip,
+    escribir_portadas,
+    nombre_en_zip,
+)
+from .vista_previa import generar_vista_previa
+
+__all__ = [
+    'ANCLAS',
+    'DatosCruzados',
+    'GestorTareas',
+    'IndiceCodigos',
+    'IndiceNormalizado',
+    'Manifiesto',
+    'NORMALIZACIONES',
+    'PERFILES_SALIDA',
+    'POSICIONES_POR_DEFECTO',
+    'Plantilla',
+    'RegistroResultados',
+    'SelloPreparado',
+    'TAMANOS_PAPEL',
+    'Tarea',
+    'abrir_documento',
+    'armar_resultado',
+    'cargar_plantilla',
+    'cargar_tabla',
+    'cerrar_procesos',
+    'codigo_desde_nombre',
+    'columna_limpia',
+    'construir_datos',
+    'copiar_original',
+    'cruzar_nombres',
+    'datos_cruzados',
+    'descripcion_pagina',
+    'escribir_en_zip',
+    'escribir_metricas',
+    'escribir_portadas',
+    'escribir_reporte',
+    'estampar_campos',
+    'estampar_primera_pagina',
+    'exportar_metricas',
+    'extraer_portada',
+    'filtrar_trabajos',
+    'generar_vista_previa',
+    'guardar_incremental',
+    'huella_ajustes',
+    'huella_archivo',
+    'iterar_lote',
+    'iterar_lote_reanudable',
+    'iterar_pdfs',
+    'leer_datos',
+    'leer_datos_por_bloques',
+    'leer_encabezado',
+    'limpiar_cache',
+    'listar_pdfs',
+    'mapear_columnas',
+    'medidas_primera_pagina',
+    'nombre_en_zip',
+    'nombre_papel',
+    'normalizar_codigo',
+    'obtener_indice',
+    'obtener_indice_normalizado',
+    'obtener_valor',
+    'opciones_guardado',
+    'origen_desde_subida',
+    'perfilar',
+    'perfiles_disponibles',
+    'plantilla_desde_posiciones',
+    'procesar_documento',
+    'resumir_metricas',
+    'ruta_salida_para',
+    'tipo_tabla',
+    'trabajos_desde_directorio',
+    'trabajos_desde_ruta',
+    'trabajos_desde_subidas',
+]
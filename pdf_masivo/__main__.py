@@ -0,0 +1,409 @@
+# __main__.py
+"""Estampado masivo de PDFs desde la línea de comandos
+
+Ejemplo:
+    python -m pdf_masivo --datos lista.xlsx --pdfs planos/ --salida editados/ \\
+        --orientacion vertical --reporte reporte.json
+    python -m pdf_masivo --datos lista.xlsx --pdfs '/planos/**/*.pdf' --salida editados/ \\
+        --guardado incremental
+
+Antes de abrir ningún PDF se cruzan los nombres con la tabla (ver
+cruce.py): solo se procesan los que coinciden y se informan los que no
+tienen datos o son ambiguos. --revisar solo muestra ese cruce y
+--normalizar permite coincidencias sin distinguir mayúsculas, espacios,
+sufijos de revisión o ceros a la izquierda:
+    python -m pdf_masivo --datos lista.xlsx --pdfs planos/ --revisar \\
+        --normalizar mayusculas revision
+
+Con --plantilla se estampan los campos de una plantilla JSON (cualquier
+columna de la tabla, cada una con su posición, tamaño, rotación, fuente y
+color; ver plantilla.py) en lugar de sistema, subsistema y código:
+    python -m pdf_masivo --datos lista.xlsx --pdfs planos/ --salida editados/ \\
+        --plantilla sello.json
+
+En lotes que mezclan tamaños de página (A3, A1, carta, páginas rotadas),
+--ancla mide las posiciones desde una esquina de la página tal como se ve
+o en proporción a su tamaño. Las posiciones se toman como medidas en el
+PDF de --referencia (por defecto, el primero del lote) y se recalculan una
+vez por cada tamaño de página:
+    python -m pdf_masivo --datos lista.xlsx --pdfs planos/ --salida editados/ \\
+        --posiciones 1100,700 1100,720 1100,740 --ancla inferior-derecha --referencia A3.pdf
+
+--perfil-salida elige entre velocidad y tamaño de los PDFs: 'rapido' (sin
+recomprimir, por defecto), 'compacto' (quita objetos sin uso y comprime
+streams y tabla de objetos) o 'web' (además linealiza; necesita PyMuPDF
+1.25 o anterior). La compresión se reparte entre los procesos. --nivel-zip
+comprime el ZIP con deflate del nivel indicado:
+    python -m pdf_masivo --datos lista.xlsx --pdfs planos/ --zip editados.zip \\
+        --perfil-salida compacto --nivel-zip 1
+
+Los resultados por archivo se guardan en un archivo temporal (ver
+registro.py) y el reporte y las métricas se escriben desde ahí, así que
+la memoria no crece con la cantidad de PDFs.
+
+Para las portadas de una transmisión, --portadas une en un solo PDF la
+primera página estampada de cada archivo, con un marcador por archivo (y
+con --indice-portadas, un índice al principio). Sin --salida ni --zip
+solo se estampa y copia la primera página, sin cargar el resto de cada
+PDF; --solo-portada hace lo mismo con los archivos de --salida/--zip:
+    python -m pdf_masivo --datos lista.xlsx --pdfs planos/ --portadas portadas.pdf \\
+        --indice-portadas
+
+Con --salida el lote es reanudable: los PDFs ya estampados con los mismos
+datos y posiciones se omiten (ver manifiesto.py). --forzar procesa todo.
+
+Termina con código 1 si algún archivo no pudo procesarse y con 2 si la
+plantilla pide columnas que la tabla no tiene.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from functools import partial
+
+from .nucleo import (
+    PERFILES_SALIDA,
+    POSICIONES_POR_DEFECTO,
+    escribir_reporte,
+    iterar_lote,
+    medidas_primera_pagina,
+    opciones_guardado,
+)
+from .cruce import NORMALIZACIONES, cruzar_nombres, datos_cruzados, filtrar_trabajos
+from .entrada import trabajos_desde_ruta
+from .indice import DIRECTORIO_CACHE, obtener_indice
+from .lectura import leer_datos_por_bloques
+from .manifiesto import iterar_lote_reanudable
+from .metricas import escribir_metricas, perfilar, resumir_metricas
+from .plantilla import ANCLAS, cargar_plantilla, descripcion_pagina, plantilla_desde_posiciones
+from .registro import RegistroResultados
+from .salida import escribir_en_zip, escribir_portadas
+from .sello import SelloPreparado
+
+
+def _leer_posicion(texto):
+    """Convierte 'x,y' en {'x': x, 'y': y}"""
+    try:
+        x, y = texto.split(',')
+        return {'x': float(x), 'y': float(y)}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Posición inválida '{texto}', se espera x,y")
+
+
+def crear_parser():
+    """Define los argumentos de la línea de comandos"""
+    parser = argparse.ArgumentParser(
+        prog="python -m pdf_masivo",
+        description="Inserta sistema, subsistema y código en la primera página de cada PDF"
+    )
+    parser.add_argument('--datos', required=True, help="Excel (.xlsx/.xls), CSV o Parquet con los códigos")
+    parser.add_argument(
+        '--pdfs', required=True,
+        help="Carpeta con los PDFs a procesar o patrón glob (entre comillas, por ejemplo 'planos/**/*.pdf')"
+    )
+    parser.add_argument('--recursivo', action='store_true', help="Incluir los PDFs de las subcarpetas")
+    destino = parser.add_mutually_exclusive_group()
+    destino.add_argument('--salida', help="Directorio donde guardar los PDFs editados")
+    destino.add_argument('--zip', help="Archivo ZIP donde guardar los PDFs editados")
+    parser.add_argument(
+        '--portadas', metavar='RUTA.pdf',
+        help="PDF con la primera página estampada de cada PDF, con un marcador por archivo "
+             "(solo, o además de --salida/--zip)"
+    )
+    parser.add_argument(
+        '--indice-portadas', action='store_true',
+        help="Con --portadas, agregar al principio un índice con enlaces a cada portada"
+    )
+    parser.add_argument(
+        '--solo-portada', action='store_true',
+        help="Guardar en --salida/--zip solo la primera página estampada de cada PDF"
+    )
+    parser.add_argument('--comprimir', action='store_true', help="Comprimir los PDFs dentro del ZIP (deflate)")
+    parser.add_argument(
+        '--nivel-zip', type=int, choices=range(1, 10), metavar='1-9',
+        help="Nivel de deflate del ZIP: 1 más rápido, 9 más chico (implica --comprimir)"
+    )
+    parser.add_argument(
+        '--revisar', action='store_true',
+        help="Solo cruzar los nombres con la tabla y listar los PDFs sin datos o ambiguos (no estampa nada)"
+    )
+    parser.add_argument(
+        '--normalizar', nargs='+', choices=NORMALIZACIONES, default=[], metavar='OPCION',
+        help="Al cruzar nombres, ignorar: mayusculas, espacios, revision (sufijos como -R02) "
+             "y/o ceros (a la izquierda)"
+    )
+    parser.add_argument('--orientacion', choices=['vertical', 'horizontal'], default='vertical')
+    parser.add_argument(
+        '--posiciones', nargs=3, type=_leer_posicion, metavar='X,Y',
+        help="Posiciones de sistema, subsistema y código (por defecto según orientación)"
+    )
+    parser.add_argument(
+        '--plantilla', metavar='RUTA.json',
+        help="Plantilla de campos del sello (reemplaza a --posiciones y --orientacion)"
+    )
+    parser.add_argument(
+        '--ancla', choices=ANCLAS,
+        help="Medir las posiciones (o los campos sin ancla de la plantilla) desde esa esquina de la "
+             "página, o en proporción a su tamaño ('relativa'), para lotes con varios tamaños de página"
+    )
+    parser.add_argument(
+        '--referencia', metavar='RUTA.pdf',
+        help="Con --ancla, PDF en el que se midieron las posiciones (por defecto, el primero del lote)"
+    )
+    parser.add_argument(
+        '--estampado', choices=['preparado', 'clasico'], default='preparado',
+        help="'preparado' arma el sello una vez por lote; 'clasico' usa insert_text en cada PDF"
+    )
+    parser.add_argument(
+        '--guardado', choices=['completo', 'incremental'], default='completo',
+        help="'incremental' copia el original y solo agrega el cambio de la primera página"
+    )
+    parser.add_argument(
+        '--perfil-salida', choices=list(PERFILES_SALIDA), default='rapido',
+        help="'rapido' guarda sin recomprimir; 'compacto' achica los PDFs (garbage, deflate, "
+             "object streams); 'web' los comprime y linealiza"
+    )
+    parser.add_argument(
+        '--forzar', action='store_true',
+        help="Con --salida, volver a estampar también los PDFs que el manifiesto da por terminados"
+    )
+    parser.add_argument('--workers', type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument('--cache', default=DIRECTORIO_CACHE, help="Directorio de la caché de índices de datos")
+    parser.add_argument('--sin-cache', action='store_true', help="Leer siempre la tabla de datos sin usar la caché")
+    parser.add_argument('--reporte', help="Ruta del reporte (.json o .csv)")
+    parser.add_argument(
+        '--metricas',
+        help="Ruta de las métricas por etapa y por archivo (.json con resumen, o .csv)"
+    )
+    parser.add_argument(
+        '--perfil', metavar='RUTA.prof',
+        help="Perfilar con cProfile y guardar las estadísticas (usa un solo proceso si no se indica --workers)"
+    )
+    parser.add_argument(
+        '--memoria', action='store_true',
+        help="Seguir las reservas de memoria con tracemalloc y mostrar las líneas que más reservan"
+    )
+    parser.add_argument('-q', '--quiet', action='store_true', help="No mostrar el progreso por archivo")
+    return parser
+
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos"""
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if not args.revisar and not (args.salida or args.zip or args.portadas):
+        parser.error("se requiere --salida, --zip o --portadas (o --revisar)")
+    if args.indice_portadas and not args.portadas:
+        parser.error("--indice-portadas solo se usa con --portadas")
+    if not (args.salida or args.zip):
+        # Sin documentos de salida, solo hace falta estampar la primera página
+        args.solo_portada = True
+    if args.plantilla:
+        try:
+            args.plantilla = cargar_plantilla(args.plantilla)
+        except (OSError, ValueError) as e:
+            parser.error(f"plantilla inválida: {e}")
+    try:
+        opciones_guardado(args.perfil_salida, args.guardado, args.solo_portada)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.nivel_zip:
+        args.comprimir = True
+    if args.referencia and not args.ancla:
+        parser.error("--referencia solo se usa con --ancla")
+    if args.referencia and not os.path.isfile(args.referencia):
+        parser.error(f"no existe el PDF de referencia: {args.referencia}")
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+
+    if args.perfil and args.workers is None:
+        # cProfile solo ve el proceso actual
+        args.workers = 1
+
+    with perfilar(args.perfil, args.memoria) as informe:
+        codigo = _ejecutar(args, parser)
+
+    if args.perfil:
+        print(f"Perfil guardado en {informe['perfil']}", file=sys.stderr)
+    if args.memoria:
+        print(f"Pico de memoria seguida: {informe['memoria_pico'] / 1e6:.1f} MB", file=sys.stderr)
+        for linea in informe['asignaciones']:
+            print(f"  {linea}", file=sys.stderr)
+    return codigo
+
+
+def _mostrar_cruce(cruce, completo=False, ejemplos=5):
+    """Resumen del cruce de nombres; con completo=True lista todos los PDFs sin datos o ambiguos"""
+    coincidencias = len(cruce['coincidencias'])
+    normalizadas = f" ({len(cruce['normalizadas'])} al normalizar)" if cruce['normalizadas'] else ""
+    print(
+        f"Cruce de nombres: {coincidencias}/{cruce['total']} PDFs con datos{normalizadas}, "
+        f"{len(cruce['sin_datos'])} sin datos, {len(cruce['ambiguos'])} ambiguos",
+        file=sys.stderr
+    )
+    limite = None if completo else ejemplos
+    for nombre in cruce['sin_datos'][:limite]:
+        print(f"  sin datos: {nombre}", file=sys.stderr)
+    for nombre, codigos in list(cruce['ambiguos'].items())[:limite]:
+        print(f"  ambiguo:   {nombre} -> {', '.join(codigos)}", file=sys.stderr)
+    if not completo and max(len(cruce['sin_datos']), len(cruce['ambiguos'])) > ejemplos:
+        print("  ... (--revisar para ver la lista completa)", file=sys.stderr)
+    if completo:
+        for nombre in cruce['normalizadas']:
+            print(f"  normalizado: {nombre} -> {cruce['coincidencias'][nombre]}", file=sys.stderr)
+
+
+def _ejecutar(args, parser):
+    """Lee los datos, procesa el lote y escribe reporte y métricas (los errores de uso, con parser)"""
+    posiciones = args.posiciones or POSICIONES_POR_DEFECTO[args.orientacion]
+    # Columnas adicionales que pide la plantilla (el índice en caché depende de ellas)
+    campos = args.plantilla.columnas() if args.plantilla else {}
+    lector = partial(leer_datos_por_bloques, campos=campos)
+    inicio = time.perf_counter()
+    if args.sin_cache:
+        datos, info = lector(args.datos)
+    else:
+        datos, _ = obtener_indice(
+            args.datos, lector, args.cache, variante=json.dumps(campos, sort_keys=True) if campos else None
+        )
+        info = datos.info
+    etapas_lote = {'datos': round(time.perf_counter() - inicio, 6)}
+
+    faltantes = [campo for campo in campos if info['columnas_mapeadas'].get(campo) is None]
+    if faltantes:
+        print(
+            "La tabla no tiene las columnas que pide la plantilla: "
+            + ", ".join(f"'{campos[campo]}'" for campo in faltantes)
+            + f" (columnas: {', '.join(map(str, info['columnas']))})",
+            file=sys.stderr
+        )
+        return 2
+
+    print(f"{len(datos)} registros cargados", file=sys.stderr)
+
+    # Cruce previo: solo nombres de archivo, sin abrir ningún PDF
+    try:
+        pares = list(trabajos_desde_ruta(args.pdfs, recursivo=args.recursivo))
+    except FileNotFoundError:
+        parser.error(f"no existe la carpeta: {args.pdfs}")
+    cruce = cruzar_nombres(
+        (nombre for nombre, _ in pares), datos,
+        **{opcion: True for opcion in args.normalizar}
+    )
+    _mostrar_cruce(cruce, completo=args.revisar)
+    if args.revisar:
+        return 0 if not cruce['sin_datos'] and not cruce['ambiguos'] else 1
+
+    if args.salida:
+        os.makedirs(args.salida, exist_ok=True)
+
+    trabajos = filtrar_trabajos(pares, cruce)
+    datos = datos_cruzados(cruce, datos)
+    plantilla = args.plantilla
+    if args.ancla:
+        if not pares:
+            parser.error(f"--ancla: no hay PDFs de entrada en {args.pdfs}")
+        referencia = args.referencia or pares[0][1]
+        try:
+            ancho, alto, rotacion = medidas_primera_pagina(referencia)
+        except (RuntimeError, ValueError, OSError) as e:
+            # PyMuPDF informa los PDFs dañados o vacíos con subclases de RuntimeError
+            parser.error(f"no se pudo leer el PDF de referencia {referencia}: {e}")
+        plantilla = plantilla or plantilla_desde_posiciones(posiciones, args.orientacion)
+        plantilla = plantilla.anclada(args.ancla, ancho, alto, rotacion)
+        print(
+            f"Posiciones ancladas ({args.ancla}) a partir de {referencia} "
+            f"({descripcion_pagina(ancho, alto)})",
+            file=sys.stderr
+        )
+    if plantilla:
+        sello = SelloPreparado(plantilla=plantilla, clasico=args.estampado == 'clasico')
+    else:
+        sello = SelloPreparado(posiciones, args.orientacion) if args.estampado == 'preparado' else None
+    if args.salida:
+        lote = iterar_lote_reanudable(
+            trabajos, datos, posiciones, args.orientacion, args.salida,
+            max_workers=args.workers, forzar=args.forzar, sello=sello, guardado=args.guardado,
+            perfil_salida=args.perfil_salida, portada=args.solo_portada
+        )
+    else:
+        lote = iterar_lote(
+            trabajos, datos, posiciones, args.orientacion,
+            max_workers=args.workers, en_memoria=True, sello=sello, guardado=args.guardado,
+            perfil_salida=args.perfil_salida, portada=args.solo_portada
+        )
+    # Las portadas se unen en la misma pasada, antes de que el ZIP libere cada PDF
+    if args.portadas:
+        lote = escribir_portadas(lote, args.portadas, args.indice_portadas, args.perfil_salida)
+    if args.zip:
+        lote = escribir_en_zip(lote, args.zip, comprimir=args.comprimir, nivel=args.nivel_zip)
+
+    # Los resultados van a un archivo a medida que llegan: la memoria no crece con el lote
+    resultados = RegistroResultados()
+    try:
+        inicio = time.perf_counter()
+        for resultado in lote:
+            resultados.append(resultado)
+            if not args.quiet:
+                if resultado.get('omitido'):
+                    estado = "sin cambios, omitido"
+                else:
+                    estado = "OK" if resultado['ok'] else f"ERROR: {resultado['error']}"
+                print(f"[{len(resultados)}] {resultado['nombre']}: {estado}", file=sys.stderr)
+        segundos = time.perf_counter() - inicio
+
+        if args.reporte:
+            escribir_reporte(resultados, args.reporte)
+        if args.metricas:
+            escribir_metricas(resultados, args.metricas, segundos, etapas_lote)
+
+        resumen = resumir_metricas(resultados, segundos, etapas_lote)
+        completados = resumen['completados']
+        print(f"{completados}/{len(resultados)} archivos procesados correctamente", file=sys.stderr)
+        if resumen['omitidos']:
+            print(f"{resumen['omitidos']} sin cambios desde la ejecución anterior (omitidos)", file=sys.stderr)
+        if resumen['bytes_entrada']:
+            print(
+                f"Salida ({args.perfil_salida}): {resumen['bytes_entrada'] / 1e6:.1f} MB -> "
+                f"{resumen['bytes_salida'] / 1e6:.1f} MB "
+                f"({resumen['bytes_salida'] / resumen['bytes_entrada']:.0%} de la entrada)",
+                file=sys.stderr
+            )
+        if args.zip and os.path.exists(args.zip):
+            print(f"ZIP: {os.path.getsize(args.zip) / 1e6:.1f} MB", file=sys.stderr)
+        if args.portadas and os.path.exists(args.portadas):
+            print(
+                f"Portadas: {args.portadas} ({os.path.getsize(args.portadas) / 1e6:.1f} MB)",
+                file=sys.stderr
+            )
+        if resumen['tamanos_pagina']:
+            print(
+                "Tamaños de página: "
+                + ", ".join(f"{tamano} ({cantidad})" for tamano, cantidad in resumen['tamanos_pagina'].items()),
+                file=sys.stderr
+            )
+        if cruce['sin_datos'] or cruce['ambiguos']:
+            print(
+                f"{len(cruce['sin_datos'])} PDFs sin datos y {len(cruce['ambiguos'])} ambiguos "
+                f"no se procesaron",
+                file=sys.stderr
+            )
+        print(
+            f"{segundos:.1f} s de lote ({resumen['archivos_por_segundo'] or 0} archivos/s), "
+            f"{etapas_lote['datos']:.1f} s leyendo datos",
+            file=sys.stderr
+        )
+        for etapa, estadisticas in resumen['etapas'].items():
+            print(
+                f"  {etapa:<9} p50 {estadisticas['p50'] * 1000:8.1f} ms  p95 {estadisticas['p95'] * 1000:8.1f} ms  "
+                f"máx {estadisticas['max'] * 1000:8.1f} ms",
+                file=sys.stderr
+            )
+        return 0 if completados == len(resultados) else 1
+    finally:
+        resultados.borrar()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
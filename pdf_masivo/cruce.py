@@ -0,0 +1,190 @@
+# cruce.py
+"""Cruce previo de nombres de archivo con la tabla de datos
+
+Antes de abrir un solo PDF se cruzan los nombres de los archivos contra los
+códigos de la tabla y se informa qué archivos coinciden, cuáles no tienen
+datos y cuáles son ambiguos (coinciden con más de un código). El lote
+procesa solo los que coinciden.
+
+Primero se busca el código tal cual; si no está y se pidió alguna
+normalización, se busca la versión normalizada del nombre en un índice de
+claves normalizadas de la tabla:
+
+- mayusculas: no distingue mayúsculas de minúsculas
+- espacios: ignora los espacios
+- revision: ignora sufijos de revisión como '-R02', '_Rev3' o ' R1'
+- ceros: ignora los ceros a la izquierda de los números ('EQ-007' = 'EQ-7')
+
+El índice normalizado se arma una vez por tabla y combinación de opciones
+y se reutiliza entre lotes. El código que se estampa es siempre el de la
+tabla, no el del nombre del archivo.
+"""
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from .nucleo import codigo_desde_nombre
+
+NORMALIZACIONES = ('mayusculas', 'espacios', 'revision', 'ceros')
+
+_REVISION = re.compile(r'[\s_.-]+(?:REV|R)\.?\s*\d+$', re.IGNORECASE)
+_CEROS = re.compile(r'(?<![0-9])0+(?=[0-9])')
+
+# Índices normalizados de tablas guardadas, por (directorio del índice, opciones)
+_MAX_NORMALIZADOS = 4
+_normalizados = OrderedDict()
+_candado = threading.Lock()
+
+
+def _opciones(normalizacion):
+    """Opciones de normalización como tupla de booleanos en el orden de NORMALIZACIONES"""
+    desconocidas = set(normalizacion) - set(NORMALIZACIONES)
+    if desconocidas:
+        raise ValueError(f"Normalización desconocida: {', '.join(sorted(desconocidas))}")
+    return tuple(bool(normalizacion.get(nombre)) for nombre in NORMALIZACIONES)
+
+
+def normalizar_codigo(codigo, mayusculas=False, espacios=False, revision=False, ceros=False):
+    """Versión normalizada de un código según las opciones indicadas"""
+    if revision:
+        codigo = _REVISION.sub('', codigo.strip())
+    if espacios:
+        codigo = ''.join(codigo.split())
+    if mayusculas:
+        codigo = codigo.upper()
+    if ceros:
+        codigo = _CEROS.sub('', codigo)
+    return codigo
+
+
+class IndiceNormalizado:
+    """Busca los códigos de la tabla que corresponden al nombre de un archivo
+
+    El índice de claves normalizadas (clave -> códigos) se arma la primera
+    vez que un nombre no coincide tal cual.
+    """
+
+    def __init__(self, datos, **normalizacion):
+        self.datos = datos
+        self.opciones = dict(zip(NORMALIZACIONES, _opciones(normalizacion)))
+        self._claves = None
+
+    @property
+    def normaliza(self):
+        return any(self.opciones.values())
+
+    def normalizar(self, codigo):
+        return normalizar_codigo(codigo, **self.opciones)
+
+    def _indice(self):
+        if self._claves is None:
+            claves = {}
+            for codigo in self.datos:
+                claves.setdefault(self.normalizar(codigo), []).append(codigo)
+            self._claves = claves
+        return self._claves
+
+    def candidatos(self, nombre):
+        """Códigos de la tabla para el nombre: el exacto o, si no hay, los normalizados"""
+        codigo = codigo_desde_nombre(nombre)
+        if codigo in self.datos:
+            return [codigo]
+        if not self.normaliza:
+            return []
+        return self._indice().get(self.normalizar(codigo), [])
+
+
+def obtener_indice_normalizado(datos, **normalizacion):
+    """IndiceNormalizado para datos, reutilizando el de una tabla guardada si ya se armó"""
+    directorio = getattr(datos, 'directorio', None)
+    if not directorio:
+        return IndiceNormalizado(datos, **normalizacion)
+
+    clave = (directorio, _opciones(normalizacion))
+    with _candado:
+        if clave in _normalizados:
+            _normalizados.move_to_end(clave)
+            return _normalizados[clave]
+        indice = IndiceNormalizado(datos, **normalizacion)
+        _normalizados[clave] = indice
+        while len(_normalizados) > _MAX_NORMALIZADOS:
+            _normalizados.popitem(last=False)
+    return indice
+
+
+def cruzar_nombres(nombres, datos, **normalizacion):
+    """Cruza nombres de archivo con la tabla sin abrir ningún PDF
+
+    datos puede ser la tabla o un IndiceNormalizado. Devuelve un diccionario
+    con 'total', 'coincidencias' (nombre -> código de la tabla),
+    'normalizadas' (nombres que coincidieron solo al normalizar),
+    'sin_datos' (nombres) y 'ambiguos' (nombre -> códigos candidatos).
+    """
+    if isinstance(datos, IndiceNormalizado):
+        indice = datos
+    else:
+        indice = obtener_indice_normalizado(datos, **normalizacion)
+
+    cruce = {'total': 0, 'coincidencias': {}, 'normalizadas': [], 'sin_datos': [], 'ambiguos': {}}
+    for nombre in nombres:
+        cruce['total'] += 1
+        candidatos = indice.candidatos(nombre)
+        if len(candidatos) == 1:
+            cruce['coincidencias'][nombre] = candidatos[0]
+            if candidatos[0] != codigo_desde_nombre(nombre):
+                cruce['normalizadas'].append(nombre)
+        elif candidatos:
+            cruce['ambiguos'][nombre] = sorted(candidatos)
+        else:
+            cruce['sin_datos'].append(nombre)
+    return cruce
+
+
+def filtrar_trabajos(trabajos, cruce):
+    """Solo los pares (nombre, origen) que coincidieron en el cruce"""
+    coincidencias = cruce['coincidencias']
+    for nombre, origen in trabajos:
+        if nombre in coincidencias:
+            yield nombre, origen
+
+
+class DatosCruzados(Mapping):
+    """La tabla más los nombres que coincidieron al normalizar
+
+    Un código de archivo normalizado devuelve el registro de su código en
+    la tabla con ese código en 'codigo', que es el que se estampa. Los
+    códigos exactos se buscan en la tabla original, que viaja a los
+    procesos trabajadores como siempre (un índice guardado, como su ruta).
+    """
+
+    def __init__(self, datos, alias):
+        self.datos = datos
+        self.alias = alias
+
+    def __getitem__(self, codigo):
+        if codigo in self.alias:
+            original = self.alias[codigo]
+            return dict(self.datos[original], codigo=original)
+        return self.datos[codigo]
+
+    def __contains__(self, codigo):
+        return codigo in self.alias or codigo in self.datos
+
+    def __len__(self):
+        return len(self.datos) + len(self.alias)
+
+    def __iter__(self):
+        yield from self.datos
+        yield from self.alias
+
+
+def datos_cruzados(cruce, datos):
+    """Datos para procesar el lote del cruce (la misma tabla si no hubo normalizaciones)"""
+    if not cruce['normalizadas']:
+        return datos
+    alias = {
+        codigo_desde_nombre(nombre): cruce['coincidencias'][nombre]
+        for nombre in cruce['normalizadas']
+    }
+    return DatosCruzados(datos, alias)
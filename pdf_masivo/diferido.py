@@ -0,0 +1,49 @@
+# diferido.py
+"""Importación diferida de las bibliotecas pesadas (PyMuPDF, pandas, numpy)
+
+Importar el paquete no carga PyMuPDF, pandas ni numpy: cada módulo usa
+importar_diferido y la biblioteca se importa la primera vez que se usa
+uno de sus atributos. Así la aplicación pinta su primera pantalla sin
+pagar esas importaciones, que llegan recién con el primer archivo.
+
+La importación real la hace importlib.import_module, que bloquea a los
+demás hilos hasta que el módulo termina de cargarse (varias sesiones de
+Streamlit pueden pedirlo a la vez).
+"""
+import importlib
+import importlib.util
+import sys
+
+
+class ModuloDiferido:
+    """Representa un módulo que se importa al pedir el primer atributo"""
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+
+    @property
+    def cargado(self):
+        return self._modulo is not None
+
+    def __getattr__(self, atributo):
+        # Solo se llama para atributos que no son del propio objeto
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nombre)
+        return getattr(self._modulo, atributo)
+
+    def __repr__(self):
+        estado = 'cargado' if self.cargado else 'sin cargar'
+        return f"<módulo diferido '{self._nombre}' ({estado})>"
+
+
+def importar_diferido(nombre):
+    """El módulo si ya está importado o, si no, un ModuloDiferido que lo importa al usarlo
+
+    Si la biblioteca no está instalada falla en el momento, como import.
+    """
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    if importlib.util.find_spec(nombre) is None:
+        raise ModuleNotFoundError(f"No module named '{nombre}'", name=nombre)
+    return ModuloDiferido(nombre)
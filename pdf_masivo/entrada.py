@@ -0,0 +1,105 @@
+# entrada.py
+"""Origen de los PDFs a procesar sin copias innecesarias
+
+Un trabajo es un par (nombre, origen): el nombre decide el código a buscar
+y el origen es lo que abre PyMuPDF.
+
+- Archivos subidos (UploadedFile de Streamlit o cualquier BytesIO): el
+  origen es un memoryview sobre el buffer ya cargado, sin copiarlo a disco
+  ni a otro objeto bytes.
+- Directorios: el origen es la ruta; MuPDF lee el archivo a demanda, así
+  que tampoco se carga completo en memoria. La ruta además viaja sin costo
+  a los procesos trabajadores.
+- Carpetas o patrones glob del servidor (trabajos_desde_ruta): los PDFs se
+  recorren con un generador y cada nombre se compara con la tabla de datos
+  antes de abrir nada, así que los archivos sin datos no cuestan nada y un
+  juego de planos de decenas de GB nunca pasa por el navegador.
+"""
+import glob
+import os
+
+from .nucleo import codigo_desde_nombre, listar_pdfs
+
+
+def origen_desde_subida(archivo):
+    """Vista de solo lectura sobre el contenido de un archivo subido"""
+    if hasattr(archivo, 'getbuffer'):
+        return archivo.getbuffer().toreadonly()
+    return archivo.getvalue()
+
+
+def trabajos_desde_subidas(archivos):
+    """Pares (nombre, memoryview) para una lista de archivos subidos"""
+    for archivo in archivos:
+        yield archivo.name, origen_desde_subida(archivo)
+
+
+def trabajos_desde_directorio(directorio):
+    """Pares (nombre, ruta) para los PDFs de un directorio"""
+    for ruta in listar_pdfs(directorio):
+        yield ruta.name, str(ruta)
+
+
+def es_patron(fuente):
+    """Indica si la fuente es un patrón glob y no una carpeta"""
+    return glob.has_magic(str(fuente))
+
+
+def base_de_fuente(fuente):
+    """Carpeta desde la que se nombran los PDFs: la misma carpeta o la parte fija del patrón"""
+    fuente = os.path.expanduser(str(fuente))
+    if not es_patron(fuente):
+        return fuente
+    partes = []
+    for parte in fuente.replace('\\', '/').split('/'):
+        if glob.has_magic(parte):
+            break
+        partes.append(parte)
+    return '/'.join(partes) or '.'
+
+
+def iterar_pdfs(fuente, recursivo=False):
+    """Recorre de a uno los PDFs de una carpeta o de un patrón glob
+
+    Las carpetas se leen con os.scandir sin armar la lista completa; con
+    recursivo=True también las subcarpetas. En los patrones, '**' abarca
+    subcarpetas.
+    """
+    fuente = os.path.expanduser(str(fuente))
+    if es_patron(fuente):
+        for ruta in glob.iglob(fuente, recursive=True):
+            if ruta.lower().endswith('.pdf') and os.path.isfile(ruta):
+                yield ruta
+        return
+
+    if not os.path.isdir(fuente):
+        raise FileNotFoundError(f"No existe la carpeta: {fuente}")
+
+    pendientes = [fuente]
+    while pendientes:
+        with os.scandir(pendientes.pop()) as entradas:
+            for entrada in entradas:
+                if entrada.is_dir():
+                    if recursivo:
+                        pendientes.append(entrada.path)
+                elif entrada.name.lower().endswith('.pdf') and entrada.is_file():
+                    yield entrada.path
+
+
+def trabajos_desde_ruta(fuente, datos=None, recursivo=False, sin_datos=None):
+    """Pares (nombre, ruta) de una carpeta o patrón, solo para PDFs con datos
+
+    El nombre es la ruta relativa a la carpeta base, así que las subcarpetas
+    se conservan en la salida y dos PDFs iguales en carpetas distintas no se
+    pisan. Si se pasa datos, los archivos cuyo código no está en la tabla se
+    saltan sin abrirlos; si además se pasa la lista sin_datos, se agregan
+    ahí sus rutas para informarlas.
+    """
+    base = base_de_fuente(fuente)
+    for ruta in iterar_pdfs(fuente, recursivo):
+        nombre = os.path.relpath(ruta, base)
+        if datos is not None and codigo_desde_nombre(nombre) not in datos:
+            if sin_datos is not None:
+                sin_datos.append(ruta)
+            continue
+        yield nombre, ruta
@@ -0,0 +1,300 @@
+# indice.py
+"""Índice compacto y persistente de códigos
+
+Reemplaza el diccionario de diccionarios por arreglos de numpy:
+
+- codigos.npy: códigos ordenados (bytes UTF-8 de ancho fijo) para búsqueda binaria
+- registros.npy: una fila por código con el identificador del valor de
+  cada campo (sistema, subsistema y los campos adicionales mapeados)
+- metadatos.json: nombres de los campos, valores distintos (internados) e
+  información de la tabla original
+
+Los .npy se abren con mmap, así que cargar un índice guardado toma
+milisegundos y todas las sesiones y procesos trabajadores comparten las
+mismas páginas en memoria. Cada índice se guarda bajo la huella (SHA-256)
+del archivo de origen: un Excel que no cambió no se vuelve a leer.
+
+Cada proceso guarda solo los últimos MAX_INDICES_ABIERTOS índices
+abiertos y, al guardar uno nuevo, limpiar_cache borra los que no se usan
+hace más de EDAD_MAXIMA_CACHE o los menos usados si la caché pasa de
+TAMANO_MAXIMO_CACHE.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from .diferido import importar_diferido
+
+np = importar_diferido('numpy')
+
+# Cambiar si cambia el formato en disco o las reglas de lectura
+VERSION_FORMATO = 3
+
+DIRECTORIO_CACHE = os.environ.get(
+    'PDF_MASIVO_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'pdf_masivo')
+)
+
+# Índices guardados que se borran (los usados hace más tiempo primero)
+TAMANO_MAXIMO_CACHE = 2 * 1024 ** 3
+EDAD_MAXIMA_CACHE = 30 * 24 * 3600
+
+# Índices ya abiertos en este proceso, por huella (los menos usados salen primero)
+MAX_INDICES_ABIERTOS = 8
+_indices_abiertos = OrderedDict()
+_candado = threading.Lock()
+
+
+def huella_archivo(fuente, tamano_bloque=1 << 20):
+    """Calcula el SHA-256 de una ruta, contenido o archivo subido (sin copiarlo entero)"""
+    sha = hashlib.sha256(f"v{VERSION_FORMATO}:".encode())
+
+    if isinstance(fuente, (bytes, bytearray, memoryview)):
+        sha.update(fuente)
+    elif hasattr(fuente, 'getbuffer'):
+        sha.update(fuente.getbuffer())
+    elif hasattr(fuente, 'read'):
+        fuente.seek(0)
+        for bloque in iter(lambda: fuente.read(tamano_bloque), b''):
+            sha.update(bloque)
+        fuente.seek(0)
+    else:
+        with open(fuente, 'rb') as f:
+            for bloque in iter(lambda: f.read(tamano_bloque), b''):
+                sha.update(bloque)
+
+    return sha.hexdigest()
+
+
+class IndiceCodigos(Mapping):
+    """Mapeo de solo lectura código -> {'sistema', 'subsistema', ...}
+
+    Se usa igual que el diccionario self.datos, pero guarda cada valor de
+    los campos una sola vez y los códigos en un arreglo ordenado.
+    """
+    __slots__ = ('_codigos', '_registros', '_campos', '_valores', 'info', 'directorio')
+
+    def __init__(self, codigos, registros, campos, valores, info=None, directorio=None):
+        self._codigos = codigos
+        self._registros = registros
+        self._campos = list(campos)
+        self._valores = valores
+        self.info = info or {}
+        self.directorio = directorio
+
+    @property
+    def campos(self):
+        """Nombres de los campos de cada registro"""
+        return list(self._campos)
+
+    @classmethod
+    def desde_datos(cls, datos, info=None):
+        """Construye el índice a partir del diccionario de datos"""
+        claves = sorted(codigo.encode('utf-8') for codigo in datos)
+        ancho = max((len(clave) for clave in claves), default=1) or 1
+        codigos = np.array(claves, dtype=f'S{ancho}')
+
+        valores = []
+        id_por_valor = {}
+
+        def internar(valor):
+            if valor not in id_por_valor:
+                id_por_valor[valor] = len(valores)
+                valores.append(valor)
+            return id_por_valor[valor]
+
+        campos = list(next(iter(datos.values()), None) or ('sistema', 'subsistema'))
+        filas = [
+            [internar(registro[campo]) for campo in campos]
+            for registro in (datos[clave.decode('utf-8')] for clave in claves)
+        ]
+
+        tipo_id = np.uint16 if len(valores) <= np.iinfo(np.uint16).max else np.uint32
+        return cls(
+            codigos,
+            np.array(filas, dtype=tipo_id).reshape(len(claves), len(campos)),
+            campos,
+            valores,
+            info
+        )
+
+    @classmethod
+    def cargar(cls, directorio):
+        """Abre un índice guardado con mmap"""
+        with open(os.path.join(directorio, 'metadatos.json'), encoding='utf-8') as f:
+            metadatos = json.load(f)
+
+        def abrir(nombre):
+            return np.load(os.path.join(directorio, nombre), mmap_mode='r')
+
+        return cls(
+            abrir('codigos.npy'),
+            abrir('registros.npy'),
+            metadatos['campos'],
+            metadatos['valores'],
+            metadatos['info'],
+            directorio
+        )
+
+    def guardar(self, directorio):
+        """Guarda el índice en un directorio (se reemplaza de forma atómica)"""
+        padre = os.path.dirname(os.path.abspath(directorio))
+        os.makedirs(padre, exist_ok=True)
+        temporal = tempfile.mkdtemp(dir=padre, prefix='.indice-')
+
+        try:
+            np.save(os.path.join(temporal, 'codigos.npy'), self._codigos)
+            np.save(os.path.join(temporal, 'registros.npy'), self._registros)
+            with open(os.path.join(temporal, 'metadatos.json'), 'w', encoding='utf-8') as f:
+                json.dump(
+                    {
+                        'version': VERSION_FORMATO,
+                        'campos': self._campos,
+                        'valores': self._valores,
+                        'info': self.info
+                    },
+                    f, ensure_ascii=False, default=str
+                )
+            os.replace(temporal, directorio)
+        except OSError:
+            shutil.rmtree(temporal, ignore_errors=True)
+            # Otro proceso ya guardó el mismo índice
+            if not os.path.isdir(directorio):
+                raise
+
+    def _posicion(self, codigo):
+        """Posición del código en el arreglo, o -1 si no existe"""
+        if not isinstance(codigo, str):
+            return -1
+        clave = codigo.encode('utf-8')
+        if not clave or len(clave) > self._codigos.dtype.itemsize:
+            return -1
+        i = int(np.searchsorted(self._codigos, clave))
+        if i < len(self._codigos) and self._codigos[i] == clave:
+            return i
+        return -1
+
+    def _registro(self, i):
+        valores = self._valores
+        return dict(zip(self._campos, (valores[j] for j in self._registros[i].tolist())))
+
+    def __getitem__(self, codigo):
+        i = self._posicion(codigo)
+        if i < 0:
+            raise KeyError(codigo)
+        return self._registro(i)
+
+    def __contains__(self, codigo):
+        return self._posicion(codigo) >= 0
+
+    def __len__(self):
+        return len(self._codigos)
+
+    def __iter__(self):
+        for clave in self._codigos:
+            yield clave.decode('utf-8')
+
+    def items(self):
+        for i, clave in enumerate(self._codigos):
+            yield clave.decode('utf-8'), self._registro(i)
+
+    def __reduce__(self):
+        # Un índice guardado viaja a los procesos trabajadores como su ruta
+        if self.directorio:
+            return (IndiceCodigos.cargar, (self.directorio,))
+        return (
+            IndiceCodigos,
+            (self._codigos, self._registros, self._campos, self._valores, self.info)
+        )
+
+
+def obtener_indice(fuente, lector, directorio_cache=DIRECTORIO_CACHE, variante=None):
+    """Devuelve (indice, desde_cache) para una tabla de datos
+
+    Si ya existe un índice para la misma huella de archivo se abre desde
+    la caché (o se reutiliza el ya abierto en este proceso). Si no, se
+    llama a lector(fuente) -> (datos, info), se guarda y se abre con mmap.
+    variante distingue índices de la misma tabla leída con otras opciones
+    (por ejemplo, con las columnas adicionales de una plantilla).
+    """
+    huella = huella_archivo(fuente)
+    if variante:
+        huella += '-' + hashlib.sha256(str(variante).encode()).hexdigest()[:16]
+
+    with _candado:
+        if huella in _indices_abiertos:
+            _indices_abiertos.move_to_end(huella)
+            return _indices_abiertos[huella], True
+
+    directorio = os.path.join(directorio_cache, huella)
+    try:
+        indice = IndiceCodigos.cargar(directorio)
+        desde_cache = True
+        try:
+            # La edad en la caché cuenta desde el último uso
+            os.utime(os.path.join(directorio, 'metadatos.json'))
+        except OSError:
+            pass
+    except FileNotFoundError:
+        datos, info = lector(fuente)
+        IndiceCodigos.desde_datos(datos, info).guardar(directorio)
+        indice = IndiceCodigos.cargar(directorio)
+        desde_cache = False
+        limpiar_cache(directorio_cache, conservar=[directorio])
+
+    # Al salir de aquí el proceso suelta su referencia; numpy libera el mmap
+    # cuando ninguna sesión usa ya el índice
+    with _candado:
+        indice = _indices_abiertos.setdefault(huella, indice)
+        _indices_abiertos.move_to_end(huella)
+        while len(_indices_abiertos) > MAX_INDICES_ABIERTOS:
+            _indices_abiertos.popitem(last=False)
+    return indice, desde_cache
+
+
+def limpiar_cache(directorio_cache=DIRECTORIO_CACHE, tamano_maximo=TAMANO_MAXIMO_CACHE,
+                  edad_maxima=EDAD_MAXIMA_CACHE, conservar=()):
+    """Borra los índices guardados sin usar hace más de edad_maxima segundos y,
+    si la caché sigue pasando de tamano_maximo bytes, los usados hace más tiempo
+
+    Solo se tocan directorios de índices (los que tienen metadatos.json);
+    los abiertos en este proceso y los de conservar no se borran. Devuelve
+    cuántos índices se borraron.
+    """
+    with _candado:
+        protegidos = {indice.directorio for indice in _indices_abiertos.values()}
+    protegidos.update(conservar)
+
+    try:
+        nombres = os.listdir(directorio_cache)
+    except FileNotFoundError:
+        return 0
+    guardados = []
+    for nombre in nombres:
+        directorio = os.path.join(directorio_cache, nombre)
+        try:
+            usado = os.path.getmtime(os.path.join(directorio, 'metadatos.json'))
+            tamano = sum(entrada.stat().st_size for entrada in os.scandir(directorio) if entrada.is_file())
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        guardados.append((usado, tamano, directorio))
+
+    guardados.sort()
+    total = sum(tamano for _, tamano, _ in guardados)
+    limite = time.time() - edad_maxima
+    borrados = 0
+    for usado, tamano, directorio in guardados:
+        if usado >= limite and total <= tamano_maximo:
+            break
+        if directorio in protegidos:
+            continue
+        shutil.rmtree(directorio, ignore_errors=True)
+        total -= tamano
+        borrados += 1
+    return borrados
@@ -0,0 +1,156 @@
+# lectura.py
+"""Lectura por bloques de la tabla de datos (Excel, CSV o Parquet)
+
+Primero se lee solo el encabezado para mapear las columnas y después se
+extraen únicamente las columnas de código, sistema y subsistema (más las
+que pida una plantilla de sello) en bloques de filas. La memoria máxima
+depende del diccionario de datos y no del tamaño del libro.
+"""
+from .diferido import importar_diferido
+from .nucleo import construir_datos, mapear_columnas
+
+pd = importar_diferido('pandas')
+
+# Filas por bloque al leer tablas grandes
+TAMANO_BLOQUE = 50_000
+
+
+def tipo_tabla(fuente):
+    """Devuelve 'csv', 'parquet', 'xlsx' o 'xls' según la extensión del archivo"""
+    nombre = str(getattr(fuente, 'name', fuente)).lower()
+    if nombre.endswith('.csv'):
+        return 'csv'
+    if nombre.endswith('.parquet') or nombre.endswith('.pq'):
+        return 'parquet'
+    if nombre.endswith('.xls'):
+        return 'xls'
+    return 'xlsx'
+
+
+def _rebobinar(fuente):
+    """Vuelve al inicio un archivo subido para poder leerlo otra vez"""
+    if hasattr(fuente, 'seek'):
+        fuente.seek(0)
+
+
+def _nombres_columnas(valores):
+    """Nombra las columnas como lo hace pandas cuando el encabezado está vacío"""
+    return [
+        f"Unnamed: {i}" if valor is None else valor
+        for i, valor in enumerate(valores)
+    ]
+
+
+def _abrir_parquet(fuente):
+    """Abre un Parquet con pyarrow (dependencia opcional)"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Para leer archivos Parquet instala pyarrow: pip install pyarrow")
+    return pq.ParquetFile(fuente)
+
+
+def _abrir_libro(fuente):
+    """Abre un .xlsx en modo solo lectura y devuelve (libro, primera hoja)"""
+    from openpyxl import load_workbook
+
+    libro = load_workbook(fuente, read_only=True, data_only=True)
+    return libro, libro.worksheets[0]
+
+
+def leer_encabezado(fuente):
+    """Lee solo los nombres de columna de la tabla"""
+    tipo = tipo_tabla(fuente)
+    _rebobinar(fuente)
+
+    if tipo == 'csv':
+        return list(pd.read_csv(fuente, nrows=0).columns)
+    if tipo == 'parquet':
+        return list(_abrir_parquet(fuente).schema_arrow.names)
+    if tipo == 'xls':
+        return list(pd.read_excel(fuente, nrows=0).columns)
+
+    libro, hoja = _abrir_libro(fuente)
+    try:
+        for fila in hoja.iter_rows(max_row=1, values_only=True):
+            return _nombres_columnas(fila)
+        return []
+    finally:
+        libro.close()
+
+
+def _celda(valor):
+    """Valor de una celda como lo lee pandas: los números enteros guardados como float quedan int"""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _bloques_xlsx(fuente, indices, tamano_bloque):
+    """Recorre las filas del libro en modo solo lectura y arma bloques"""
+    libro, hoja = _abrir_libro(fuente)
+    try:
+        bloque = []
+        for fila in hoja.iter_rows(min_row=2, values_only=True):
+            bloque.append([_celda(fila[i]) if i < len(fila) else None for i in indices])
+            if len(bloque) >= tamano_bloque:
+                yield pd.DataFrame(bloque, dtype=object)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, dtype=object)
+    finally:
+        libro.close()
+
+
+def iterar_bloques(fuente, indices, columnas, tamano_bloque=TAMANO_BLOQUE):
+    """Entrega DataFrames con solo las columnas indicadas (en ese orden)"""
+    tipo = tipo_tabla(fuente)
+    _rebobinar(fuente)
+
+    if tipo == 'csv':
+        lector = pd.read_csv(fuente, usecols=indices, dtype=str, chunksize=tamano_bloque)
+        for bloque in lector:
+            yield bloque[[columnas[i] for i in indices]]
+    elif tipo == 'parquet':
+        archivo = _abrir_parquet(fuente)
+        nombres = [columnas[i] for i in indices]
+        for lote in archivo.iter_batches(batch_size=tamano_bloque, columns=nombres):
+            yield lote.to_pandas()[nombres]
+    elif tipo == 'xls':
+        # El formato .xls antiguo no permite lectura en streaming
+        df = pd.read_excel(fuente, usecols=indices, dtype=str)
+        yield df[[columnas[i] for i in indices]]
+    else:
+        yield from _bloques_xlsx(fuente, indices, tamano_bloque)
+
+
+def leer_datos_por_bloques(fuente, tamano_bloque=TAMANO_BLOQUE, campos=None):
+    """Construye el diccionario de datos leyendo solo las columnas mapeadas
+
+    campos son las columnas adicionales por nombre (ver mapear_columnas).
+    Devuelve (datos, info), donde info tiene las columnas encontradas, el
+    mapeo detectado y el total de filas leídas.
+    """
+    columnas = leer_encabezado(fuente)
+    columnas_mapeadas = mapear_columnas(columnas, campos)
+
+    indices = sorted({idx for idx in columnas_mapeadas.values() if idx is not None})
+    mapeo_bloque = {
+        campo: (indices.index(idx) if idx is not None else None)
+        for campo, idx in columnas_mapeadas.items()
+    }
+
+    datos = {}
+    filas = 0
+    if indices:
+        for bloque in iterar_bloques(fuente, indices, columnas, tamano_bloque):
+            filas += len(bloque)
+            # Los bloques llegan en orden, así que el último duplicado sigue ganando
+            datos.update(construir_datos(bloque, mapeo_bloque))
+
+    info = {
+        'columnas': columnas,
+        'columnas_mapeadas': columnas_mapeadas,
+        'filas': filas
+    }
+    return datos, info
@@ -0,0 +1,236 @@
+# manifiesto.py
+"""Trabajos reanudables: manifiesto de lo ya estampado en un directorio
+
+Cada PDF terminado se anota en un archivo JSON Lines dentro del directorio
+de salida, con la huella (SHA-256) del PDF original, los valores buscados
+en la tabla (sistema, subsistema, código y campos adicionales) y la huella
+de los ajustes del sello (posiciones y orientación, o la plantilla), del
+perfil de salida y de si se guarda solo la portada. Cada línea se
+escribe apenas termina el archivo, así que un corte (rerun de Streamlit,
+navegador cerrado, caída del proceso) pierde como mucho el PDF que estaba
+en curso.
+
+Al volver a lanzar el mismo lote se omiten los PDFs cuya entrada coincide
+y cuyo archivo de salida sigue existiendo: solo se procesan los nuevos, los
+que cambiaron o aquellos cuyos datos o posiciones cambiaron. Para rutas, si
+el tamaño y la fecha de modificación no cambiaron se reutiliza la huella
+anotada y el archivo ni siquiera se lee.
+"""
+import hashlib
+import json
+import os
+from collections import deque
+
+from .indice import huella_archivo
+from .nucleo import armar_resultado, codigo_desde_nombre, iterar_lote
+
+# Nombre del manifiesto dentro del directorio de salida
+NOMBRE_MANIFIESTO = '.pdf_masivo_manifiesto.jsonl'
+
+# Cambiar si cambia la forma de estampar (invalida los manifiestos anteriores)
+VERSION_MANIFIESTO = 1
+
+
+def huella_ajustes(posiciones, orientacion, plantilla=None, perfil_salida='rapido', portada=False):
+    """Huella de los ajustes que cambian el resultado del estampado
+
+    Con una plantilla de campos (ver plantilla.py), la plantilla reemplaza
+    a las posiciones y la orientación. El perfil por defecto y los
+    documentos completos no cambian la huella (los manifiestos anteriores
+    siguen valiendo).
+    """
+    if plantilla is not None:
+        ajustes = {'version': VERSION_MANIFIESTO, 'plantilla': plantilla.como_dict()}
+    else:
+        ajustes = {
+            'version': VERSION_MANIFIESTO,
+            'posiciones': [[float(p['x']), float(p['y'])] for p in posiciones],
+            'orientacion': orientacion,
+        }
+    if perfil_salida != 'rapido':
+        ajustes['perfil_salida'] = perfil_salida
+    if portada:
+        ajustes['portada'] = True
+    texto = json.dumps(ajustes, sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def _estado_archivo(origen):
+    """(tamaño, mtime_ns) de una ruta, o None si el origen es contenido en memoria"""
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        return None
+    estado = os.stat(origen)
+    return [estado.st_size, estado.st_mtime_ns]
+
+
+class Manifiesto:
+    """Registro de PDFs terminados en un directorio de salida
+
+    Se abre con el directorio; las entradas se indexan por nombre de PDF
+    (gana la última). Las líneas incompletas de un corte se ignoran.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.ruta = os.path.join(directorio, NOMBRE_MANIFIESTO)
+        self.entradas = {}
+        self._archivo = None
+
+        lineas = 0
+        if os.path.isfile(self.ruta):
+            with open(self.ruta, encoding='utf-8') as f:
+                for linea in f:
+                    lineas += 1
+                    try:
+                        entrada = json.loads(linea)
+                        self.entradas[entrada['nombre']] = entrada
+                    except (ValueError, KeyError):
+                        continue
+
+        # Muchas re-ejecuciones acumulan líneas repetidas: se compacta
+        if lineas > 2 * len(self.entradas) + 100:
+            self._reescribir()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def _reescribir(self):
+        """Reescribe el manifiesto con una línea por PDF (reemplazo atómico)"""
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            for entrada in self.entradas.values():
+                f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+        os.replace(temporal, self.ruta)
+
+    def huella(self, nombre, origen):
+        """Huella del PDF original y estado del archivo (tamaño, mtime) si es una ruta"""
+        estado = _estado_archivo(origen)
+        anterior = self.entradas.get(nombre)
+        if estado is not None and anterior and anterior.get('estado_origen') == estado:
+            return anterior['huella'], estado
+        return huella_archivo(origen), estado
+
+    def vigente(self, nombre, huella, valores, ajustes):
+        """Entrada terminada que coincide con la huella, los valores y los ajustes, o None"""
+        entrada = self.entradas.get(nombre)
+        if (
+            entrada
+            and entrada['ok']
+            and entrada['huella'] == huella
+            and entrada['valores'] == valores
+            and entrada['ajustes'] == ajustes
+            and entrada['salida']
+            and os.path.isfile(self.ruta_salida(entrada))
+        ):
+            return entrada
+        return None
+
+    def ruta_salida(self, entrada):
+        """Ruta del PDF estampado de una entrada (relativa al directorio del manifiesto)"""
+        return os.path.join(self.directorio, entrada['salida'])
+
+    def registrar(self, resultado, huella, valores, ajustes, estado_origen=None):
+        """Anota el resultado de un PDF y lo deja escrito en disco"""
+        entrada = {
+            'nombre': resultado['nombre'],
+            'huella': huella,
+            'estado_origen': estado_origen,
+            'valores': valores,
+            'ajustes': ajustes,
+            'salida': os.path.relpath(resultado['ruta'], self.directorio) if resultado['ruta'] else None,
+            'ok': resultado['ok'],
+            'error': resultado['error'],
+        }
+        self.entradas[entrada['nombre']] = entrada
+
+        if self._archivo is None:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._archivo = open(self.ruta, 'a', encoding='utf-8')
+        self._archivo.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+        self._archivo.flush()
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+
+def _valores_para(nombre, datos):
+    """[sistema, subsistema, código, campos adicionales...] del registro, o None si no hay datos"""
+    codigo = codigo_desde_nombre(nombre)
+    if codigo not in datos:
+        return None
+    registro = datos[codigo]
+    adicionales = [valor for campo, valor in registro.items() if campo not in ('sistema', 'subsistema', 'codigo')]
+    return [registro['sistema'], registro['subsistema'], registro.get('codigo', codigo)] + adicionales
+
+
+def iterar_lote_reanudable(trabajos, datos, posiciones, orientacion, directorio_salida,
+                           max_workers=None, forzar=False, **opciones):
+    """Como iterar_lote, pero omite los PDFs ya estampados según el manifiesto
+
+    Los resultados omitidos llegan con ok=True, la ruta de la salida
+    existente y 'omitido'=True. Con forzar=True se procesa todo de nuevo
+    (el manifiesto se sigue actualizando). Las demás opciones se pasan a
+    iterar_lote; la salida siempre queda en directorio_salida.
+    """
+    os.makedirs(directorio_salida, exist_ok=True)
+    ajustes = huella_ajustes(
+        posiciones, orientacion, getattr(opciones.get('sello'), 'plantilla', None),
+        opciones.get('perfil_salida', 'rapido'), opciones.get('portada', False)
+    )
+    opciones = dict(opciones, directorio_salida=directorio_salida, en_memoria=False)
+    omitidos = deque()
+    en_curso = {}
+
+    with Manifiesto(directorio_salida) as manifiesto:
+
+        def revisar():
+            """(omitido, None) o (None, trabajo pendiente) por cada PDF, en el orden de trabajos"""
+            for nombre, origen in trabajos:
+                huella, estado = manifiesto.huella(nombre, origen)
+                valores = _valores_para(nombre, datos)
+                entrada = None if forzar else manifiesto.vigente(nombre, huella, valores, ajustes)
+                if entrada:
+                    resultado = armar_resultado(nombre, ruta=manifiesto.ruta_salida(entrada))
+                    resultado['omitido'] = True
+                    yield resultado, None
+                    continue
+                en_curso[nombre] = (huella, valores, estado)
+                yield None, (nombre, origen)
+
+        # Hasta el primer PDF pendiente los omitidos salen apenas se revisan; si
+        # no hay ninguno pendiente, no se llega a crear el pool
+        revisados = revisar()
+        primero = None
+        for omitido, trabajo in revisados:
+            if trabajo is not None:
+                primero = trabajo
+                break
+            yield omitido
+        if primero is None:
+            return
+
+        def pendientes():
+            yield primero
+            for omitido, trabajo in revisados:
+                if trabajo is None:
+                    omitidos.append(omitido)
+                else:
+                    yield trabajo
+
+        for resultado in iterar_lote(pendientes(), datos, posiciones, orientacion, max_workers, **opciones):
+            while omitidos:
+                yield omitidos.popleft()
+            # Con nombres repetidos solo se anota el último en terminar
+            if resultado['nombre'] in en_curso:
+                huella, valores, estado = en_curso.pop(resultado['nombre'])
+                manifiesto.registrar(resultado, huella, valores, ajustes, estado)
+            resultado['omitido'] = False
+            yield resultado
+
+        while omitidos:
+            yield omitidos.popleft()
@@ -0,0 +1,251 @@
+# metricas.py
+"""Métricas por etapa y por archivo de un lote, y perfilado opcional
+
+procesar_documento mide cada etapa (copiar, abrir, extraer, estampar,
+guardar) y agrega a cada resultado un diccionario 'metricas' con los
+segundos por etapa, bytes de entrada y salida, páginas, tamaño de la
+primera página y el pico de memoria (RSS) del proceso que lo estampó.
+escribir_portadas suma la etapa 'portadas' y escribir_en_zip, 'zip'.
+
+resumir_metricas arma el resumen del lote (p50/p95/máximo por etapa,
+archivos por segundo, archivos más lentos, archivos por tamaño de
+página) y escribir_metricas lo exporta en JSON o CSV. Los dos recorren
+los resultados sin copiarlos, así que sirven también con un
+RegistroResultados (resultados en disco): del lote solo quedan en memoria
+los segundos por etapa. perfilar envuelve una ejecución con cProfile y,
+si se pide, tracemalloc.
+"""
+import cProfile
+import csv
+import heapq
+import io
+import os
+import sys
+import time
+import tracemalloc
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+from .diferido import importar_diferido
+from .registro import escribir_json_con_lista
+
+np = importar_diferido('numpy')
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Etapas en el orden en que ocurren para un PDF
+ETAPAS = ('copiar', 'abrir', 'extraer', 'estampar', 'guardar', 'portadas', 'zip')
+
+
+def rss_pico():
+    """Pico de memoria residente del proceso actual en bytes (None si no se puede medir)"""
+    # En Linux, VmHWM es solo de este proceso; ru_maxrss arrastra el pico del
+    # proceso padre a través de exec (procesos creados con spawn)
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    # Linux informa KB; macOS, bytes
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def tamano_origen(origen):
+    """Bytes de un PDF dado como contenido o como ruta"""
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        return memoryview(origen).nbytes
+    return os.path.getsize(origen)
+
+
+class Cronometro:
+    """Acumula segundos por etapa"""
+
+    def __init__(self):
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def metricas(self, **extra):
+        """Diccionario de métricas del archivo: segundos por etapa más los datos extra"""
+        metricas = {etapa: round(segundos, 6) for etapa, segundos in self.etapas.items()}
+        metricas.update(extra)
+        return metricas
+
+
+def _fila(resultado):
+    """Registro plano de un resultado para el CSV y el ranking de lentos"""
+    metricas = resultado.get('metricas') or {}
+    fila = {
+        'nombre': resultado['nombre'],
+        'ok': resultado['ok'],
+        'omitido': resultado.get('omitido', False),
+        'error': resultado['error'],
+        'paginas': metricas.get('paginas'),
+        'pagina': metricas.get('pagina'),
+        'perfil_salida': metricas.get('perfil_salida'),
+        'bytes_entrada': metricas.get('bytes_entrada'),
+        'bytes_salida': metricas.get('bytes_salida'),
+        'rss_pico': metricas.get('rss_pico'),
+    }
+    for etapa in ETAPAS:
+        fila[etapa] = metricas.get(etapa)
+    fila['total'] = round(sum(metricas.get(etapa) or 0.0 for etapa in ETAPAS), 6) if metricas else None
+    return fila
+
+
+def _estadisticas(valores):
+    """n, total, p50, p95 y máximo de una lista de segundos"""
+    arreglo = np.asarray(valores, dtype=float)
+    p50, p95 = np.percentile(arreglo, [50, 95])
+    return {
+        'n': len(arreglo),
+        'total': round(float(arreglo.sum()), 6),
+        'p50': round(float(p50), 6),
+        'p95': round(float(p95), 6),
+        'max': round(float(arreglo.max()), 6),
+    }
+
+
+def resumir_metricas(resultados, segundos=None, etapas_lote=None, lentos=10):
+    """Resumen del lote a partir de los resultados con 'metricas'
+
+    segundos es la duración total del lote (para archivos por segundo) y
+    etapas_lote, segundos de etapas que no son por archivo (por ejemplo
+    'datos' para la lectura del Excel). Los resultados se recorren una
+    sola vez.
+    """
+    archivos = completados = omitidos = paginas = bytes_entrada = bytes_salida = 0
+    rss = None
+    tamanos = Counter()
+    valores = {etapa: array('d') for etapa in ETAPAS + ('total',)}
+    # Montículo de los más lentos: (total, -orden, fila)
+    mas_lentos = []
+
+    for fila in map(_fila, resultados):
+        archivos += 1
+        completados += bool(fila['ok'])
+        omitidos += bool(fila['omitido'])
+        if fila['total'] is None:
+            continue
+        paginas += fila['paginas'] or 0
+        bytes_entrada += fila['bytes_entrada'] or 0
+        bytes_salida += fila['bytes_salida'] or 0
+        if fila['rss_pico']:
+            rss = max(rss or 0, fila['rss_pico'])
+        if fila['pagina']:
+            tamanos[fila['pagina']] += 1
+        for etapa, arreglo in valores.items():
+            if fila[etapa] is not None:
+                arreglo.append(fila[etapa])
+        if lentos:
+            lento = (fila['total'], -archivos, {
+                'nombre': fila['nombre'], 'total': fila['total'],
+                'paginas': fila['paginas'], 'bytes_entrada': fila['bytes_entrada'],
+            })
+            if len(mas_lentos) < lentos:
+                heapq.heappush(mas_lentos, lento)
+            else:
+                heapq.heappushpop(mas_lentos, lento)
+
+    resumen = {
+        'archivos': archivos,
+        'completados': completados,
+        'errores': archivos - completados,
+        'omitidos': omitidos,
+        'segundos': round(segundos, 3) if segundos is not None else None,
+        'archivos_por_segundo': round(archivos / segundos, 2) if segundos else None,
+        'paginas': paginas,
+        'bytes_entrada': bytes_entrada,
+        'bytes_salida': bytes_salida,
+        'rss_pico': rss,
+        'etapas_lote': dict(etapas_lote or {}),
+        'etapas': {},
+        # Archivos por tamaño de la primera página, del más común al menos común
+        'tamanos_pagina': dict(tamanos.most_common()),
+    }
+    for etapa, arreglo in valores.items():
+        if arreglo:
+            resumen['etapas'][etapa] = _estadisticas(arreglo)
+
+    resumen['mas_lentos'] = [fila for _, _, fila in sorted(mas_lentos, reverse=True)]
+    return resumen
+
+
+def _escribir_metricas(f, resultados, formato, segundos=None, etapas_lote=None):
+    """Escribe las métricas en f fila por fila (los resultados se recorren dos veces en JSON)"""
+    if formato == 'csv':
+        filas = map(_fila, resultados)
+        primera = next(filas, None)
+        escritor = csv.DictWriter(f, fieldnames=list(primera) if primera else ['nombre'])
+        escritor.writeheader()
+        if primera:
+            escritor.writerow(primera)
+            escritor.writerows(filas)
+        return
+
+    resumen = resumir_metricas(resultados, segundos, etapas_lote)
+    escribir_json_con_lista(f, {'resumen': resumen}, 'archivos', map(_fila, resultados))
+
+
+def exportar_metricas(resultados, formato='json', segundos=None, etapas_lote=None):
+    """Métricas del lote como texto JSON (resumen + archivos) o CSV (una fila por archivo)"""
+    salida = io.StringIO()
+    _escribir_metricas(salida, resultados, formato, segundos, etapas_lote)
+    return salida.getvalue()
+
+
+def escribir_metricas(resultados, ruta, segundos=None, etapas_lote=None):
+    """Escribe las métricas del lote en JSON o CSV según la extensión, sin armarlas en memoria"""
+    formato = 'csv' if str(ruta).lower().endswith('.csv') else 'json'
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        _escribir_metricas(f, resultados, formato, segundos, etapas_lote)
+
+
+@contextmanager
+def perfilar(ruta_perfil=None, memoria=False, lineas=25):
+    """Perfila el bloque con cProfile y, con memoria=True, tracemalloc
+
+    Entrega un diccionario que se completa al salir: 'perfil' (ruta del
+    .prof, para abrir con pstats o snakeviz), 'memoria_pico' y
+    'asignaciones' (las líneas que más memoria reservaron). Solo mide el
+    proceso actual: para perfilar el estampado, correr el lote con un
+    solo proceso (max_workers=1).
+    """
+    informe = {}
+    perfil = cProfile.Profile() if ruta_perfil else None
+    if memoria:
+        tracemalloc.start()
+    if perfil:
+        perfil.enable()
+    try:
+        yield informe
+    finally:
+        if perfil:
+            perfil.disable()
+            perfil.dump_stats(ruta_perfil)
+            informe['perfil'] = ruta_perfil
+        if memoria:
+            # Sin las reservas del propio perfilador
+            foto = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ])
+            informe['memoria_pico'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            informe['asignaciones'] = [str(e) for e in foto.statistics('lineno')[:lineas]]
@@ -0,0 +1,669 @@
+# nucleo.py
+"""Núcleo de estampado sin dependencias de Streamlit
+
+Contiene la lectura de la tabla de datos, el estampado de la primera página
+y el motor de lotes en paralelo. Lo usan tanto la aplicación Streamlit como
+la línea de comandos (python -m pdf_masivo).
+"""
+import csv
+import logging
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import chain, count
+from importlib import metadata
+from pathlib import Path
+
+from .diferido import importar_diferido
+from .metricas import Cronometro, rss_pico, tamano_origen
+from .plantilla import descripcion_pagina, plantilla_desde_posiciones
+from .registro import escribir_json_con_lista
+
+fitz = importar_diferido('fitz')  # PyMuPDF
+pd = importar_diferido('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Posiciones por defecto según orientación: sistema, subsistema, código
+POSICIONES_POR_DEFECTO = {
+    'vertical': [
+        {'x': 50, 'y': 500},
+        {'x': 50, 'y': 470},
+        {'x': 50, 'y': 440}
+    ],
+    'horizontal': [
+        {'x': 100, 'y': 35},
+        {'x': 250, 'y': 35},
+        {'x': 430, 'y': 35}
+    ]
+}
+
+# Opciones de doc.save por perfil de salida:
+# - rapido: sin recomprimir nada (el más rápido; el tamaño queda como el original)
+# - compacto: quita objetos sin uso y comprime streams, imágenes, fuentes y la
+#   tabla de objetos (object streams)
+# - web: quita objetos sin uso, comprime y linealiza (se ve la primera página
+#   antes de terminar de descargar el PDF)
+PERFILES_SALIDA = {
+    'rapido': {},
+    'compacto': {'garbage': 3, 'deflate': True, 'deflate_images': True, 'deflate_fonts': True, 'use_objstms': 1},
+    'web': {'garbage': 3, 'deflate': True, 'deflate_images': True, 'deflate_fonts': True, 'linear': True},
+}
+
+# Con menos PDFs por proceso que esto, el lote se procesa en el proceso
+# actual: repartir tan pocos trabajos cuesta más de lo que se gana
+TRABAJOS_MINIMOS_POR_PROCESO = 4
+
+# Configuraciones de lote que guarda cada trabajador (los datos y las
+# opciones se cargan una sola vez por lote, no con cada PDF)
+MAX_LOTES_EN_TRABAJADOR = 4
+
+# Estado de cada proceso trabajador: configuraciones cargadas por lote
+_estado_trabajador = {}
+
+# Número de lote dentro de este proceso: identifica la configuración en los
+# trabajadores aunque el sistema reutilice el nombre del archivo temporal
+_numeros_lote = count()
+
+# Pools de procesos por cantidad de trabajadores; quedan vivos entre lotes
+# para no arrancar trabajadores (ni cargar PyMuPDF) en cada uno
+_pools = {}
+_candado_pools = threading.Lock()
+
+
+def cargar_tabla(fuente):
+    """Lee un Excel, CSV o Parquet (ruta o archivo subido) en un DataFrame
+
+    CSV y Excel se leen como texto, igual que en la lectura por bloques:
+    un código "007" queda "007" (y no 7 ni 7.0) con cualquiera de los dos.
+    """
+    nombre = str(getattr(fuente, 'name', fuente)).lower()
+    if nombre.endswith('.csv'):
+        return pd.read_csv(fuente, dtype=str)
+    if nombre.endswith('.parquet') or nombre.endswith('.pq'):
+        return pd.read_parquet(fuente)
+    return pd.read_excel(fuente, dtype=str)
+
+
+def _nombre_columna(nombre):
+    """Nombre de columna en minúsculas, sin espacios de los extremos ni separadores"""
+    return str(nombre).lower().strip().replace('_', ' ').replace('-', ' ').replace('.', ' ')
+
+
+def mapear_columnas(columnas, campos=None):
+    """Mapea automáticamente las columnas del Excel - VERSIÓN MEJORADA
+
+    campos agrega columnas por nombre (campo -> encabezado), por ejemplo las
+    que pide una plantilla de sello. Si incluye código, sistema o
+    subsistema, el encabezado indicado reemplaza la detección automática.
+    Un encabezado que no existe queda mapeado a None.
+    """
+    columnas_mapeadas = {'codigo': None, 'sistema': None, 'subsistema': None}
+    explicitos = {}
+    for campo, encabezado in (campos or {}).items():
+        buscado = ' '.join(_nombre_columna(encabezado).split())
+        explicitos[campo] = next(
+            (idx for idx, col in enumerate(columnas) if ' '.join(_nombre_columna(col).split()) == buscado),
+            None
+        )
+
+    # Listas más completas incluyendo acentos
+    nombres_codigo = ['código', 'codigo', 'code', 'id', 'número', 'numero', 'n°', 'no']
+    nombres_sistema = ['sistema', 'system', 'sist']
+    nombres_subsistema = ['subsistema', 'sub-sistema', 'subsystem', 'subsist']
+
+    for idx, col_name in enumerate(columnas):
+        # Las columnas pedidas por nombre no entran en la detección automática
+        if idx in explicitos.values():
+            continue
+
+        # Eliminar espacios extra y caracteres especiales
+        col_name_clean = _nombre_columna(col_name)
+
+        # Buscar coincidencias
+        if any(nombre in col_name_clean for nombre in nombres_codigo):
+            if columnas_mapeadas['codigo'] is None:  # Solo asignar si no está asignado
+                columnas_mapeadas['codigo'] = idx
+        elif any(nombre in col_name_clean for nombre in nombres_sistema):
+            if columnas_mapeadas['sistema'] is None:
+                columnas_mapeadas['sistema'] = idx
+        elif any(nombre in col_name_clean for nombre in nombres_subsistema):
+            if columnas_mapeadas['subsistema'] is None:
+                columnas_mapeadas['subsistema'] = idx
+
+    # Si no se encontraron algunas columnas, usar las primeras disponibles
+    total_columnas = len(columnas)
+    if columnas_mapeadas['codigo'] is None and total_columnas >= 1:
+        columnas_mapeadas['codigo'] = 0
+    if columnas_mapeadas['sistema'] is None and total_columnas >= 2:
+        columnas_mapeadas['sistema'] = 1
+    if columnas_mapeadas['subsistema'] is None and total_columnas >= 3:
+        columnas_mapeadas['subsistema'] = 2
+
+    columnas_mapeadas.update(explicitos)
+    return columnas_mapeadas
+
+
+def obtener_valor(row, idx):
+    """Obtiene y limpia un valor de la fila"""
+    if idx is not None and idx < len(row):
+        valor = row.iloc[idx]
+        if pd.notna(valor):
+            return str(valor).strip()
+    return ""
+
+
+def columna_limpia(df, idx):
+    """Versión por columnas de obtener_valor: texto sin espacios y "" para vacíos"""
+    if idx is None or idx >= len(df.columns):
+        return pd.Series("", index=df.index, dtype=object)
+
+    columna = df.iloc[:, idx]
+    texto = columna.astype(str).str.strip()
+    return texto.where(columna.notna(), "")
+
+
+def construir_datos(df, columnas_mapeadas):
+    """Construye el diccionario código -> {'sistema', 'subsistema', ...}
+
+    Trabaja con columnas completas en vez de recorrer fila por fila. Cada
+    registro tiene un valor por campo mapeado (además del código). Se
+    descartan los códigos vacíos o 'nan' y, si un código se repite, gana
+    la última fila.
+    """
+    codigos = columna_limpia(df, columnas_mapeadas['codigo'])
+    validos = (codigos != "") & (codigos != "nan")
+
+    campos = [campo for campo in columnas_mapeadas if campo != 'codigo']
+    columnas = [columna_limpia(df, columnas_mapeadas[campo])[validos].tolist() for campo in campos]
+
+    return {
+        codigo: dict(zip(campos, valores))
+        for codigo, *valores in zip(codigos[validos].tolist(), *columnas)
+    }
+
+
+def leer_datos(fuente):
+    """Lee la tabla de datos y devuelve el diccionario de códigos"""
+    df = cargar_tabla(fuente)
+    return construir_datos(df, mapear_columnas(df.columns))
+
+
+def codigo_desde_nombre(nombre):
+    """Obtiene el código a buscar a partir del nombre del archivo"""
+    return os.path.splitext(os.path.basename(nombre))[0]
+
+
+def abrir_documento(origen):
+    """Abre un PDF desde memoria (bytes, bytearray o memoryview) o desde una ruta
+
+    Los buffers se pasan a PyMuPDF como memoryview para no copiarlos.
+    """
+    if isinstance(origen, bytearray):
+        origen = memoryview(origen)
+    if isinstance(origen, (bytes, memoryview)):
+        return fitz.open(stream=origen, filetype="pdf")
+    return fitz.open(origen)
+
+
+def medidas_primera_pagina(origen):
+    """(ancho, alto, rotación) de la primera página tal como se ve, sin leer el resto del PDF"""
+    doc = abrir_documento(origen)
+    try:
+        if len(doc) == 0:
+            raise ValueError("El PDF no tiene páginas")
+        pagina = doc[0]
+        return pagina.rect.width, pagina.rect.height, pagina.rotation
+    finally:
+        doc.close()
+
+
+def extraer_portada(doc):
+    """Documento nuevo con solo la primera página de doc
+
+    Se copian la página y los objetos que usa (fuentes, imágenes), sin
+    cargar las demás páginas del original.
+    """
+    portada = fitz.open()
+    try:
+        portada.insert_pdf(doc, from_page=0, to_page=0, links=False)
+    except Exception:
+        portada.close()
+        raise
+    return portada
+
+
+def estampar_primera_pagina(doc, textos, posiciones, orientacion):
+    """Inserta los textos (sistema, subsistema, código) en la primera página"""
+    campos = plantilla_desde_posiciones(posiciones, orientacion).campos
+    estampar_campos(doc[0], campos, textos)
+
+
+def textos_de_campos(campos, valores):
+    """Textos a estampar por campo: valores es una lista alineada con campos o un dict por nombre"""
+    if isinstance(valores, dict):
+        valores = [valores.get(campo['campo'], "") for campo in campos]
+    return [
+        campo['formato'].format(valor) if valor else ""
+        for campo, valor in zip(campos, valores)
+    ]
+
+
+def estampar_campos(pagina, campos, valores):
+    """Inserta con insert_text los campos de una plantilla (ver plantilla.py) en la página"""
+    for campo, texto in zip(campos, textos_de_campos(campos, valores)):
+        if texto:
+            pagina.insert_text(
+                (campo['x'], campo['y']),
+                texto, fontsize=campo['tamano'], fontname=campo['fuente'],
+                color=tuple(campo['color']), rotate=campo['rotacion']
+            )
+
+
+def armar_resultado(nombre, ruta=None, error=None):
+    """Arma el registro de resultado de un archivo: nombre, ruta, ok y error
+
+    Lo usan también los lotes reanudables para los PDFs que se omiten.
+    """
+    return {'nombre': nombre, 'ruta': ruta, 'ok': error is None, 'error': error}
+
+
+def ruta_salida_para(nombre, directorio_salida=None):
+    """Ruta del PDF editado: en directorio_salida o, si no se indica, un archivo temporal
+
+    Un nombre con subcarpetas (PDFs tomados de una carpeta del servidor) las
+    conserva dentro de directorio_salida; uno que saldría de ese directorio
+    se reduce a su nombre de archivo.
+    """
+    if directorio_salida:
+        relativa = os.path.normpath(nombre)
+        if os.path.isabs(relativa) or relativa.split(os.sep)[0] == os.pardir:
+            relativa = os.path.basename(nombre)
+        ruta = os.path.join(directorio_salida, relativa)
+        if os.path.dirname(relativa):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        return ruta
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
+        return tmp.name
+
+
+def copiar_original(origen, ruta_destino):
+    """Copia el PDF original tal cual (sin pasar por PyMuPDF) al destino"""
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        with open(ruta_destino, 'wb') as f:
+            f.write(origen)
+    else:
+        # copyfile usa copias del kernel (sendfile) cuando el sistema lo permite
+        shutil.copyfile(origen, ruta_destino)
+
+
+@lru_cache(maxsize=1)
+def admite_linealizar():
+    """Indica si el PyMuPDF instalado puede linealizar (MuPDF lo quitó en la versión 1.26)
+
+    Se decide por la versión instalada, sin importar PyMuPDF; si no se
+    puede leer, se prueba linealizar un documento vacío.
+    """
+    try:
+        return tuple(int(parte) for parte in metadata.version('PyMuPDF').split('.')[:2]) < (1, 26)
+    except (metadata.PackageNotFoundError, ValueError):
+        pass
+    doc = fitz.open()
+    try:
+        doc.new_page()
+        doc.tobytes(linear=True)
+        return True
+    except Exception:
+        return False
+    finally:
+        doc.close()
+
+
+def perfiles_disponibles():
+    """Perfiles de salida que se pueden usar con el PyMuPDF instalado"""
+    return [perfil for perfil in PERFILES_SALIDA if perfil != 'web' or admite_linealizar()]
+
+
+def opciones_guardado(perfil_salida='rapido', guardado='completo', portada=False):
+    """Opciones de doc.save para el perfil de salida; ValueError si no se puede usar"""
+    if perfil_salida not in PERFILES_SALIDA:
+        raise ValueError(f"Perfil de salida desconocido '{perfil_salida}' ({', '.join(PERFILES_SALIDA)})")
+    if perfil_salida not in perfiles_disponibles():
+        raise ValueError(f"El perfil '{perfil_salida}' necesita PyMuPDF 1.25 o anterior (linealización)")
+    if guardado == 'incremental' and PERFILES_SALIDA[perfil_salida]:
+        raise ValueError(
+            f"El guardado incremental solo agrega cambios al original: no admite el perfil '{perfil_salida}'"
+        )
+    if guardado == 'incremental' and portada:
+        raise ValueError("El guardado incremental agrega cambios al original: no se puede usar con solo la portada")
+    return dict(PERFILES_SALIDA[perfil_salida])
+
+
+def guardar_incremental(doc, ruta):
+    """Agrega los cambios al final del mismo archivo; devuelve False si no es posible"""
+    if not doc.can_save_incrementally():
+        return False
+    doc.save(ruta, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    return True
+
+
+def procesar_documento(nombre, origen, datos, posiciones, orientacion, directorio_salida=None,
+                       en_memoria=False, sello=None, guardado='completo', perfil_salida='rapido',
+                       portada=False):
+    """Estampa un PDF y devuelve su registro de resultado
+
+    Con en_memoria=True el PDF estampado se devuelve en resultado['contenido']
+    sin tocar el disco. Si no, se guarda en directorio_salida o, si no se
+    indica, en un archivo temporal. Si se pasa un SelloPreparado se usa en
+    lugar de insert_text, con su plantilla de campos.
+
+    Con guardado='incremental' se copia el original al destino y solo se
+    agrega al final la actualización de la primera página, sin volver a
+    escribir el resto del documento. Si el PDF no lo permite (por ejemplo,
+    un archivo reparado al abrirlo) se guarda completo.
+
+    perfil_salida elige las opciones de guardado (PERFILES_SALIDA): 'rapido'
+    guarda sin recomprimir, 'compacto' achica el PDF y 'web' además lo
+    linealiza. La compresión corre en el proceso que estampa el PDF, así que
+    en un lote se reparte entre los procesos trabajadores.
+
+    Con portada=True la salida es solo la primera página estampada (ver
+    extraer_portada): el resto del documento no se carga ni se guarda.
+
+    El resultado trae 'metricas': segundos por etapa, bytes de entrada y
+    salida, páginas, tamaño de la primera página ('A3 horizontal') y pico
+    de memoria del proceso (ver metricas.py).
+    """
+    codigo_pdf = codigo_desde_nombre(nombre)
+    opciones_pdf = opciones_guardado(perfil_salida, guardado, portada)
+
+    if codigo_pdf not in datos:
+        return armar_resultado(nombre, error=f"No hay datos para: {codigo_pdf}")
+
+    registro = datos[codigo_pdf]
+    sistema = registro['sistema']
+    subsistema = registro['subsistema']
+    # Con el cruce normalizado (cruce.py) se estampa el código de la tabla
+    codigo_pdf = registro.get('codigo', codigo_pdf)
+
+    incremental = guardado == 'incremental'
+    ruta_salida = None
+    contenido = None
+    reemplazo = None
+    error = None
+    paginas = 0
+    pagina = None
+    cronometro = Cronometro()
+
+    if incremental:
+        ruta_salida = ruta_salida_para(nombre, None if en_memoria else directorio_salida)
+        with cronometro.etapa('copiar'):
+            copiar_original(origen, ruta_salida)
+
+    try:
+        with cronometro.etapa('abrir'):
+            doc = abrir_documento(ruta_salida if incremental else origen)
+        try:
+            paginas = len(doc)
+            if paginas == 0:
+                error = "El PDF no tiene páginas"
+            else:
+                pagina = descripcion_pagina(doc[0].rect.width, doc[0].rect.height)
+                if portada:
+                    with cronometro.etapa('extraer'):
+                        doc, completo = extraer_portada(doc), doc
+                        completo.close()
+                with cronometro.etapa('estampar'):
+                    if sello is not None:
+                        # Todos los campos del registro: la plantilla del sello elige cuáles estampar
+                        sello.aplicar(doc, dict(registro, codigo=codigo_pdf))
+                    else:
+                        estampar_primera_pagina(doc, [sistema, subsistema, codigo_pdf], posiciones, orientacion)
+
+                with cronometro.etapa('guardar'):
+                    if incremental:
+                        if not guardar_incremental(doc, ruta_salida):
+                            # Se reemplaza la copia al cerrar el documento
+                            reemplazo = ruta_salida + '.completo'
+                            doc.save(reemplazo, **opciones_pdf)
+                    elif en_memoria:
+                        contenido = doc.tobytes(**opciones_pdf)
+                    else:
+                        ruta_salida = ruta_salida_para(nombre, directorio_salida)
+                        doc.save(ruta_salida, **opciones_pdf)
+        finally:
+            doc.close()
+
+        with cronometro.etapa('guardar'):
+            if reemplazo:
+                os.replace(reemplazo, ruta_salida)
+            if incremental and en_memoria and not error:
+                with open(ruta_salida, 'rb') as f:
+                    contenido = f.read()
+                os.remove(ruta_salida)
+    except Exception:
+        for ruta in (ruta_salida if incremental else None, reemplazo):
+            if ruta and os.path.exists(ruta):
+                os.remove(ruta)
+        raise
+
+    if error:
+        if incremental:
+            os.remove(ruta_salida)
+        resultado = armar_resultado(nombre, error=error)
+    elif en_memoria:
+        resultado = armar_resultado(nombre)
+        resultado['contenido'] = contenido
+    else:
+        resultado = armar_resultado(nombre, ruta=ruta_salida)
+
+    bytes_salida = None
+    if not error:
+        bytes_salida = len(contenido) if en_memoria else os.path.getsize(ruta_salida)
+    resultado['metricas'] = cronometro.metricas(
+        paginas=paginas,
+        pagina=pagina,
+        perfil_salida=perfil_salida,
+        bytes_entrada=tamano_origen(origen),
+        bytes_salida=bytes_salida,
+        rss_pico=rss_pico()
+    )
+    return resultado
+
+
+def _procesar_seguro(nombre, origen, datos, opciones):
+    """Igual que procesar_documento, pero convierte excepciones en resultados con error"""
+    try:
+        return procesar_documento(nombre, origen, datos, **opciones)
+    except Exception as e:
+        logger.warning("Error procesando %s: %s", nombre, e)
+        return armar_resultado(nombre, error=str(e))
+
+
+def _configuracion_lote(numero, ruta):
+    """(datos, opciones) del lote guardados en ruta; cada trabajador los lee una vez"""
+    configuracion = _estado_trabajador.get(numero)
+    if configuracion is None:
+        with open(ruta, 'rb') as f:
+            configuracion = pickle.load(f)
+        while len(_estado_trabajador) >= MAX_LOTES_EN_TRABAJADOR:
+            del _estado_trabajador[next(iter(_estado_trabajador))]
+        _estado_trabajador[numero] = configuracion
+    return configuracion
+
+
+def _procesar_en_trabajador(configuracion, nombre, origen):
+    """Procesa un PDF usando la configuración del lote cargada en el trabajador"""
+    try:
+        datos, opciones = _configuracion_lote(*configuracion)
+    except Exception as e:
+        return armar_resultado(nombre, error=str(e))
+    return _procesar_seguro(nombre, origen, datos, opciones)
+
+
+def _contexto_procesos():
+    """Contexto para crear los trabajadores sin fork
+
+    Los lotes se lanzan desde hilos (el gestor de tareas dentro del servidor
+    de Streamlit) y hacer fork de un proceso con hilos puede dejar al hijo
+    con un candado tomado para siempre. forkserver (o spawn donde no existe)
+    arranca los trabajadores desde un proceso limpio; por eso los datos,
+    las opciones y las funciones del trabajador tienen que poder serializarse.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    contexto = multiprocessing.get_context('forkserver')
+    # El servidor importa PyMuPDF una vez y cada trabajador nace con él cargado (el
+    # paquete solo si se puede importar sin el sys.path del proceso principal)
+    contexto.set_forkserver_preload(['fitz', __name__])
+    return contexto
+
+
+def _pool_compartido(max_workers):
+    """Pool de procesos para max_workers trabajadores, creado la primera vez que se pide"""
+    with _candado_pools:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            pool = _pools[max_workers] = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=_contexto_procesos()
+            )
+        return pool
+
+
+def _descartar_pool(max_workers, pool):
+    """Saca del caché un pool roto (murió un trabajador); el próximo lote crea otro"""
+    with _candado_pools:
+        if _pools.get(max_workers) is pool:
+            del _pools[max_workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def cerrar_procesos():
+    """Detiene los procesos trabajadores que quedaron vivos entre lotes"""
+    with _candado_pools:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iterar_lote(trabajos, datos, posiciones, orientacion, max_workers=None, **opciones):
+    """Procesa pares (nombre, origen) y entrega los resultados en orden de finalización
+
+    origen puede ser el contenido del PDF (bytes o memoryview) o una ruta.
+    max_workers no pasa de la cantidad de CPUs. Con max_workers=1, o con
+    menos de TRABAJOS_MINIMOS_POR_PROCESO PDFs por proceso, se procesa en el
+    proceso actual; en otro caso se usa un pool de procesos que queda vivo
+    para los lotes siguientes, con un número acotado de trabajos en vuelo. Las demás opciones (directorio_salida, en_memoria,
+    sello, guardado, perfil_salida, portada) se pasan a procesar_documento.
+    """
+    # Un perfil que no se puede usar falla antes de abrir ningún PDF
+    opciones_guardado(
+        opciones.get('perfil_salida', 'rapido'), opciones.get('guardado', 'completo'), opciones.get('portada', False)
+    )
+    # Más procesos que CPUs solo agrega el costo de repartir los PDFs
+    cpus = os.cpu_count() or 1
+    max_workers = min(max_workers or cpus, cpus)
+    opciones = dict(opciones, posiciones=posiciones, orientacion=orientacion)
+
+    # Se miran los primeros trabajos para saber si alcanzan para repartir
+    trabajos = iter(trabajos)
+    primeros = []
+    if max_workers > 1:
+        for trabajo in trabajos:
+            primeros.append(trabajo)
+            if len(primeros) >= max_workers * TRABAJOS_MINIMOS_POR_PROCESO:
+                break
+    trabajos = chain(primeros, trabajos)
+
+    if max_workers == 1 or len(primeros) < max_workers * TRABAJOS_MINIMOS_POR_PROCESO:
+        for nombre, origen in trabajos:
+            yield _procesar_seguro(nombre, origen, datos, opciones)
+        return
+
+    # Los datos y las opciones van una sola vez a un archivo que cada
+    # trabajador lee al recibir su primer PDF del lote
+    descriptor, ruta_configuracion = tempfile.mkstemp(prefix='pdf_masivo_lote_', suffix='.pickle')
+    configuracion = (next(_numeros_lote), ruta_configuracion)
+
+    # Limitar los trabajos en vuelo para no copiar todo el lote a la cola del pool
+    ventana = max_workers * 4
+    pendientes = {}
+
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            pickle.dump((datos, opciones), f, protocol=pickle.HIGHEST_PROTOCOL)
+        pool = _pool_compartido(max_workers)
+
+        while True:
+            while len(pendientes) < ventana:
+                trabajo = next(trabajos, None)
+                if trabajo is None:
+                    break
+                nombre, origen = trabajo
+                if isinstance(origen, memoryview):
+                    # Un memoryview no se puede enviar a otro proceso: se copia solo al enviarlo
+                    origen = origen.tobytes()
+                try:
+                    futuro = pool.submit(_procesar_en_trabajador, configuracion, nombre, origen)
+                except BrokenProcessPool:
+                    _descartar_pool(max_workers, pool)
+                    raise
+                pendientes[futuro] = nombre
+
+            if not pendientes:
+                break
+
+            terminados, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                nombre = pendientes.pop(futuro)
+                try:
+                    yield futuro.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        _descartar_pool(max_workers, pool)
+                    yield armar_resultado(nombre, error=str(e))
+    finally:
+        # Si se deja de consumir el lote (cancelación), no se procesa lo que
+        # quedó en cola; el pool sigue vivo para el próximo lote
+        for futuro in pendientes:
+            futuro.cancel()
+        os.remove(ruta_configuracion)
+
+
+def listar_pdfs(directorio):
+    """Lista los PDFs de un directorio ordenados por nombre"""
+    return sorted(
+        ruta for ruta in Path(directorio).iterdir()
+        if ruta.is_file() and ruta.suffix.lower() == '.pdf'
+    )
+
+
+def escribir_reporte(resultados, ruta_reporte):
+    """Escribe el reporte del lote en JSON o CSV según la extensión
+
+    Se escribe resultado por resultado, así que resultados puede ser un
+    RegistroResultados (en JSON se recorre dos veces: primero se cuenta).
+    """
+    campos = ['nombre', 'ruta', 'en_zip', 'ok', 'error']
+
+    if str(ruta_reporte).lower().endswith('.csv'):
+        with open(ruta_reporte, 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.DictWriter(f, fieldnames=campos, extrasaction='ignore')
+            escritor.writeheader()
+            escritor.writerows(resultados)
+        return
+
+    total = completados = 0
+    for resultado in resultados:
+        total += 1
+        completados += bool(resultado['ok'])
+    encabezado = {'total': total, 'completados': completados, 'errores': total - completados}
+    with open(ruta_reporte, 'w', encoding='utf-8') as f:
+        escribir_json_con_lista(f, encabezado, 'resultados', resultados)
@@ -0,0 +1,408 @@
+# plantilla.py
+"""Plantillas de sello: qué campos se estampan, dónde y con qué formato
+
+Una plantilla es una lista declarativa de campos. Cada campo toma un valor
+de la tabla ('codigo', 'sistema', 'subsistema' o cualquier columna
+adicional) y lo escribe en la primera página con su propia posición,
+tamaño, rotación, fuente y color:
+
+    {
+        "campos": [
+            {"campo": "codigo", "x": 50, "y": 440, "tamano": 10, "fuente": "hebo"},
+            {"campo": "revision", "columna": "Rev.", "x": 50, "y": 420, "formato": "Rev. {}"},
+            {"campo": "fecha", "x": 200, "y": 420, "rotacion": 90, "color": [0, 0, 0.6]},
+            {"campo": "area", "ancla": "inferior-derecha", "x": 180, "y": 40}
+        ],
+        "variantes": [
+            {"cuando": {"pagina": "horizontal", "ancho": [2000, null]},
+             "campos": [...]},
+            {"cuando": {"papel": ["A1", "A0"]}, "campos": [...]}
+        ]
+    }
+
+'columna' es el encabezado de la tabla (si se omite, se busca una columna
+con el nombre del campo). Sin 'ancla', x e y son coordenadas absolutas de
+PyMuPDF, como en la cuadrícula de la vista previa (origen arriba a la
+izquierda del cropbox, sin la rotación de la página). Con 'ancla', x, y y
+la rotación se miden sobre la página tal como se ve: desde una esquina
+('superior-izquierda', 'superior-derecha', 'inferior-izquierda',
+'inferior-derecha'; hacia adentro de la página) o, con 'relativa', como
+fracciones entre 0 y 1 del ancho y el alto. Así un mismo campo cae sobre
+el rótulo en A3, A1 o carta, y derecho aunque la página tenga /Rotate.
+
+Las variantes reemplazan la lista de campos para las páginas que cumplen
+su condición: 'pagina' ('vertical' u 'horizontal', según la forma de la
+página), 'papel' (nombres de TAMANOS_PAPEL, en cualquier orientación) y
+rangos de 'ancho' y 'alto' en puntos. Gana la primera variante que
+coincide; si ninguna coincide se usan los campos principales.
+
+La plantilla se valida al crearla; SelloPreparado elige la variante y
+resuelve las anclas una vez por lote y geometría de página.
+"""
+import hashlib
+import json
+
+# Fuentes base de PDF disponibles sin incrustar nada (nombre corto de PyMuPDF)
+FUENTES = {
+    'helv': 'Helvetica',
+    'hebo': 'Helvetica-Bold',
+    'tiro': 'Times-Roman',
+    'tibo': 'Times-Bold',
+    'cour': 'Courier',
+    'cobo': 'Courier-Bold',
+}
+
+ROTACIONES = (0, 90, 180, 270)
+
+# Desde dónde se miden x e y sobre la página tal como se ve
+ANCLAS = ('superior-izquierda', 'superior-derecha', 'inferior-izquierda', 'inferior-derecha', 'relativa')
+
+# Tamaños de papel (ancho x alto en vertical, en puntos) para las condiciones 'papel'
+TAMANOS_PAPEL = {
+    'A0': (2384, 3370),
+    'A1': (1684, 2384),
+    'A2': (1191, 1684),
+    'A3': (842, 1191),
+    'A4': (595, 842),
+    'Carta': (612, 792),
+    'Oficio': (612, 1008),
+    'Tabloide': (792, 1224),
+}
+
+# Diferencia relativa admitida para reconocer un tamaño de papel
+TOLERANCIA_PAPEL = 0.02
+
+# Campos que existen en todas las tablas
+CAMPOS_BASE = ('codigo', 'sistema', 'subsistema')
+
+# Valores por defecto de cada campo de una plantilla
+CAMPO_POR_DEFECTO = {
+    'tamano': 8,
+    'rotacion': 0,
+    'fuente': 'helv',
+    'color': [0, 0, 0],
+    'formato': '{}',
+}
+
+
+def _numero(valor, nombre, campo):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise ValueError(f"Campo '{campo}': '{nombre}' debe ser un número")
+    return float(valor)
+
+
+def validar_campo(campo):
+    """Devuelve el campo completo con sus valores por defecto o lanza ValueError"""
+    if not isinstance(campo, dict):
+        raise ValueError(f"Cada campo de la plantilla debe ser un diccionario, no {campo!r}")
+    nombre = campo.get('campo')
+    if not isinstance(nombre, str) or not nombre.strip():
+        raise ValueError(f"Falta el nombre del campo ('campo') en {campo!r}")
+    nombre = nombre.strip()
+
+    desconocidas = set(campo) - {'campo', 'columna', 'ancla', 'x', 'y'} - set(CAMPO_POR_DEFECTO)
+    if desconocidas:
+        raise ValueError(f"Campo '{nombre}': opciones desconocidas {sorted(desconocidas)}")
+
+    completo = dict(CAMPO_POR_DEFECTO, **campo)
+    completo['campo'] = nombre
+    for eje in ('x', 'y'):
+        if eje not in campo:
+            raise ValueError(f"Campo '{nombre}': falta la coordenada '{eje}'")
+        completo[eje] = _numero(campo[eje], eje, nombre)
+
+    completo['tamano'] = _numero(completo['tamano'], 'tamano', nombre)
+    if completo['tamano'] <= 0:
+        raise ValueError(f"Campo '{nombre}': el tamaño debe ser mayor que 0")
+
+    if completo['rotacion'] not in ROTACIONES:
+        raise ValueError(f"Campo '{nombre}': la rotación debe ser una de {ROTACIONES}")
+    completo['rotacion'] = int(completo['rotacion'])
+
+    if completo['fuente'] not in FUENTES:
+        raise ValueError(f"Campo '{nombre}': fuente '{completo['fuente']}' no disponible ({', '.join(FUENTES)})")
+
+    color = completo['color']
+    if (
+        not isinstance(color, (list, tuple)) or len(color) != 3
+        or not all(0 <= _numero(c, 'color', nombre) <= 1 for c in color)
+    ):
+        raise ValueError(f"Campo '{nombre}': el color debe ser [r, g, b] con valores entre 0 y 1")
+    completo['color'] = [float(c) for c in color]
+
+    try:
+        completo['formato'].format('')
+    except (AttributeError, IndexError, KeyError, ValueError):
+        raise ValueError(f"Campo '{nombre}': formato inválido {completo['formato']!r} (usar '{{}}' para el valor)")
+
+    columna = completo.get('columna')
+    if columna is not None and not isinstance(columna, str):
+        raise ValueError(f"Campo '{nombre}': 'columna' debe ser el texto del encabezado")
+
+    ancla = completo.get('ancla')
+    if ancla is not None:
+        if ancla not in ANCLAS:
+            raise ValueError(f"Campo '{nombre}': ancla '{ancla}' desconocida ({', '.join(ANCLAS)})")
+        if ancla == 'relativa' and not all(0 <= completo[eje] <= 1 for eje in ('x', 'y')):
+            raise ValueError(f"Campo '{nombre}': con ancla 'relativa', x e y van entre 0 y 1")
+    return completo
+
+
+def _validar_rango(rango, nombre):
+    if (
+        not isinstance(rango, (list, tuple)) or len(rango) != 2
+        or not all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in rango)
+    ):
+        raise ValueError(f"Condición '{nombre}': se espera [mínimo, máximo] (null para sin límite)")
+    return list(rango)
+
+
+def validar_condicion(cuando):
+    """Normaliza la condición de una variante o lanza ValueError"""
+    if not isinstance(cuando, dict) or not cuando:
+        raise ValueError("Cada variante necesita una condición 'cuando'")
+    desconocidas = set(cuando) - {'pagina', 'papel', 'ancho', 'alto'}
+    if desconocidas:
+        raise ValueError(f"Condiciones desconocidas {sorted(desconocidas)} (usar pagina, papel, ancho o alto)")
+    condicion = {}
+    if 'pagina' in cuando:
+        if cuando['pagina'] not in ('vertical', 'horizontal'):
+            raise ValueError("La condición 'pagina' debe ser 'vertical' u 'horizontal'")
+        condicion['pagina'] = cuando['pagina']
+    if 'papel' in cuando:
+        papeles = [cuando['papel']] if isinstance(cuando['papel'], str) else cuando['papel']
+        if not isinstance(papeles, (list, tuple)) or not papeles or any(p not in TAMANOS_PAPEL for p in papeles):
+            raise ValueError(f"La condición 'papel' debe ser uno o más de: {', '.join(TAMANOS_PAPEL)}")
+        condicion['papel'] = list(papeles)
+    for nombre in ('ancho', 'alto'):
+        if nombre in cuando:
+            condicion[nombre] = _validar_rango(cuando[nombre], nombre)
+    return condicion
+
+
+def _validar_campos(campos):
+    if not isinstance(campos, (list, tuple)) or not campos:
+        raise ValueError("La plantilla necesita al menos un campo")
+    return [validar_campo(campo) for campo in campos]
+
+
+def _en_rango(valor, rango):
+    minimo, maximo = rango
+    return (minimo is None or valor >= minimo) and (maximo is None or valor <= maximo)
+
+
+def nombre_papel(ancho, alto):
+    """Nombre del tamaño de papel de una página (en cualquier orientación) o None"""
+    corto, largo = sorted((ancho, alto))
+    for nombre, (ancho_papel, alto_papel) in TAMANOS_PAPEL.items():
+        if (
+            abs(corto - ancho_papel) <= ancho_papel * TOLERANCIA_PAPEL
+            and abs(largo - alto_papel) <= alto_papel * TOLERANCIA_PAPEL
+        ):
+            return nombre
+    return None
+
+
+def descripcion_pagina(ancho, alto):
+    """Tamaño y forma de una página para informes: 'A3 horizontal', '500x700 vertical'"""
+    forma = 'horizontal' if ancho > alto else 'vertical'
+    return f"{nombre_papel(ancho, alto) or f'{ancho:.0f}x{alto:.0f}'} {forma}"
+
+
+def a_pagina_visible(x, y, ancho, alto, rotacion):
+    """Punto de PyMuPDF (sin rotación) en la página tal como se ve
+
+    ancho y alto son los de la página tal como se ve.
+    """
+    if rotacion == 90:
+        return ancho - y, x
+    if rotacion == 180:
+        return ancho - x, alto - y
+    if rotacion == 270:
+        return y, alto - x
+    return x, y
+
+
+def desde_pagina_visible(x, y, ancho, alto, rotacion):
+    """Inversa de a_pagina_visible"""
+    if rotacion == 90:
+        return y, ancho - x
+    if rotacion == 180:
+        return ancho - x, alto - y
+    if rotacion == 270:
+        return alto - y, x
+    return x, y
+
+
+def posicion_anclada(campo, ancho, alto):
+    """Coordenadas (x, y) del campo sobre una página que se ve de ancho x alto puntos"""
+    x, y = campo['x'], campo['y']
+    ancla = campo.get('ancla') or 'superior-izquierda'
+    if ancla == 'relativa':
+        return x * ancho, y * alto
+    if ancla.endswith('derecha'):
+        x = ancho - x
+    if ancla.startswith('inferior'):
+        y = alto - y
+    return x, y
+
+
+def resolver_campos(campos, ancho, alto, rotacion=0):
+    """Campos con coordenadas absolutas de PyMuPDF para la página
+
+    ancho y alto son los de la página tal como se ve y rotacion, su
+    /Rotate. Si ningún campo tiene ancla se devuelven los mismos campos.
+    """
+    if not any(campo.get('ancla') for campo in campos):
+        return campos
+    resueltos = []
+    for campo in campos:
+        resuelto = {clave: valor for clave, valor in campo.items() if clave != 'ancla'}
+        if campo.get('ancla'):
+            x, y = posicion_anclada(campo, ancho, alto)
+            resuelto['x'], resuelto['y'] = desde_pagina_visible(x, y, ancho, alto, rotacion)
+            # El texto se gira con la página: se compensa para que se vea como se pidió
+            resuelto['rotacion'] = (campo['rotacion'] + rotacion) % 360
+        resueltos.append(resuelto)
+    return resueltos
+
+
+def anclar_campo(campo, ancla, ancho, alto, rotacion=0):
+    """Campo con posición absoluta, reexpresado respecto del ancla
+
+    Las posiciones se midieron en una página que se ve de ancho x alto con
+    la rotación indicada. Los campos que ya tienen ancla quedan como están.
+    """
+    if campo.get('ancla') or ancla is None:
+        return dict(campo)
+    x, y = a_pagina_visible(campo['x'], campo['y'], ancho, alto, rotacion)
+    if ancla == 'relativa':
+        x, y = x / ancho, y / alto
+    else:
+        if ancla.endswith('derecha'):
+            x = ancho - x
+        if ancla.startswith('inferior'):
+            y = alto - y
+    return dict(campo, x=x, y=y, rotacion=(campo['rotacion'] - rotacion) % 360, ancla=ancla)
+
+
+class Plantilla:
+    """Plantilla de sello validada
+
+    campos es la lista principal y variantes, pares {'cuando', 'campos'}
+    para otros tamaños u orientaciones de página.
+    """
+
+    def __init__(self, campos, variantes=()):
+        self.campos = _validar_campos(campos)
+        self.variantes = []
+        for variante in variantes or ():
+            if not isinstance(variante, dict):
+                raise ValueError(f"Variante inválida: {variante!r}")
+            self.variantes.append({
+                'cuando': validar_condicion(variante.get('cuando')),
+                'campos': _validar_campos(variante.get('campos')),
+            })
+
+    @classmethod
+    def desde_dict(cls, datos):
+        if isinstance(datos, (list, tuple)):
+            return cls(datos)
+        if not isinstance(datos, dict):
+            raise ValueError("La plantilla debe ser un objeto con 'campos' o una lista de campos")
+        desconocidas = set(datos) - {'campos', 'variantes'}
+        if desconocidas:
+            raise ValueError(f"Claves desconocidas en la plantilla: {sorted(desconocidas)}")
+        return cls(datos.get('campos'), datos.get('variantes'))
+
+    def como_dict(self):
+        return {'campos': self.campos, 'variantes': self.variantes}
+
+    def huella(self):
+        """Huella de la plantilla para el manifiesto de trabajos reanudables"""
+        texto = json.dumps(self.como_dict(), sort_keys=True)
+        return hashlib.sha256(texto.encode()).hexdigest()
+
+    def variante_para(self, ancho, alto):
+        """Campos (sin resolver anclas) de la variante para una página de ancho x alto puntos"""
+        forma = 'horizontal' if ancho > alto else 'vertical'
+        papel = nombre_papel(ancho, alto)
+        for variante in self.variantes:
+            cuando = variante['cuando']
+            if (
+                cuando.get('pagina', forma) == forma
+                and papel in cuando.get('papel', (papel,))
+                and _en_rango(ancho, cuando.get('ancho', (None, None)))
+                and _en_rango(alto, cuando.get('alto', (None, None)))
+            ):
+                return variante['campos']
+        return self.campos
+
+    def campos_para(self, ancho, alto, rotacion=0):
+        """Campos para una página que se ve de ancho x alto puntos, con las anclas resueltas"""
+        return resolver_campos(self.variante_para(ancho, alto), ancho, alto, rotacion)
+
+    def anclada(self, ancla, ancho, alto, rotacion=0):
+        """Copia con los campos principales reexpresados respecto del ancla
+
+        ancho, alto y rotacion son los de la página donde se midieron las
+        posiciones (la del PDF de ejemplo, tal como se ve). Las variantes,
+        que son para otras páginas, se dejan como están.
+        """
+        return Plantilla(
+            [anclar_campo(campo, ancla, ancho, alto, rotacion) for campo in self.campos],
+            self.variantes
+        )
+
+    def todos_los_campos(self):
+        """Campos de la lista principal y de todas las variantes"""
+        yield from self.campos
+        for variante in self.variantes:
+            yield from variante['campos']
+
+    def columnas(self):
+        """Columnas de la tabla que necesita la plantilla: campo -> encabezado
+
+        El encabezado es 'columna' o, si no se indicó, el nombre del campo.
+        Código, sistema y subsistema solo se incluyen si indican 'columna'
+        (si no, se detectan como siempre).
+        """
+        columnas = {}
+        for campo in self.todos_los_campos():
+            nombre, columna = campo['campo'], campo.get('columna')
+            if columna:
+                columnas[nombre] = columna
+            elif nombre not in CAMPOS_BASE:
+                columnas.setdefault(nombre, nombre)
+        return columnas
+
+
+def cargar_plantilla(fuente):
+    """Plantilla desde una ruta .json, un archivo subido, un texto JSON o un diccionario"""
+    if isinstance(fuente, Plantilla):
+        return fuente
+    if isinstance(fuente, (dict, list, tuple)):
+        return Plantilla.desde_dict(fuente)
+    if hasattr(fuente, 'read'):
+        texto = fuente.read()
+    elif isinstance(fuente, str) and fuente.lstrip().startswith(('{', '[')):
+        texto = fuente
+    else:
+        with open(fuente, encoding='utf-8') as f:
+            texto = f.read()
+    if isinstance(texto, bytes):
+        texto = texto.decode('utf-8')
+    try:
+        datos = json.loads(texto)
+    except ValueError as e:
+        raise ValueError(f"La plantilla no es un JSON válido: {e}")
+    return Plantilla.desde_dict(datos)
+
+
+def plantilla_desde_posiciones(posiciones, orientacion, fontsize=8):
+    """Plantilla equivalente al sello clásico: sistema, subsistema y código en Helvetica negra"""
+    rotacion = 90 if orientacion == "vertical" else 0
+    return Plantilla([
+        {'campo': campo, 'x': posicion['x'], 'y': posicion['y'], 'tamano': fontsize, 'rotacion': rotacion}
+        for campo, posicion in zip(('sistema', 'subsistema', 'codigo'), posiciones)
+    ])
@@ -0,0 +1,133 @@
+# registro.py
+"""Resultados de un lote en un archivo JSON Lines en lugar de una lista
+
+En lotes de decenas de miles de PDFs la lista de resultados (con sus
+métricas) crece con el lote. RegistroResultados se usa como esa lista
+(append, len, recorrerlo, índices y rebanadas) pero cada resultado se
+escribe en disco apenas llega y en memoria solo quedan los contadores y
+la posición en el archivo de uno de cada PAGINA_REGISTRO resultados, para
+leer una página sin recorrer el archivo desde el principio.
+
+El contenido de los PDFs ('contenido') nunca se escribe: el registro es
+para resultados que ya pasaron por el ZIP o el directorio de salida.
+"""
+import json
+import os
+import tempfile
+import threading
+from itertools import islice
+
+# Cada cuántos resultados se guarda su posición en el archivo
+PAGINA_REGISTRO = 1000
+
+
+class RegistroResultados:
+    """Lista de resultados respaldada por un archivo JSON Lines
+
+    Sin ruta se usa un archivo temporal, que borrar() elimina. Un hilo
+    puede agregar resultados mientras otro los lee: solo se leen las
+    líneas ya completas.
+    """
+
+    def __init__(self, ruta=None, pagina=PAGINA_REGISTRO):
+        if ruta is None:
+            descriptor, ruta = tempfile.mkstemp(prefix='pdf_masivo_resultados_', suffix='.jsonl')
+            os.close(descriptor)
+        self.ruta = ruta
+        self.pagina = pagina
+        self.completados = 0
+        self.omitidos = 0
+        self._total = 0
+        self._marcas = []
+        self._archivo = open(ruta, 'wb')
+        self._candado = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def __len__(self):
+        return self._total
+
+    @property
+    def errores(self):
+        return self._total - self.completados
+
+    def append(self, resultado):
+        """Escribe el resultado al final del registro (sin 'contenido')"""
+        linea = json.dumps(
+            {clave: valor for clave, valor in resultado.items() if clave != 'contenido'},
+            ensure_ascii=False
+        ).encode('utf-8') + b'\n'
+        with self._candado:
+            if self._total % self.pagina == 0:
+                self._marcas.append(self._archivo.tell())
+            self._archivo.write(linea)
+            self._archivo.flush()
+            self._total += 1
+            self.completados += bool(resultado['ok'])
+            self.omitidos += bool(resultado.get('omitido'))
+
+    def _leer(self, inicio, fin):
+        """Resultados de inicio a fin (sin incluir) leyendo desde la marca más cercana"""
+        with self._candado:
+            fin = min(fin, self._total)
+            if inicio >= fin:
+                return
+            marca = self._marcas[inicio // self.pagina]
+        with open(self.ruta, 'rb') as f:
+            f.seek(marca)
+            lineas = islice(f, inicio % self.pagina, inicio % self.pagina + fin - inicio)
+            for linea in lineas:
+                yield json.loads(linea)
+
+    def __iter__(self):
+        return self._leer(0, len(self))
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            inicio, fin, paso = indice.indices(len(self))
+            if paso != 1:
+                raise ValueError("RegistroResultados no admite rebanadas con paso")
+            return list(self._leer(inicio, fin))
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError(indice)
+        return next(self._leer(indice, indice + 1))
+
+    def cerrar(self):
+        """Deja de escribir (el registro se puede seguir leyendo)"""
+        with self._candado:
+            if not self._archivo.closed:
+                self._archivo.close()
+
+    def borrar(self):
+        """Cierra y elimina el archivo del registro"""
+        self.cerrar()
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+
+def _sangrar(texto, espacios):
+    return texto.replace('\n', '\n' + ' ' * espacios)
+
+
+def escribir_json_con_lista(f, encabezado, clave, elementos):
+    """Escribe {**encabezado, clave: [elementos]} sin armar la lista en memoria
+
+    El texto es el mismo que el de json.dump(..., indent=2, ensure_ascii=False).
+    Lo usan el reporte del lote (escribir_reporte) y las métricas
+    (escribir_metricas) para no cargar los resultados de un registro en disco.
+    """
+    f.write('{\n')
+    for nombre, valor in encabezado.items():
+        f.write(f"  {json.dumps(nombre)}: {_sangrar(json.dumps(valor, ensure_ascii=False, indent=2), 2)},\n")
+    f.write(f"  {json.dumps(clave)}: [")
+    separador = '\n    '
+    for elemento in elementos:
+        f.write(separador + _sangrar(json.dumps(elemento, ensure_ascii=False, indent=2), 4))
+        separador = ',\n    '
+    f.write(']\n}' if separador == '\n    ' else '\n  ]\n}')
@@ -0,0 +1,201 @@
+# salida.py
+"""Armado del ZIP de salida y del PDF de portadas a medida que terminan los PDFs
+
+Los PDFs estampados en memoria (procesar_documento con en_memoria=True) se
+escriben directo en el ZIP y se liberan: no quedan archivos temporales por
+PDF ni se vuelve a leer cada archivo para armar el ZIP.
+
+escribir_portadas une en un solo PDF la primera página de cada PDF
+estampado (por ejemplo, las portadas para una transmisión), en la misma
+pasada del lote, por partes en un PDF temporal para que la memoria no
+crezca con el lote. Se puede encadenar antes de escribir_en_zip.
+"""
+import os
+import tempfile
+import time
+import zipfile
+
+from .diferido import importar_diferido
+from .nucleo import abrir_documento, opciones_guardado
+
+fitz = importar_diferido('fitz')  # PyMuPDF
+
+# Carpeta dentro del ZIP donde quedan los PDFs editados
+CARPETA_ZIP = 'editados'
+
+# Páginas del índice de portadas: A4 vertical, renglones por página,
+# tamaño de letra y distancia entre renglones
+PAGINA_INDICE = (595, 842)
+RENGLONES_INDICE = 50
+TAMANO_RENGLON = 9
+ESPACIO_RENGLON = 14
+
+# Portadas que se juntan en memoria antes de agregarlas al PDF en disco
+PORTADAS_POR_PARTE = 200
+
+
+def nombre_en_zip(nombre, carpeta=CARPETA_ZIP):
+    """Ruta del PDF dentro del ZIP (las subcarpetas del nombre se conservan)"""
+    nombre = nombre.replace(os.sep, '/')
+    return f"{carpeta}/{nombre}" if carpeta else nombre
+
+
+def escribir_en_zip(resultados, destino, comprimir=False, carpeta=CARPETA_ZIP, nivel=None):
+    """Escribe en el ZIP cada PDF terminado y entrega el resultado sin su contenido
+
+    destino es una ruta o un archivo abierto en modo binario. Como los PDFs
+    ya vienen comprimidos, por defecto se guardan sin comprimir (ZIP_STORED);
+    con comprimir=True se usa deflate con el nivel indicado (1, más rápido,
+    a 9, más chico; por defecto el de zlib, 6). Cada resultado queda con
+    'en_zip' igual al nombre dentro del archivo (o None si hubo error). Los
+    resultados sin contenido pero con ruta (lotes reanudables, que estampan
+    en un directorio) se copian al ZIP desde el archivo. El ZIP se cierra al
+    terminar de recorrer los resultados. El tiempo de escritura de cada PDF
+    se suma a sus métricas como etapa 'zip'; el ZIP se arma mientras los
+    procesos trabajadores siguen estampando.
+    """
+    compresion = zipfile.ZIP_DEFLATED if comprimir else zipfile.ZIP_STORED
+
+    if nivel is not None and not 1 <= nivel <= 9:
+        raise ValueError(f"Nivel de compresión del ZIP inválido: {nivel} (de 1 a 9)")
+
+    with zipfile.ZipFile(destino, 'w', compression=compresion, compresslevel=nivel, allowZip64=True) as zipf:
+        for resultado in resultados:
+            contenido = resultado.pop('contenido', None)
+            resultado['en_zip'] = None
+            inicio = time.perf_counter()
+
+            if contenido is not None:
+                resultado['en_zip'] = nombre_en_zip(resultado['nombre'], carpeta)
+                zipf.writestr(resultado['en_zip'], contenido)
+            elif resultado['ok'] and resultado['ruta']:
+                resultado['en_zip'] = nombre_en_zip(resultado['nombre'], carpeta)
+                zipf.write(resultado['ruta'], resultado['en_zip'])
+
+            if resultado['en_zip'] and resultado.get('metricas') is not None:
+                resultado['metricas']['zip'] = round(time.perf_counter() - inicio, 6)
+
+            yield resultado
+
+
+def _agregar_indice(unido, nombres):
+    """Inserta al principio páginas con cada nombre, su página y un enlace; devuelve cuántas
+
+    Cada columna de una hoja se escribe en un solo insert_text y los
+    enlaces como objetos del PDF: insert_link carga la página de destino.
+    """
+    ancho, alto = PAGINA_INDICE
+    paginas = (len(nombres) - 1) // RENGLONES_INDICE + 1 if nombres else 0
+    # Primero todas las hojas: los enlaces apuntan a la página que ocupa ese número al crearlos
+    for numero in range(paginas):
+        unido.new_page(pno=numero, width=ancho, height=alto)
+    interlineado = ESPACIO_RENGLON / TAMANO_RENGLON
+    for numero in range(paginas):
+        hoja = unido[numero]
+        if numero == 0:
+            hoja.insert_text((56, 48), "Índice de portadas", fontsize=14)
+        desde = numero * RENGLONES_INDICE
+        renglones = nombres[desde:desde + RENGLONES_INDICE]
+        destinos = range(paginas + desde, paginas + desde + len(renglones))
+        hoja.insert_text((56, 80), renglones, fontsize=TAMANO_RENGLON, lineheight=interlineado)
+        hoja.insert_text(
+            (ancho - 80, 80), [str(destino + 1) for destino in destinos],
+            fontsize=TAMANO_RENGLON, lineheight=interlineado
+        )
+        enlaces = []
+        for i, destino in enumerate(destinos):
+            # Rect en coordenadas del PDF (origen abajo a la izquierda) de la hoja A4 sin rotar
+            y = alto - (80 + i * ESPACIO_RENGLON)
+            xref = unido.get_new_xref()
+            unido.update_object(
+                xref,
+                f"<</Type/Annot/Subtype/Link/Border[0 0 0]/Rect[56 {y - 3} {ancho - 56} {y + 10}]"
+                f"/Dest[{unido.page_xref(destino)} 0 R/Fit]>>"
+            )
+            enlaces.append(f"{xref} 0 R")
+        if enlaces:
+            unido.xref_set_key(hoja.xref, 'Annots', f"[{' '.join(enlaces)}]")
+    return paginas
+
+
+def _agregar_parte(parte, ruta):
+    """Agrega las páginas de parte al final del PDF en ruta (lo crea si no existe)
+
+    El PDF en disco se abre sin cargar sus páginas y los cambios se agregan
+    al final del archivo, así que la memoria solo depende de la parte.
+    """
+    if not os.path.exists(ruta):
+        parte.save(ruta)
+        return
+    doc = fitz.open(ruta)
+    try:
+        doc.insert_pdf(parte, links=False)
+        doc.save(ruta, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    finally:
+        doc.close()
+
+
+def escribir_portadas(resultados, destino, indice=False, perfil_salida='rapido',
+                      portadas_por_parte=PORTADAS_POR_PARTE):
+    """Une la primera página de cada PDF terminado en un solo PDF y entrega los resultados
+
+    destino es una ruta o un archivo abierto en modo binario. Cada portada
+    se copia apenas termina su PDF, desde 'contenido' o desde 'ruta' (sin
+    quitar el contenido, para seguir con escribir_en_zip), y lleva un
+    marcador con el nombre del archivo. Cada resultado queda con
+    'en_portadas' igual a su número de portada (desde 1; None si hubo
+    error). Con indice=True se agregan al principio páginas con la lista de
+    archivos y enlaces a cada portada. En memoria quedan a lo sumo
+    portadas_por_parte portadas: cada parte completa se agrega a un PDF
+    temporal en disco, que al terminar de recorrer los resultados se guarda
+    en destino con las opciones de perfil_salida. Si se deja de recorrer
+    antes (cancelación), no se guarda. El tiempo de cada portada se suma a
+    sus métricas como etapa 'portadas' (el de agregar la parte, a la
+    portada que la completa).
+    """
+    opciones_pdf = opciones_guardado(perfil_salida)
+    nombres = []
+    with tempfile.TemporaryDirectory(prefix='portadas_') as directorio:
+        acumulado = os.path.join(directorio, 'portadas.pdf')
+        parte = fitz.open()
+        try:
+            for resultado in resultados:
+                resultado['en_portadas'] = None
+                contenido = resultado.get('contenido')
+                origen = contenido if contenido is not None else resultado['ruta']
+
+                if resultado['ok'] and origen:
+                    inicio = time.perf_counter()
+                    doc = abrir_documento(origen)
+                    try:
+                        parte.insert_pdf(doc, from_page=0, to_page=0, links=False)
+                    finally:
+                        doc.close()
+                    if len(parte) >= portadas_por_parte:
+                        _agregar_parte(parte, acumulado)
+                        parte.close()
+                        parte = fitz.open()
+                    nombres.append(resultado['nombre'])
+                    resultado['en_portadas'] = len(nombres)
+                    if resultado.get('metricas') is not None:
+                        resultado['metricas']['portadas'] = round(time.perf_counter() - inicio, 6)
+
+                yield resultado
+
+            if len(parte) > 0:
+                _agregar_parte(parte, acumulado)
+        finally:
+            parte.close()
+
+        unido = fitz.open(acumulado) if os.path.exists(acumulado) else fitz.open()
+        try:
+            paginas_indice = _agregar_indice(unido, nombres) if indice else 0
+            marcadores = [[1, "Índice", 1]] if paginas_indice else []
+            marcadores += [[1, nombre, paginas_indice + i + 1] for i, nombre in enumerate(nombres)]
+            unido.set_toc(marcadores)
+            if len(unido) == 0:
+                # Un PDF sin páginas no se puede guardar
+                unido.new_page(width=PAGINA_INDICE[0], height=PAGINA_INDICE[1])
+            unido.save(destino, **opciones_pdf)
+        finally:
+            unido.close()
@@ -0,0 +1,216 @@
+# sello.py
+"""Estampado preparado una vez por lote
+
+page.insert_text reconstruye en cada llamada la fuente, la transformación
+y el contenido de la página (y revisa el balance q/Q de todo el contenido).
+SelloPreparado toma una plantilla de campos (ver plantilla.py; por defecto
+sistema, subsistema y código en las posiciones indicadas), elige una sola
+vez por geometría de página (mediabox, cropbox y rotación) la variante que
+corresponde, resuelve las anclas y calcula los operadores PDF de cada
+campo: un lote que mezcla A3, A1 y carta arma cada tamaño una sola vez.
+Guarda los fragmentos de textos repetidos (sistema, subsistema) y en cada
+documento solo agrega los objetos de fuente y un stream de contenido. El
+resultado visual es el mismo que con insert_text.
+"""
+from functools import lru_cache
+
+from .diferido import importar_diferido
+from .nucleo import estampar_campos, textos_de_campos
+from .plantilla import FUENTES, plantilla_desde_posiciones
+
+fitz = importar_diferido('fitz')  # PyMuPDF
+
+# Nombre del recurso de fuente del sello dentro de la página (Helvetica)
+RECURSO_FUENTE = 'SelloHelv'
+
+# Texto de marca para separar el prefijo y el sufijo generados por PyMuPDF
+_MARCA = "\x01"
+_MARCA_CODIFICADA = b"[<01>]"
+
+
+def recurso_fuente(fuente):
+    """Nombre del recurso de una fuente del sello ('helv' -> 'SelloHelv')"""
+    return f"Sello{fuente.capitalize()}"
+
+
+def objeto_fuente(fuente):
+    """Objeto PDF de una fuente base, igual al que inserta PyMuPDF"""
+    return f"<</Type/Font/Subtype/Type1/BaseFont/{FUENTES[fuente]}/Encoding/WinAnsiEncoding>>"
+
+
+@lru_cache(maxsize=4096)
+def codificar_texto(texto):
+    """Codifica el texto como lo hace PyMuPDF para fuentes simples (operador TJ)"""
+    return fitz.getTJstr(texto, None, True, -1).encode('ascii')
+
+
+def geometria_pagina(pagina):
+    """Clave de geometría de la página: mediabox, cropbox y rotación"""
+    return (tuple(pagina.mediabox), tuple(pagina.cropbox), pagina.rotation)
+
+
+def tamano_visible(geometria):
+    """(ancho, alto) de la página tal como se ve: el cropbox con la rotación aplicada"""
+    _, cropbox, rotacion = geometria
+    ancho, alto = cropbox[2] - cropbox[0], cropbox[3] - cropbox[1]
+    if rotacion % 180:
+        ancho, alto = alto, ancho
+    return ancho, alto
+
+
+class SelloPreparado:
+    """Sello listo para aplicar en muchos PDFs
+
+    Se crea una vez por lote con las posiciones y la orientación (sello de
+    sistema, subsistema y código) o con una Plantilla de campos; puede
+    enviarse a los procesos trabajadores (no guarda objetos de PyMuPDF).
+    Con clasico=True siempre estampa con insert_text (para comparar).
+    """
+
+    def __init__(self, posiciones=None, orientacion="vertical", fontsize=8, max_fragmentos=4096,
+                 plantilla=None, clasico=False):
+        if plantilla is None and posiciones is None:
+            raise ValueError("SelloPreparado necesita posiciones o una plantilla")
+        self.plantilla = plantilla
+        self.campos_plantilla = plantilla or plantilla_desde_posiciones(posiciones, orientacion, fontsize)
+        self.clasico = clasico
+        self.max_fragmentos = max_fragmentos
+        self._variantes = {}
+        self._prefijos = {}
+        self._fragmentos = {}
+
+    def __getstate__(self):
+        # Los cachés se reconstruyen en cada proceso
+        estado = self.__dict__.copy()
+        estado['_variantes'] = {}
+        estado['_prefijos'] = {}
+        estado['_fragmentos'] = {}
+        return estado
+
+    def _campos(self, geometria):
+        """Campos de la plantilla para esta geometría de página, con las anclas resueltas"""
+        campos = self._variantes.get(geometria)
+        if campos is None:
+            campos = self._variantes[geometria] = self.campos_plantilla.campos_para(
+                *tamano_visible(geometria), geometria[2]
+            )
+        return campos
+
+    def _prefijo(self, geometria, i, campo):
+        """Prefijo y sufijo de operadores PDF para el campo i en esta geometría"""
+        clave = (geometria, i)
+        if clave not in self._prefijos:
+            mediabox, cropbox, rotacion = geometria
+            doc = fitz.open()
+            try:
+                pagina = doc.new_page(width=mediabox[2] - mediabox[0], height=mediabox[3] - mediabox[1])
+                pagina.set_mediabox(fitz.Rect(mediabox))
+                pagina.set_cropbox(fitz.Rect(cropbox))
+                pagina.set_rotation(rotacion)
+                pagina.insert_text(
+                    (campo['x'], campo['y']),
+                    _MARCA, fontsize=campo['tamano'], fontname=campo['fuente'],
+                    color=tuple(campo['color']), rotate=campo['rotacion']
+                )
+                contenido = doc.xref_stream(pagina.get_contents()[-1])
+            finally:
+                doc.close()
+
+            prefijo, sufijo = contenido.split(_MARCA_CODIFICADA)
+            fuente = campo['fuente']
+            prefijo = prefijo.replace(f"/{fuente} ".encode(), f"/{recurso_fuente(fuente)} ".encode())
+            self._prefijos[clave] = (prefijo, sufijo)
+        return self._prefijos[clave]
+
+    def _fragmento(self, geometria, i, campo, texto):
+        """Operadores PDF completos para un texto; se guardan los repetidos"""
+        clave = (geometria, i, texto)
+        fragmento = self._fragmentos.get(clave)
+        if fragmento is None:
+            prefijo, sufijo = self._prefijo(geometria, i, campo)
+            fragmento = prefijo + codificar_texto(texto) + sufijo
+            if len(self._fragmentos) < self.max_fragmentos:
+                self._fragmentos[clave] = fragmento
+        return fragmento
+
+    def aplicar(self, doc, valores):
+        """Estampa los campos en la primera página del documento
+
+        valores es un diccionario campo -> valor (el registro de la tabla
+        con 'codigo') o, como antes, la lista [sistema, subsistema, código].
+        """
+        pagina = doc[0]
+        if not isinstance(valores, dict):
+            valores = dict(zip(('sistema', 'subsistema', 'codigo'), valores))
+        geometria = geometria_pagina(pagina)
+        campos = self._campos(geometria)
+        textos = textos_de_campos(campos, valores)
+
+        # Casos poco comunes (recursos heredados, contenido como arreglo
+        # indirecto, textos de varias líneas): se usa el estampado clásico
+        if self.clasico or not admite_operadores(doc, pagina) or any("\n" in texto for texto in textos):
+            estampar_campos(pagina, campos, valores)
+            return
+
+        operadores = b"".join(
+            self._fragmento(geometria, i, campo, texto)
+            for i, (campo, texto) in enumerate(zip(campos, textos)) if texto
+        )
+        if operadores:
+            agregar_operadores(doc, pagina, operadores, {campo['fuente'] for campo in campos})
+
+
+def admite_operadores(doc, pagina):
+    """Indica si se pueden agregar operadores a la página sin pasar por insert_text"""
+    tipo_contenido, contenido = doc.xref_get_key(pagina.xref, "Contents")
+    tipo_recursos, _ = doc.xref_get_key(pagina.xref, "Resources")
+
+    if tipo_recursos not in ('dict', 'xref'):
+        return False
+    if tipo_contenido == 'xref':
+        return doc.xref_is_stream(int(contenido.split()[0]))
+    return tipo_contenido in ('array', 'null')
+
+
+def agregar_operadores(doc, pagina, operadores, fuentes=('helv',)):
+    """Agrega operadores PDF al final del contenido de la página
+
+    Registra las fuentes del sello como /SelloHelv, /SelloHebo, etc. y deja
+    el contenido original entre q/Q para que su estado gráfico no afecte lo
+    agregado. Requiere admite_operadores(doc, pagina).
+    """
+    for fuente in sorted(fuentes):
+        xref_fuente = doc.get_new_xref()
+        doc.update_object(xref_fuente, objeto_fuente(fuente))
+        _agregar_fuente(doc, pagina, xref_fuente, recurso_fuente(fuente))
+
+    tipo_contenido, contenido = doc.xref_get_key(pagina.xref, "Contents")
+    if tipo_contenido == 'null':
+        xref_nuevo = _nuevo_stream(doc, operadores)
+        nuevo_contenido = f"[{xref_nuevo} 0 R]"
+    else:
+        xref_q = _nuevo_stream(doc, b"q\n")
+        xref_nuevo = _nuevo_stream(doc, b"\nQ\n" + operadores)
+        anterior = contenido.strip("[]") if tipo_contenido == 'array' else contenido
+        nuevo_contenido = f"[{xref_q} 0 R {anterior} {xref_nuevo} 0 R]"
+    doc.xref_set_key(pagina.xref, "Contents", nuevo_contenido)
+
+
+def _agregar_fuente(doc, pagina, xref_fuente, recurso=RECURSO_FUENTE):
+    """Registra una fuente del sello en /Resources/Font, siguiendo referencias indirectas"""
+    xref, ruta = pagina.xref, []
+    for clave in ("Resources", "Font"):
+        ruta.append(clave)
+        tipo, valor = doc.xref_get_key(xref, "/".join(ruta))
+        if tipo == 'xref':
+            xref, ruta = int(valor.split()[0]), []
+    ruta.append(recurso)
+    doc.xref_set_key(xref, "/".join(ruta), f"{xref_fuente} 0 R")
+
+
+def _nuevo_stream(doc, datos):
+    """Crea un objeto stream nuevo con los datos indicados"""
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.update_stream(xref, datos)
+    return xref
@@ -0,0 +1,297 @@
+# tareas.py
+"""Tareas en segundo plano, independientes de la ejecución del script de Streamlit
+
+Un GestorTareas por proceso del servidor (en la aplicación se comparte con
+st.cache_resource) recibe lotes y los ejecuta en hilos propios. La interfaz
+solo envía la tarea, consulta su estado y descarga el resultado, así que un
+rerun o un cambio de widget no corta ni bloquea el lote.
+
+- max_tareas: cuántos lotes corren a la vez; el resto espera en cola.
+- workers_por_tarea: procesos de estampado por lote (por defecto, los CPUs
+  repartidos entre max_tareas), para que un lote grande no deje sin CPU a
+  los demás usuarios.
+- Cancelar una tarea la detiene entre un PDF y el siguiente; los PDFs que
+  ya estaban enviados al pool se descartan.
+- Con en_disco=True los resultados van a un RegistroResultados (archivo
+  JSON Lines) en lugar de una lista, para lotes que no caben en memoria;
+  la interfaz los lee por páginas con pagina_resultados.
+- Lo que una tarea deja en disco (salida, adjuntos y registro) se borra al
+  olvidarla, al cerrar el gestor o, si nadie lo hace, pasado max_edad. Una
+  salida ya descargada se puede borrar antes con borrar_salida.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .registro import RegistroResultados
+
+logger = logging.getLogger(__name__)
+
+EN_COLA = 'en_cola'
+EN_CURSO = 'en_curso'
+TERMINADA = 'terminada'
+CANCELADA = 'cancelada'
+FALLIDA = 'fallida'
+
+ESTADOS_FINALES = (TERMINADA, CANCELADA, FALLIDA)
+
+
+class Tarea:
+    """Estado de un lote enviado al gestor
+
+    Lo actualiza el hilo que ejecuta el lote; la interfaz solo lo lee.
+    """
+
+    def __init__(self, crear_lote, total, descripcion='', propietario=None, archivo=None, info=None,
+                 resultados=None, adjuntos=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.crear_lote = crear_lote
+        self.total = total
+        self.descripcion = descripcion
+        self.propietario = propietario
+        self.archivo = archivo
+        self.adjuntos = adjuntos if adjuntos is not None else {}
+        self.info = info if info is not None else {}
+        self.estado = EN_COLA
+        self.error = None
+        self.resultados = resultados if resultados is not None else []
+        self.borradas = set()
+        self.completados = 0
+        self.omitidos = 0
+        self.ultimo = None
+        self.creada = time.time()
+        self.inicio = None
+        self.fin = None
+        self._cancelar = threading.Event()
+        self._candado = threading.Lock()
+        self._olvidada = False
+
+    @property
+    def procesados(self):
+        return len(self.resultados)
+
+    @property
+    def progreso(self):
+        """Fracción procesada entre 0 y 1"""
+        if not self.total:
+            return 1.0 if self.estado in ESTADOS_FINALES else 0.0
+        return min(self.procesados / self.total, 1.0)
+
+    @property
+    def terminada(self):
+        return self.estado in ESTADOS_FINALES
+
+    @property
+    def cancelada(self):
+        return self._cancelar.is_set()
+
+    def cancelar(self):
+        """Pide detener la tarea (si está en cola no llega a empezar)"""
+        self._cancelar.set()
+
+    @property
+    def en_disco(self):
+        return isinstance(self.resultados, RegistroResultados)
+
+    def obtener_resultados(self):
+        """Copia de los resultados acumulados hasta ahora
+
+        Con los resultados en disco se devuelve el registro, que se lee del
+        archivo a medida que se recorre.
+        """
+        if self.en_disco:
+            return self.resultados
+        with self._candado:
+            return list(self.resultados)
+
+    def pagina_resultados(self, inicio, cantidad):
+        """Resultados de inicio a inicio + cantidad, sin copiar el resto"""
+        if self.en_disco:
+            return self.resultados[inicio:inicio + cantidad]
+        with self._candado:
+            return self.resultados[inicio:inicio + cantidad]
+
+    def _agregar(self, resultado):
+        with self._candado:
+            self.resultados.append(resultado)
+            self.completados += bool(resultado['ok'])
+            self.omitidos += bool(resultado.get('omitido'))
+            self.ultimo = resultado['nombre']
+
+    def borrar_salida(self, nombre=None):
+        """Borra del disco la salida (o el adjunto nombre), por ejemplo después de descargarla"""
+        ruta = self.archivo if nombre is None else self.adjuntos.get(nombre)
+        if ruta and os.path.exists(ruta):
+            os.remove(ruta)
+        self.borradas.add(nombre)
+
+    def _descartar(self):
+        """Borra lo que la tarea dejó en disco (salida, adjuntos y registro de resultados)"""
+        for ruta in [self.archivo, *self.adjuntos.values()]:
+            if ruta and os.path.exists(ruta):
+                os.remove(ruta)
+        if self.en_disco:
+            self.resultados.borrar()
+
+    def resumen(self):
+        """Estado de la tarea como diccionario (sin los resultados por archivo)"""
+        fin = self.fin or time.time()
+        return {
+            'id': self.id,
+            'descripcion': self.descripcion,
+            'estado': self.estado,
+            'procesados': self.procesados,
+            'total': self.total,
+            'completados': self.completados,
+            'ultimo': self.ultimo,
+            'error': self.error,
+            'segundos': round(fin - self.inicio, 1) if self.inicio else 0.0,
+        }
+
+
+class GestorTareas:
+    """Cola de lotes con un máximo de tareas en curso a la vez"""
+
+    def __init__(self, max_tareas=2, workers_por_tarea=None, max_edad=6 * 3600):
+        self.max_tareas = max_tareas
+        self.workers_por_tarea = workers_por_tarea or max(1, (os.cpu_count() or 1) // max_tareas)
+        self.max_edad = max_edad
+        self._tareas = {}
+        self._candado = threading.Lock()
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_tareas, thread_name_prefix='tarea')
+
+    def enviar(self, crear_lote, total, descripcion='', propietario=None, archivo=None, info=None,
+               en_disco=False, adjuntos=None):
+        """Encola un lote y devuelve su Tarea
+
+        crear_lote(max_workers) debe devolver un iterador de resultados (por
+        ejemplo iterar_lote o escribir_en_zip sobre él); se llama recién
+        cuando la tarea empieza. total puede ser None si no se conoce de
+        antemano. archivo es la ruta de la salida de la tarea (se borra al
+        limpiar tareas viejas), adjuntos, otras salidas por nombre que se
+        borran con ella (por ejemplo {'portadas': ruta}) e info, datos
+        libres para mostrar en la interfaz. Con en_disco=True los resultados
+        se guardan en un RegistroResultados temporal y no en memoria.
+        """
+        self.limpiar()
+        resultados = RegistroResultados() if en_disco else None
+        tarea = Tarea(crear_lote, total, descripcion, propietario, archivo, info, resultados, adjuntos)
+        with self._candado:
+            self._tareas[tarea.id] = tarea
+        self._ejecutor.submit(self._ejecutar, tarea)
+        return tarea
+
+    def obtener(self, id_tarea):
+        with self._candado:
+            return self._tareas.get(id_tarea)
+
+    def listar(self, propietario=None):
+        """Tareas del propietario indicado (o todas), de la más nueva a la más vieja"""
+        with self._candado:
+            tareas = list(self._tareas.values())
+        if propietario is not None:
+            tareas = [t for t in tareas if t.propietario == propietario]
+        return sorted(tareas, key=lambda t: t.creada, reverse=True)
+
+    def cancelar(self, id_tarea):
+        tarea = self.obtener(id_tarea)
+        if tarea is not None:
+            tarea.cancelar()
+        return tarea
+
+    def olvidar(self, id_tarea):
+        """Quita la tarea del gestor y borra lo que dejó en disco
+
+        Si todavía no terminó se cancela y se borra al detenerse.
+        """
+        with self._candado:
+            tarea = self._tareas.pop(id_tarea, None)
+        if tarea is None:
+            return None
+        tarea.cancelar()
+        with tarea._candado:
+            tarea._olvidada = True
+            terminada = tarea.terminada
+        if terminada:
+            tarea._descartar()
+        return tarea
+
+    def en_cola(self):
+        """Cantidad de tareas esperando turno"""
+        return sum(1 for t in self.listar() if t.estado == EN_COLA)
+
+    def limpiar(self):
+        """Olvida las tareas terminadas hace más de max_edad segundos y borra lo que dejaron en disco"""
+        limite = time.time() - self.max_edad
+        with self._candado:
+            viejas = [t for t in self._tareas.values() if t.terminada and t.fin < limite]
+            for tarea in viejas:
+                del self._tareas[tarea.id]
+        for tarea in viejas:
+            tarea._descartar()
+
+    def cerrar(self, cancelar=True):
+        """Detiene el gestor y borra lo que dejaron en disco todas sus tareas
+
+        Con cancelar=True también detiene las pendientes; si no, espera a que
+        terminen.
+        """
+        if cancelar:
+            for tarea in self.listar():
+                tarea.cancelar()
+        self._ejecutor.shutdown(wait=True)
+        with self._candado:
+            tareas = list(self._tareas.values())
+            self._tareas.clear()
+        for tarea in tareas:
+            tarea._descartar()
+
+    def _ejecutar(self, tarea):
+        """Corre el lote de una tarea en el hilo del gestor"""
+        if tarea.cancelada:
+            self._finalizar(tarea, CANCELADA)
+            return
+
+        tarea.estado = EN_CURSO
+        tarea.inicio = time.time()
+        lote = None
+        estado = TERMINADA
+        try:
+            lote = tarea.crear_lote(self.workers_por_tarea)
+            for resultado in lote:
+                tarea._agregar(resultado)
+                if tarea.cancelada:
+                    estado = CANCELADA
+                    break
+        except Exception as e:
+            logger.exception("Error en la tarea %s", tarea.id)
+            tarea.error = str(e)
+            estado = FALLIDA
+        finally:
+            # Cerrar el generador libera el pool de procesos y cierra el ZIP
+            # antes de marcar la tarea como terminada; si eso falla, la tarea
+            # queda fallida pero siempre deja de estar en curso
+            try:
+                if lote is not None and hasattr(lote, 'close'):
+                    lote.close()
+                if tarea.en_disco:
+                    tarea.resultados.cerrar()
+            except Exception as e:
+                logger.exception("Error al cerrar la tarea %s", tarea.id)
+                tarea.error = tarea.error or str(e)
+                estado = FALLIDA
+            finally:
+                self._finalizar(tarea, estado)
+
+    def _finalizar(self, tarea, estado):
+        """Marca la tarea como terminada; si ya la olvidaron, borra lo que dejó en disco"""
+        tarea.crear_lote = None
+        tarea.fin = time.time()
+        with tarea._candado:
+            tarea.estado = estado
+            olvidada = tarea._olvidada
+        if olvidada:
+            tarea._descartar()
@@ -0,0 +1,130 @@
+# vista_previa.py
+"""Vista previa de la primera página con cuadrícula de coordenadas
+
+Todo se hace con PyMuPDF sobre la primera página: la cuadrícula se dibuja
+al tamaño real de la página, en el mismo sistema de coordenadas que usa el
+estampado (origen arriba a la izquierda), y el resultado se devuelve en
+memoria como PNG o PDF de una página. Nada se escribe en disco.
+"""
+from .diferido import importar_diferido
+from .nucleo import abrir_documento, estampar_campos
+from .plantilla import plantilla_desde_posiciones
+from .sello import RECURSO_FUENTE, admite_operadores, agregar_operadores
+
+fitz = importar_diferido('fitz')  # PyMuPDF
+
+# Textos de ejemplo que se muestran en las posiciones configuradas
+TEXTOS_EJEMPLO = ["SISTEMA", "SUBSISTEMA", "CÓDIGO"]
+
+
+def operadores_cuadricula(ancho, alto, alto_mediabox, desplazamiento=(0, 0), paso=50, fontsize=6):
+    """Operadores PDF de la cuadrícula y sus etiquetas (x,y)
+
+    Las coordenadas son las de PyMuPDF (origen arriba a la izquierda del
+    cropbox, sin rotación) y se convierten igual que en page.insert_text.
+    Las etiquetas se escriben en un solo bloque BT/ET: no se mide cada
+    texto, así que el costo crece linealmente con la cantidad de etiquetas.
+    """
+    dx, dy = desplazamiento
+    xs = range(paso, int(ancho), paso)
+    ys = range(paso, int(alto), paso)
+
+    def a_pdf(x, y):
+        return x + dx, alto_mediabox - y - dy
+
+    partes = ["q", "0.6 0.6 0.9 RG 0.3 w [2 2] 0 d"]
+    for x in xs:
+        (x0, y0), (x1, y1) = a_pdf(x, 0), a_pdf(x, alto)
+        partes.append(f"{x0:g} {y0:g} m {x1:g} {y1:g} l")
+    for y in ys:
+        (x0, y0), (x1, y1) = a_pdf(0, y), a_pdf(ancho, y)
+        partes.append(f"{x0:g} {y0:g} m {x1:g} {y1:g} l")
+    partes.append("S")
+
+    partes.append(f"0.3 0.3 0.6 rg BT /{RECURSO_FUENTE} {fontsize:g} Tf")
+    for x in xs:
+        for y in ys:
+            izquierda, base = a_pdf(x + 1, y - 1)
+            etiqueta = f"({x},{y})".encode('ascii').hex()
+            partes.append(f"1 0 0 1 {izquierda:g} {base:g} Tm <{etiqueta}> Tj")
+    partes.append("ET Q")
+    return "\n".join(partes).encode('ascii')
+
+
+def dibujar_cuadricula(pagina, paso=50, fontsize=6):
+    """Dibuja líneas y etiquetas (x,y) cada 'paso' puntos sobre toda la página"""
+    doc = pagina.parent
+    if not admite_operadores(doc, pagina):
+        pagina.clean_contents()
+
+    operadores = operadores_cuadricula(
+        pagina.cropbox.width, pagina.cropbox.height, pagina.mediabox_size.y,
+        tuple(pagina.cropbox_position), paso, fontsize
+    )
+    agregar_operadores(doc, pagina, operadores)
+
+
+def dibujar_campos(pagina, campos, textos):
+    """Marca la posición de cada campo y muestra dónde caerá su texto"""
+    forma = pagina.new_shape()
+    for campo in campos:
+        forma.draw_circle((campo['x'], campo['y']), 2.5)
+    forma.finish(color=(1, 0, 0), fill=(1, 0, 0))
+    forma.commit()
+
+    estampar_campos(pagina, campos, textos)
+
+
+def dibujar_posiciones(pagina, posiciones, orientacion):
+    """Marca las posiciones configuradas y muestra dónde caerá cada texto"""
+    campos = plantilla_desde_posiciones(posiciones, orientacion).campos
+    dibujar_campos(pagina, campos, TEXTOS_EJEMPLO)
+
+
+def dibujar_plantilla(pagina, plantilla):
+    """Dibuja los campos de la variante de la plantilla que corresponde a la página
+
+    Cada campo muestra su nombre en mayúsculas como texto de ejemplo.
+    """
+    campos = plantilla.campos_para(pagina.rect.width, pagina.rect.height, pagina.rotation)
+    dibujar_campos(pagina, campos, {campo['campo']: campo['campo'].upper() for campo in campos})
+
+
+def generar_vista_previa(origen, posiciones=None, orientacion="vertical", paso=50,
+                         formato="png", ancho_px=1200, plantilla=None):
+    """Devuelve la primera página con la cuadrícula como bytes PNG o PDF
+
+    origen es cualquier cosa que acepte abrir_documento (ruta, bytes o
+    memoryview). Si se pasan posiciones, se dibujan los textos de ejemplo
+    donde quedarían estampados; si se pasa una plantilla, sus campos. Con
+    formato=('png', 'pdf') se devuelven los dos, dibujando la página una
+    sola vez.
+    """
+    original = abrir_documento(origen)
+    try:
+        if len(original) == 0:
+            raise ValueError("El PDF no tiene páginas")
+        # Solo se trabaja sobre una copia de la primera página
+        doc = fitz.open()
+        doc.insert_pdf(original, from_page=0, to_page=0)
+    finally:
+        original.close()
+
+    try:
+        pagina = doc[0]
+        dibujar_cuadricula(pagina, paso)
+        if plantilla is not None:
+            dibujar_plantilla(pagina, plantilla)
+        elif posiciones:
+            dibujar_posiciones(pagina, posiciones, orientacion)
+
+        salidas = []
+        for uno in ((formato,) if isinstance(formato, str) else formato):
+            if uno == "pdf":
+                salidas.append(doc.tobytes())
+            else:
+                zoom = min(2.0, ancho_px / pagina.rect.width)
+                salidas.append(pagina.get_pixmap(matrix=fitz.Matrix(zoom, zoom), annots=False).tobytes("png"))
+        return salidas[0] if isinstance(formato, str) else tuple(salidas)
+    finally:
+        doc.close()
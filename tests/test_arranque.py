@@ -0,0 +1,102 @@
+# test_arranque.py
+"""Arranque en frío: importaciones diferidas y fuente registrada una vez por proceso"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from pdf_masivo.diferido import ModuloDiferido, importar_diferido
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PESADAS = ('fitz', 'pymupdf', 'pandas', 'numpy')
+
+
+def _cargadas_al_importar(modulo):
+    """Bibliotecas pesadas en sys.modules después de importar modulo en un proceso nuevo"""
+    codigo = f"import sys, {modulo}; print(' '.join(m for m in {PESADAS!r} if m in sys.modules))"
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    return salida.stdout.split()
+
+
+def test_importar_el_paquete_no_carga_bibliotecas_pesadas():
+    assert _cargadas_al_importar('pdf_masivo') == []
+
+
+def test_importar_la_aplicacion_no_carga_bibliotecas_pesadas():
+    pytest.importorskip('streamlit')
+    assert _cargadas_al_importar('app_pdf_masivo_0') == []
+
+
+def test_modulo_diferido_se_importa_al_usarlo(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    colorsys = importar_diferido('colorsys')
+    assert isinstance(colorsys, ModuloDiferido) and not colorsys.cargado
+    assert 'colorsys' not in sys.modules
+    assert 'sin cargar' in repr(colorsys)
+
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert colorsys.cargado and 'colorsys' in sys.modules
+
+
+def test_modulo_ya_importado_se_devuelve_tal_cual():
+    assert importar_diferido('json') is sys.modules['json']
+
+
+def test_modulo_que_no_existe_falla_al_importar():
+    with pytest.raises(ModuleNotFoundError, match='no_existe_en_ningun_lado'):
+        importar_diferido('no_existe_en_ningun_lado')
+
+
+@pytest.fixture
+def app():
+    """Módulo de la aplicación con la caché de la fuente vacía"""
+    pytest.importorskip('streamlit')
+    import app_pdf_masivo_0 as app
+
+    registrar_fuente = app.registrar_fuente
+    registrar_fuente.clear()
+    yield app
+    registrar_fuente.clear()
+
+
+@pytest.fixture
+def leidas(monkeypatch):
+    """Rutas de los TTF que reportlab lee y analiza"""
+    ttfonts = pytest.importorskip('reportlab.pdfbase.ttfonts')
+    leidas = []
+
+    class TTFont(ttfonts.TTFont):
+        def __init__(self, nombre, ruta):
+            leidas.append(ruta)
+            super().__init__(nombre, ruta)
+
+    monkeypatch.setattr(ttfonts, 'TTFont', TTFont)
+    return leidas
+
+
+def test_fuente_se_registra_una_vez(app, leidas, monkeypatch, tmp_path):
+    import reportlab
+
+    vera = os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'Vera.ttf')
+    monkeypatch.setattr(app, 'RUTAS_ARIAL', [str(tmp_path / 'no-existe.ttf'), vera])
+    assert app.registrar_fuente() == 'Arial'
+    assert app.registrar_fuente() == 'Arial'
+    # La ruta que no existe no se intenta leer y el TTF se analiza una sola vez
+    assert leidas == [vera]
+
+
+def test_sin_arial_queda_helvetica(app, leidas, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'RUTAS_ARIAL', [str(tmp_path / 'no-existe.ttf')])
+    assert app.registrar_fuente() == 'Helvetica'
+    assert leidas == []
+
+
+def test_la_sesion_busca_la_fuente_recien_al_pedirla(app, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(app, 'registrar_fuente', lambda: llamadas.append(1) or 'Helvetica')
+    editor = app.PDFEditorStreamlit()
+    assert llamadas == []
+    assert editor.fuente == 'Helvetica' and editor.fuente == 'Helvetica'
+    assert llamadas == [1]
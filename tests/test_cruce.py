@@ -0,0 +1,118 @@
+# test_cruce.py
+"""Cruce previo de nombres con la tabla y armado del diccionario de datos"""
+import io
+
+import pandas as pd
+import pytest
+
+from pdf_masivo import (
+    cargar_tabla,
+    construir_datos,
+    cruzar_nombres,
+    datos_cruzados,
+    filtrar_trabajos,
+    mapear_columnas,
+    normalizar_codigo,
+)
+
+DATOS = {
+    'EQ-007': {'sistema': 'S1', 'subsistema': 'B1'},
+    'eq-008': {'sistema': 'S2', 'subsistema': 'B2'},
+    'EQ-7': {'sistema': 'S3', 'subsistema': 'B3'},
+    'PL 100': {'sistema': 'S4', 'subsistema': 'B4'},
+}
+
+
+@pytest.mark.parametrize('codigo, opciones, esperado', [
+    ('eq-008', {'mayusculas': True}, 'EQ-008'),
+    ('PL 100', {'espacios': True}, 'PL100'),
+    ('EQ-008-R02', {'revision': True}, 'EQ-008'),
+    ('EQ-008_Rev3', {'revision': True}, 'EQ-008'),
+    ('EQ-008 R1', {'revision': True}, 'EQ-008'),
+    ('EQ-008', {'ceros': True}, 'EQ-8'),
+    ('A100-007', {'ceros': True}, 'A100-7'),
+    ('eq 008_rev2', {'mayusculas': True, 'espacios': True, 'revision': True, 'ceros': True}, 'EQ8'),
+    ('EQ-008-R02', {}, 'EQ-008-R02'),
+])
+def test_normalizar_codigo(codigo, opciones, esperado):
+    assert normalizar_codigo(codigo, **opciones) == esperado
+
+
+def test_cruce_exacto_sin_normalizar():
+    cruce = cruzar_nombres(['EQ-007.pdf', 'EQ-008.pdf', 'otro.pdf'], DATOS)
+    assert cruce['total'] == 3
+    assert cruce['coincidencias'] == {'EQ-007.pdf': 'EQ-007'}
+    assert cruce['normalizadas'] == []
+    assert cruce['sin_datos'] == ['EQ-008.pdf', 'otro.pdf']
+    assert cruce['ambiguos'] == {}
+
+
+def test_cruce_normalizado_y_ambiguo():
+    cruce = cruzar_nombres(
+        ['EQ-007.pdf', 'EQ-008-R01.pdf', 'eq-07.pdf', 'PL100.pdf'], DATOS,
+        mayusculas=True, espacios=True, revision=True, ceros=True
+    )
+    # El nombre exacto gana aunque su versión normalizada sea ambigua
+    assert cruce['coincidencias'] == {'EQ-007.pdf': 'EQ-007', 'EQ-008-R01.pdf': 'eq-008', 'PL100.pdf': 'PL 100'}
+    assert cruce['normalizadas'] == ['EQ-008-R01.pdf', 'PL100.pdf']
+    assert cruce['ambiguos'] == {'eq-07.pdf': ['EQ-007', 'EQ-7']}
+    assert cruce['sin_datos'] == []
+
+
+def test_normalizacion_desconocida():
+    with pytest.raises(ValueError, match='acentos'):
+        cruzar_nombres(['EQ-007.pdf'], DATOS, acentos=True)
+
+
+def test_datos_cruzados_estampan_el_codigo_de_la_tabla():
+    cruce = cruzar_nombres(['EQ-007.pdf', 'EQ-008-R01.pdf', 'otro.pdf'], DATOS, mayusculas=True, revision=True)
+    datos = datos_cruzados(cruce, DATOS)
+    assert datos['EQ-008-R01'] == {'sistema': 'S2', 'subsistema': 'B2', 'codigo': 'eq-008'}
+    assert datos['EQ-007'] is DATOS['EQ-007']
+    assert 'otro' not in datos
+
+    trabajos = [('EQ-007.pdf', b'1'), ('otro.pdf', b'2'), ('EQ-008-R01.pdf', b'3')]
+    assert list(filtrar_trabajos(trabajos, cruce)) == [('EQ-007.pdf', b'1'), ('EQ-008-R01.pdf', b'3')]
+
+
+def test_datos_cruzados_sin_normalizadas_es_la_misma_tabla():
+    cruce = cruzar_nombres(['EQ-007.pdf'], DATOS)
+    assert datos_cruzados(cruce, DATOS) is DATOS
+
+
+def test_mapear_columnas():
+    columnas = ['Código', 'Sistema ', 'SUB-SISTEMA', 'Rev.']
+    assert mapear_columnas(columnas) == {'codigo': 0, 'sistema': 1, 'subsistema': 2}
+    # Los campos adicionales se buscan por encabezado y los que no existen quedan en None
+    mapeo = mapear_columnas(columnas, {'revision': 'rev.', 'fecha': 'Fecha'})
+    assert mapeo == {'codigo': 0, 'sistema': 1, 'subsistema': 2, 'revision': 3, 'fecha': None}
+    # Un campo base con encabezado reemplaza la detección automática
+    assert mapear_columnas(['Id', 'Sistema', 'Nombre'], {'codigo': 'Nombre'})['codigo'] == 2
+
+
+def test_construir_datos():
+    df = pd.DataFrame({
+        'codigo': [' EQ-1 ', None, 'nan', '', 'EQ-2', 'EQ-1'],
+        'sistema': ['S1', 'S0', 'S0', 'S0', None, 'S9'],
+        'subsistema': ['B1', 'B0', 'B0', 'B0', 'B2', 'B9'],
+        'rev': ['A', 'X', 'X', 'X', 'B', ' C '],
+    })
+    datos = construir_datos(df, {'codigo': 0, 'sistema': 1, 'subsistema': 2, 'revision': 3})
+    # Se descartan los códigos vacíos o 'nan' y, si un código se repite, gana la última fila
+    assert datos == {
+        'EQ-1': {'sistema': 'S9', 'subsistema': 'B9', 'revision': 'C'},
+        'EQ-2': {'sistema': '', 'subsistema': 'B2', 'revision': 'B'},
+    }
+
+
+def test_construir_datos_columna_faltante():
+    df = pd.DataFrame({'codigo': ['EQ-1'], 'sistema': ['S1']})
+    datos = construir_datos(df, {'codigo': 0, 'sistema': 1, 'subsistema': None})
+    assert datos == {'EQ-1': {'sistema': 'S1', 'subsistema': ''}}
+
+
+def test_cargar_tabla_csv_conserva_los_ceros():
+    fuente = io.BytesIO("Código,Sistema,Subsistema\n007,10,20\n".encode())
+    fuente.name = 'datos.csv'
+    df = cargar_tabla(fuente)
+    assert construir_datos(df, mapear_columnas(df.columns)) == {'007': {'sistema': '10', 'subsistema': '20'}}
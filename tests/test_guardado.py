@@ -0,0 +1,105 @@
+# test_guardado.py
+"""Perfiles de salida, guardado incremental y linealización según la versión de PyMuPDF"""
+from importlib import metadata
+
+import fitz  # PyMuPDF
+import pytest
+
+from pdf_masivo import POSICIONES_POR_DEFECTO, opciones_guardado, perfiles_disponibles, procesar_documento
+from pdf_masivo import nucleo
+
+DATOS = {'P-1': {'sistema': 'SIS-1', 'subsistema': 'SUB-1'}}
+
+
+def _pdf(paginas=3):
+    doc = fitz.open()
+    for numero in range(paginas):
+        doc.new_page(width=595, height=842).insert_text((50, 50), f"original {numero}")
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+@pytest.fixture
+def version_pymupdf(monkeypatch):
+    """Simula la versión instalada de PyMuPDF (None: no se puede leer)"""
+    def simular(version):
+        def leer(paquete):
+            if version is None:
+                raise metadata.PackageNotFoundError(paquete)
+            return version
+        monkeypatch.setattr(nucleo.metadata, 'version', leer)
+        nucleo.admite_linealizar.cache_clear()
+
+    yield simular
+    nucleo.admite_linealizar.cache_clear()
+
+
+@pytest.mark.parametrize('perfil, esperado', [
+    ('rapido', {}),
+    ('compacto', {'garbage': 3, 'deflate': True, 'deflate_images': True, 'deflate_fonts': True, 'use_objstms': 1}),
+    ('web', {'garbage': 3, 'deflate': True, 'deflate_images': True, 'deflate_fonts': True, 'linear': True}),
+])
+def test_opciones_por_perfil(version_pymupdf, perfil, esperado):
+    version_pymupdf('1.24.10')
+    opciones = opciones_guardado(perfil)
+    assert opciones == esperado
+    # Se entrega una copia: cambiarla no toca el perfil
+    opciones['garbage'] = 0
+    assert opciones_guardado(perfil) == esperado
+
+
+@pytest.mark.parametrize('perfil', ['rapido', 'compacto'])
+def test_fitz_acepta_las_opciones(perfil):
+    doc = fitz.open(stream=_pdf())
+    assert fitz.open(stream=doc.tobytes(**opciones_guardado(perfil))).page_count == 3
+
+
+@pytest.mark.parametrize('argumentos, mensaje', [
+    ({'perfil_salida': 'mini'}, 'desconocido'),
+    ({'perfil_salida': 'compacto', 'guardado': 'incremental'}, "no admite el perfil 'compacto'"),
+    ({'guardado': 'incremental', 'portada': True}, 'solo la portada'),
+])
+def test_opciones_que_no_se_pueden_usar(argumentos, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        opciones_guardado(**argumentos)
+
+
+@pytest.mark.parametrize('version, admite', [('1.25.5', True), ('1.26.0', False), ('1.28.2', False)])
+def test_linealizar_segun_la_version(version_pymupdf, version, admite):
+    version_pymupdf(version)
+    assert nucleo.admite_linealizar() is admite
+    assert ('web' in perfiles_disponibles()) is admite
+    if not admite:
+        with pytest.raises(ValueError, match='linealización'):
+            opciones_guardado('web')
+
+
+def test_linealizar_sin_version_prueba_con_un_documento(version_pymupdf, monkeypatch):
+    version_pymupdf(None)
+    guardados = []
+    monkeypatch.setattr(fitz.Document, 'tobytes', lambda doc, **opciones: guardados.append(opciones) or b'')
+    assert nucleo.admite_linealizar() is True
+    assert guardados == [{'linear': True}]
+
+
+@pytest.mark.parametrize('en_memoria', [False, True])
+def test_incremental_conserva_el_original(tmp_path, en_memoria):
+    original = _pdf()
+    resultado = procesar_documento(
+        'P-1.pdf', original, DATOS, POSICIONES_POR_DEFECTO['vertical'], 'vertical',
+        directorio_salida=str(tmp_path), en_memoria=en_memoria, guardado='incremental'
+    )
+    assert resultado['ok'], resultado['error']
+    if en_memoria:
+        salida = resultado['contenido']
+        assert list(tmp_path.iterdir()) == []
+    else:
+        with open(resultado['ruta'], 'rb') as f:
+            salida = f.read()
+
+    # Los bytes originales quedan intactos y los cambios van al final
+    assert len(salida) > len(original) and salida.startswith(original)
+    doc = fitz.open(stream=salida)
+    assert doc.page_count == 3 and 'SIS-1' in doc[0].get_text() and 'original 2' in doc[2].get_text()
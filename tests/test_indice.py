@@ -0,0 +1,135 @@
+# test_indice.py
+"""IndiceCodigos: ida y vuelta a disco, tipo de los ids y caché de índices"""
+import operator
+import os
+import pickle
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from pdf_masivo import IndiceCodigos, limpiar_cache, obtener_indice
+from pdf_masivo import indice as modulo_indice
+from pdf_masivo.nucleo import _contexto_procesos
+
+DATOS = {
+    'P-1': {'sistema': 'SIS-A', 'subsistema': 'SUB-1', 'revision': 'B'},
+    'Ñ-2': {'sistema': 'SIS-A', 'subsistema': 'SUB-2', 'revision': ''},
+    'P-10': {'sistema': 'SIS-B', 'subsistema': 'SUB-1', 'revision': 'B'},
+}
+
+
+def _datos(distintos):
+    """Datos con tantos valores distintos (sistema único por código y un subsistema común)"""
+    return {f"C-{i:06d}": {'sistema': f"S-{i}", 'subsistema': 'comun'} for i in range(distintos - 1)}
+
+
+@pytest.fixture
+def sin_abiertos(monkeypatch):
+    """Caché de índices abiertos vacía y solo para este test"""
+    monkeypatch.setattr(modulo_indice, '_indices_abiertos', OrderedDict())
+
+
+def test_ida_y_vuelta(tmp_path):
+    directorio = str(tmp_path / 'indice')
+    IndiceCodigos.desde_datos(DATOS, {'filas': 3}).guardar(directorio)
+    indice = IndiceCodigos.cargar(directorio)
+
+    assert dict(indice.items()) == DATOS
+    assert indice['Ñ-2'] == DATOS['Ñ-2'] and len(indice) == 3
+    assert 'P-2' not in indice and 'P-100' not in indice and 7 not in indice
+    assert indice.campos == ['sistema', 'subsistema', 'revision']
+    assert indice.info == {'filas': 3}
+
+    # Un índice guardado viaja como su ruta y se vuelve a abrir con mmap
+    copia = pickle.loads(pickle.dumps(indice))
+    assert copia.directorio == directorio and dict(copia.items()) == DATOS
+    assert len(pickle.dumps(indice)) < 200
+
+
+@pytest.mark.parametrize('guardado', [False, True])
+def test_indice_en_proceso_trabajador(tmp_path, guardado):
+    indice = IndiceCodigos.desde_datos(DATOS)
+    if guardado:
+        indice.guardar(str(tmp_path / 'indice'))
+        indice = IndiceCodigos.cargar(str(tmp_path / 'indice'))
+    with ProcessPoolExecutor(max_workers=1, mp_context=_contexto_procesos()) as pool:
+        assert pool.submit(operator.getitem, indice, 'P-10').result() == DATOS['P-10']
+        assert pool.submit(len, indice).result() == 3
+
+
+@pytest.mark.parametrize('distintos, tipo', [(65535, 'uint16'), (65536, 'uint32')])
+def test_tipo_de_los_ids(tmp_path, distintos, tipo):
+    datos = _datos(distintos)
+    indice = IndiceCodigos.desde_datos(datos)
+    assert indice._registros.dtype == tipo
+
+    indice.guardar(str(tmp_path / 'indice'))
+    cargado = IndiceCodigos.cargar(str(tmp_path / 'indice'))
+    assert cargado._registros.dtype == tipo
+    ultimo = f"C-{distintos - 2:06d}"
+    assert cargado[ultimo] == datos[ultimo]
+
+
+def test_indices_abiertos_menos_usados_salen_primero(tmp_path, monkeypatch, sin_abiertos):
+    monkeypatch.setattr(modulo_indice, 'MAX_INDICES_ABIERTOS', 2)
+    leidos = []
+
+    def lector(fuente):
+        leidos.append(fuente)
+        return {fuente.decode(): {'sistema': 'S', 'subsistema': 'B'}}, {}
+
+    def obtener(fuente):
+        return obtener_indice(fuente, lector, directorio_cache=str(tmp_path))
+
+    a, desde_cache = obtener(b'A')
+    assert not desde_cache
+    obtener(b'B')
+    assert obtener(b'A') == (a, True)
+    obtener(b'C')
+    assert leidos == [b'A', b'B', b'C']
+
+    # B salió de los abiertos (A se usó después) pero sigue guardado en disco
+    abiertos = list(modulo_indice._indices_abiertos.values())
+    assert len(abiertos) == 2 and abiertos[0] is a
+    b, desde_cache = obtener(b'B')
+    assert desde_cache and list(b) == ['B'] and leidos == [b'A', b'B', b'C']
+    assert a not in modulo_indice._indices_abiertos.values()
+
+
+def _guardado(directorio_cache, nombre, usado, tamano=0):
+    directorio = os.path.join(directorio_cache, nombre)
+    os.makedirs(directorio)
+    metadatos = os.path.join(directorio, 'metadatos.json')
+    with open(metadatos, 'wb') as f:
+        f.write(b'x' * tamano)
+    os.utime(metadatos, (usado, usado))
+    return directorio
+
+
+def test_limpiar_cache_por_edad(tmp_path, sin_abiertos):
+    ahora = time.time()
+    viejo = _guardado(str(tmp_path), 'viejo', ahora - 100)
+    conservado = _guardado(str(tmp_path), 'conservado', ahora - 200)
+    nuevo = _guardado(str(tmp_path), 'nuevo', ahora)
+    otro = tmp_path / 'no-es-indice'
+    otro.mkdir()
+
+    assert limpiar_cache(str(tmp_path), edad_maxima=50, conservar=[conservado]) == 1
+    assert not os.path.exists(viejo)
+    assert os.path.isdir(conservado) and os.path.isdir(nuevo) and otro.is_dir()
+
+
+def test_limpiar_cache_por_tamano(tmp_path, sin_abiertos):
+    ahora = time.time()
+    directorios = [_guardado(str(tmp_path), f"i{i}", ahora - 10 * (3 - i), tamano=100) for i in range(4)]
+
+    # Se borran los usados hace más tiempo hasta quedar en 200 bytes
+    assert limpiar_cache(str(tmp_path), tamano_maximo=200) == 2
+    assert [os.path.isdir(d) for d in directorios] == [False, False, True, True]
+    assert limpiar_cache(str(tmp_path), tamano_maximo=200) == 0
+
+
+def test_limpiar_cache_sin_directorio(tmp_path):
+    assert limpiar_cache(str(tmp_path / 'no-existe')) == 0
@@ -0,0 +1,45 @@
+# test_lectura.py
+"""Lectura por bloques: mismo diccionario de datos que cargar_tabla + construir_datos"""
+import pandas as pd
+import pytest
+
+from pdf_masivo import cargar_tabla, construir_datos, leer_datos_por_bloques, mapear_columnas
+
+# Códigos con ceros a la izquierda, vacíos y repetidos (en bloques distintos),
+# números guardados como números y una columna que no se usa
+TABLA = pd.DataFrame({
+    'Código': ['007', 'P-1', None, ' P-2 ', 'P-1', 'nan', 'P-3', 'P-4'],
+    'Sistema': ['SIS-A', 'SIS-B', 'SIS-C', 'SIS-D', 'SIS-E', 'SIS-F', 12, None],
+    'Sub-sistema': ['SUB-1', None, 'SUB-3', 'SUB-4', 'SUB-5', 'SUB-6', 'SUB-7', 2.5],
+    'Notas': ['x'] * 8,
+    'Rev.': ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'],
+})
+
+
+def _guardar(tmp_path, formato):
+    ruta = tmp_path / f"datos.{formato}"
+    if formato == 'xlsx':
+        TABLA.to_excel(ruta, index=False)
+    elif formato == 'csv':
+        TABLA.to_csv(ruta, index=False)
+    else:
+        pytest.importorskip('pyarrow')
+        # Parquet guarda un tipo por columna: los números van como texto
+        TABLA.astype({'Sistema': str, 'Sub-sistema': str}).where(TABLA.notna(), None).to_parquet(ruta, index=False)
+    return str(ruta)
+
+
+@pytest.mark.parametrize('campos', [None, {'revision': 'rev'}])
+@pytest.mark.parametrize('tamano_bloque', [2, 50_000])
+@pytest.mark.parametrize('formato', ['xlsx', 'csv', 'parquet'])
+def test_igual_que_cargar_tabla(tmp_path, formato, tamano_bloque, campos):
+    ruta = _guardar(tmp_path, formato)
+    df = cargar_tabla(ruta)
+    esperado = construir_datos(df, mapear_columnas(df.columns, campos))
+
+    datos, info = leer_datos_por_bloques(ruta, tamano_bloque=tamano_bloque, campos=campos)
+    assert datos == esperado
+    assert list(datos) == list(esperado)
+    assert info['filas'] == len(TABLA)
+    assert info['columnas'] == list(TABLA.columns)
+    assert datos['007']['sistema'] == 'SIS-A' and datos['P-1']['sistema'] == 'SIS-E'
@@ -0,0 +1,170 @@
+# test_lote.py
+"""Lotes: ida y vuelta de iterar_lote y qué omite iterar_lote_reanudable"""
+import os
+
+import fitz  # PyMuPDF
+import pytest
+
+from pdf_masivo import POSICIONES_POR_DEFECTO, SelloPreparado, cerrar_procesos, iterar_lote, iterar_lote_reanudable
+from pdf_masivo import manifiesto, nucleo
+
+POSICIONES = POSICIONES_POR_DEFECTO['vertical']
+
+DATOS = {f"P-{i}": {'sistema': f"SIS-{i}", 'subsistema': f"SUB-{i}"} for i in range(4)}
+
+
+def _pdf(texto, paginas=2):
+    doc = fitz.open()
+    for numero in range(paginas):
+        doc.new_page(width=595, height=842).insert_text((50, 50), f"{texto} {numero}")
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def _texto(origen):
+    doc = fitz.open(stream=origen) if isinstance(origen, bytes) else fitz.open(origen)
+    try:
+        return len(doc), doc[0].get_text()
+    finally:
+        doc.close()
+
+
+@pytest.fixture
+def en_procesos(monkeypatch):
+    """Reparte en procesos aunque el lote sea chico (o haya un solo CPU); al final se detienen los trabajadores"""
+    monkeypatch.setattr(nucleo, 'TRABAJOS_MINIMOS_POR_PROCESO', 1)
+    monkeypatch.setattr(nucleo.os, 'cpu_count', lambda: 4)
+    yield
+    cerrar_procesos()
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    """Rutas de P-0.pdf ... P-3.pdf en una carpeta de entrada"""
+    entrada = tmp_path / 'entrada'
+    entrada.mkdir()
+    for i in range(4):
+        (entrada / f"P-{i}.pdf").write_bytes(_pdf(f"original {i}"))
+    return [(f"P-{i}.pdf", str(entrada / f"P-{i}.pdf")) for i in range(4)]
+
+
+def _lote(pdfs, salida, datos=DATOS, posiciones=POSICIONES, **opciones):
+    resultados = list(iterar_lote_reanudable(pdfs, datos, posiciones, 'vertical', str(salida), 1, **opciones))
+    return {r['nombre']: r for r in resultados}
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_iterar_lote_en_memoria(en_procesos, max_workers):
+    trabajos = [(f"P-{i}.pdf", _pdf(f"original {i}")) for i in range(4)] + [('SIN-DATOS.pdf', _pdf('x'))]
+    sello = SelloPreparado(POSICIONES, 'vertical')
+    resultados = list(iterar_lote(trabajos, DATOS, POSICIONES, 'vertical', max_workers, en_memoria=True, sello=sello))
+
+    por_nombre = {r['nombre']: r for r in resultados}
+    assert sorted(por_nombre) == sorted(nombre for nombre, _ in trabajos)
+    assert por_nombre['SIN-DATOS.pdf']['ok'] is False
+    assert por_nombre['SIN-DATOS.pdf']['error'] == "No hay datos para: SIN-DATOS"
+    for i in range(4):
+        resultado = por_nombre[f"P-{i}.pdf"]
+        assert resultado['ok'] and resultado['ruta'] is None
+        paginas, texto = _texto(resultado['contenido'])
+        assert paginas == 2
+        for valor in (f"original {i}", f"SIS-{i}", f"SUB-{i}", f"P-{i}"):
+            assert valor in texto
+        assert resultado['metricas']['paginas'] == 2
+
+
+def test_pool_queda_vivo_entre_lotes(en_procesos):
+    trabajos = [(f"P-{i}.pdf", _pdf(f"original {i}")) for i in range(4)]
+    primero = list(iterar_lote(trabajos, DATOS, POSICIONES, 'vertical', 2, en_memoria=True))
+    pool = nucleo._pools[2]
+
+    # Otro lote con otros datos: mismos trabajadores, configuración nueva
+    datos = {codigo: {'sistema': 'SIS-nuevo', 'subsistema': 'SUB-nuevo'} for codigo in DATOS}
+    segundo = list(iterar_lote(trabajos, datos, POSICIONES, 'vertical', 2, en_memoria=True))
+    assert nucleo._pools[2] is pool
+    for r in primero:
+        assert f"SIS-{r['nombre'][2]}" in _texto(r['contenido'])[1]
+    for r in segundo:
+        texto = _texto(r['contenido'])[1]
+        assert 'SIS-nuevo' in texto and f"SIS-{r['nombre'][2]}" not in texto
+
+    cerrar_procesos()
+    assert nucleo._pools == {}
+
+
+def test_lote_chico_en_el_proceso_actual(monkeypatch):
+    monkeypatch.setattr(nucleo.os, 'cpu_count', lambda: 4)
+    monkeypatch.setattr(nucleo, '_pool_compartido', lambda max_workers: pytest.fail("creó el pool"))
+    trabajos = [(f"P-{i}.pdf", _pdf(f"original {i}")) for i in range(4)]
+    resultados = list(iterar_lote(trabajos, DATOS, POSICIONES, 'vertical', 2, en_memoria=True))
+    assert all(r['ok'] for r in resultados) and len(resultados) == 4
+
+
+def test_iterar_lote_solo_portada(tmp_path):
+    trabajos = [('P-0.pdf', _pdf('original 0', paginas=5))]
+    resultado, = iterar_lote(trabajos, DATOS, POSICIONES, 'vertical', 1, directorio_salida=str(tmp_path), portada=True)
+    assert resultado['ruta'] == str(tmp_path / 'P-0.pdf')
+    paginas, texto = _texto(resultado['ruta'])
+    assert paginas == 1 and 'SIS-0' in texto
+
+
+def test_iterar_lote_sin_trabajos():
+    assert list(iterar_lote([], DATOS, POSICIONES, 'vertical', 4)) == []
+
+
+def test_reanudable_omite_lo_terminado(pdfs, tmp_path, monkeypatch):
+    salida = tmp_path / 'salida'
+    primera = _lote(pdfs + [('SIN-DATOS.pdf', pdfs[0][1])], salida)
+    assert not any(r['omitido'] for r in primera.values())
+    assert primera['SIN-DATOS.pdf']['ok'] is False
+    assert os.path.isfile(salida / manifiesto.NOMBRE_MANIFIESTO)
+
+    # Sin cambios no se vuelve a leer ningún PDF ni se crea el lote
+    monkeypatch.setattr(manifiesto, 'huella_archivo', lambda origen: pytest.fail("releyó un PDF sin cambios"))
+    monkeypatch.setattr(manifiesto, 'iterar_lote', lambda *a, **k: pytest.fail("creó el lote sin trabajos"))
+    segunda = _lote(pdfs, salida)
+    assert all(r['omitido'] and r['ok'] for r in segunda.values())
+    assert segunda['P-1.pdf']['ruta'] == str(salida / 'P-1.pdf')
+
+
+def test_reanudable_reprocesa_lo_que_cambio(pdfs, tmp_path):
+    salida = tmp_path / 'salida'
+    _lote(pdfs + [('SIN-DATOS.pdf', pdfs[0][1])], salida)
+
+    with open(pdfs[0][1], 'wb') as f:
+        f.write(_pdf('otro contenido'))
+    os.remove(salida / 'P-1.pdf')
+    datos = dict(DATOS, **{'P-2': {'sistema': 'SIS-nuevo', 'subsistema': 'SUB-2'}})
+    datos['SIN-DATOS'] = {'sistema': 'S', 'subsistema': 'B'}
+
+    resultados = _lote(pdfs + [('SIN-DATOS.pdf', pdfs[3][1])], salida, datos)
+    reprocesados = {nombre for nombre, r in resultados.items() if not r['omitido']}
+    # Contenido nuevo, salida borrada, datos nuevos y un PDF que había fallado
+    assert reprocesados == {'P-0.pdf', 'P-1.pdf', 'P-2.pdf', 'SIN-DATOS.pdf'}
+    assert 'SIS-nuevo' in _texto(resultados['P-2.pdf']['ruta'])[1]
+
+
+@pytest.mark.parametrize('cambio', [
+    {'posiciones': [{'x': p['x'] + 1, 'y': p['y']} for p in POSICIONES]},
+    {'perfil_salida': 'compacto'},
+    {'portada': True},
+    {'forzar': True},
+])
+def test_reanudable_ajustes_distintos_reprocesan_todo(pdfs, tmp_path, cambio):
+    salida = tmp_path / 'salida'
+    _lote(pdfs, salida)
+    resultados = _lote(pdfs, salida, **cambio)
+    assert not any(r['omitido'] for r in resultados.values())
+    # La nueva pasada queda anotada: la siguiente con los mismos ajustes omite todo
+    cambio.pop('forzar', None)
+    assert all(r['omitido'] for r in _lote(pdfs, salida, **cambio).values())
+
+
+def test_reanudable_omitidos_salen_antes_del_primer_pendiente(pdfs, tmp_path):
+    salida = tmp_path / 'salida'
+    _lote(pdfs[:2], salida)
+    lote = iterar_lote_reanudable(pdfs, DATOS, POSICIONES, 'vertical', str(salida), 1)
+    assert [next(lote)['omitido'], next(lote)['omitido']] == [True, True]
+    assert {r['nombre'] for r in lote} == {'P-2.pdf', 'P-3.pdf'}
@@ -0,0 +1,105 @@
+# test_metricas.py
+"""Métricas por etapa: cronómetro, resumen del lote, exportación y perfilado"""
+import csv
+import io
+import json
+import pstats
+import time
+
+import pytest
+
+from pdf_masivo import RegistroResultados, escribir_metricas, exportar_metricas, perfilar, resumir_metricas
+from pdf_masivo.metricas import Cronometro
+
+
+def _resultado(i, **metricas):
+    return {
+        'nombre': f"P-{i}.pdf", 'ruta': None, 'ok': True, 'error': None,
+        'metricas': dict({'abrir': 0.01, 'estampar': 0.1 * i, 'guardar': 0.02, 'paginas': 2,
+                          'pagina': 'A4 vertical', 'bytes_entrada': 1000, 'bytes_salida': 1200,
+                          'rss_pico': 100 + i}, **metricas),
+    }
+
+
+def _resultados():
+    resultados = [_resultado(i) for i in range(1, 6)]
+    resultados[4]['metricas']['pagina'] = 'A1 horizontal'
+    resultados.append({'nombre': 'MAL.pdf', 'ruta': None, 'ok': False, 'error': 'falla'})
+    resultados.append(dict(_resultado(9), omitido=True, metricas={}))
+    return resultados
+
+
+def test_cronometro_suma_etapas_repetidas():
+    cronometro = Cronometro()
+    with cronometro.etapa('guardar'):
+        time.sleep(0.01)
+    # Una etapa que falla también cuenta
+    with pytest.raises(RuntimeError):
+        with cronometro.etapa('guardar'):
+            time.sleep(0.01)
+            raise RuntimeError
+    with cronometro.etapa('abrir'):
+        pass
+
+    metricas = cronometro.metricas(paginas=3)
+    assert metricas['guardar'] >= 0.02 and metricas['abrir'] < metricas['guardar']
+    assert list(metricas) == ['guardar', 'abrir', 'paginas'] and metricas['paginas'] == 3
+
+
+def test_resumen_del_lote():
+    resumen = resumir_metricas(iter(_resultados()), segundos=2.0, etapas_lote={'datos': 0.5}, lentos=2)
+    assert (resumen['archivos'], resumen['completados'], resumen['errores'], resumen['omitidos']) == (7, 6, 1, 1)
+    assert resumen['archivos_por_segundo'] == 3.5
+    assert resumen['paginas'] == 10 and resumen['bytes_salida'] == 6000 and resumen['rss_pico'] == 105
+    assert resumen['etapas_lote'] == {'datos': 0.5}
+    assert resumen['tamanos_pagina'] == {'A4 vertical': 4, 'A1 horizontal': 1}
+
+    estampar = resumen['etapas']['estampar']
+    assert estampar['n'] == 5 and estampar['p50'] == pytest.approx(0.3) and estampar['max'] == pytest.approx(0.5)
+    assert resumen['etapas']['total']['max'] == pytest.approx(0.53)
+    assert 'zip' not in resumen['etapas']
+    assert [fila['nombre'] for fila in resumen['mas_lentos']] == ['P-5.pdf', 'P-4.pdf']
+
+
+def test_resumen_sin_resultados():
+    resumen = resumir_metricas([])
+    assert resumen['archivos'] == 0 and resumen['etapas'] == {} and resumen['mas_lentos'] == []
+    assert resumen['archivos_por_segundo'] is None
+
+
+def test_exportar_json_y_csv():
+    datos = json.loads(exportar_metricas(_resultados(), segundos=2.0))
+    assert datos['resumen']['archivos'] == 7
+    assert [fila['nombre'] for fila in datos['archivos']][-2:] == ['MAL.pdf', 'P-9.pdf']
+    assert datos['archivos'][0]['total'] == pytest.approx(0.13)
+
+    filas = list(csv.DictReader(io.StringIO(exportar_metricas(_resultados(), formato='csv'))))
+    assert len(filas) == 7
+    assert filas[0]['estampar'] == '0.1' and filas[0]['zip'] == ''
+    assert filas[5]['error'] == 'falla' and filas[5]['total'] == ''
+
+
+@pytest.mark.parametrize('extension', ['json', 'csv'])
+def test_escribir_metricas_desde_el_registro(tmp_path, extension):
+    registro = RegistroResultados(str(tmp_path / 'resultados.jsonl'), pagina=2)
+    for resultado in _resultados():
+        registro.append(resultado)
+    ruta = tmp_path / f"metricas.{extension}"
+    escribir_metricas(registro, str(ruta), segundos=2.0)
+    assert ruta.read_bytes().decode('utf-8') == exportar_metricas(_resultados(), extension, segundos=2.0)
+
+
+def test_perfilar(tmp_path):
+    ruta = str(tmp_path / 'lote.prof')
+    with perfilar(ruta, memoria=True, lineas=3) as informe:
+        bloques = [bytearray(100_000) for _ in range(5)]
+    assert len(bloques) == 5
+    assert informe['perfil'] == ruta and pstats.Stats(ruta).total_calls > 0
+    assert informe['memoria_pico'] >= 500_000
+    assert 0 < len(informe['asignaciones']) <= 3
+
+
+def test_perfilar_sin_nada():
+    with perfilar() as informe:
+        pass
+    assert informe == {}
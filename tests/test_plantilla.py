@@ -0,0 +1,133 @@
+# test_plantilla.py
+"""Plantillas de sello: validación, anclas, rotación de la página y variantes"""
+import fitz  # PyMuPDF
+import pytest
+
+from pdf_masivo import Plantilla, SelloPreparado
+from pdf_masivo.plantilla import (
+    ANCLAS,
+    ROTACIONES,
+    a_pagina_visible,
+    desde_pagina_visible,
+    nombre_papel,
+    posicion_anclada,
+)
+
+VARIANTES = [
+    {'cuando': {'pagina': 'horizontal', 'ancho': [2000, None]}, 'campos': [{'campo': 'codigo', 'x': 1, 'y': 1}]},
+    {'cuando': {'papel': ['A1', 'A0']}, 'campos': [{'campo': 'codigo', 'x': 2, 'y': 2}]},
+    {'cuando': {'pagina': 'horizontal'}, 'campos': [{'campo': 'codigo', 'x': 3, 'y': 3}]},
+]
+
+
+def _variante(plantilla, ancho, alto):
+    return plantilla.variante_para(ancho, alto)[0]['x']
+
+
+@pytest.mark.parametrize('campo, mensaje', [
+    ({'campo': 'codigo', 'x': 1}, "falta la coordenada 'y'"),
+    ({'campo': 'codigo', 'x': 1, 'y': 1, 'rotacion': 45}, 'rotación'),
+    ({'campo': 'codigo', 'x': 1, 'y': 1, 'fuente': 'arial'}, 'no disponible'),
+    ({'campo': 'codigo', 'x': 1, 'y': 1, 'ancla': 'centro'}, 'desconocida'),
+    ({'campo': 'codigo', 'x': 20, 'y': 0.5, 'ancla': 'relativa'}, 'entre 0 y 1'),
+    ({'campo': 'codigo', 'x': 1, 'y': 1, 'margen': 3}, 'opciones desconocidas'),
+])
+def test_campo_invalido(campo, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        Plantilla([campo])
+
+
+def test_condicion_invalida():
+    with pytest.raises(ValueError, match="'papel'"):
+        Plantilla([{'campo': 'codigo', 'x': 1, 'y': 1}], [{'cuando': {'papel': 'B5'}, 'campos': VARIANTES[0]['campos']}])
+
+
+@pytest.mark.parametrize('ancla, esperado', [
+    ('superior-izquierda', (30, 40)),
+    ('superior-derecha', (570, 40)),
+    ('inferior-izquierda', (30, 760)),
+    ('inferior-derecha', (570, 760)),
+])
+def test_posicion_anclada(ancla, esperado):
+    assert posicion_anclada({'x': 30, 'y': 40, 'ancla': ancla}, 600, 800) == esperado
+
+
+def test_posicion_relativa():
+    assert posicion_anclada({'x': 0.25, 'y': 0.5, 'ancla': 'relativa'}, 600, 800) == (150, 400)
+
+
+@pytest.mark.parametrize('rotacion', ROTACIONES)
+def test_pagina_visible_ida_y_vuelta(rotacion):
+    x, y = a_pagina_visible(100, 30, 595, 842, rotacion)
+    assert desde_pagina_visible(x, y, 595, 842, rotacion) == (100, 30)
+
+
+@pytest.mark.parametrize('rotacion', ROTACIONES)
+@pytest.mark.parametrize('ancla', ANCLAS)
+def test_anclar_y_resolver_devuelve_la_posicion_medida(ancla, rotacion):
+    # Posiciones absolutas medidas en un PDF de ejemplo con /Rotate
+    plantilla = Plantilla([{'campo': 'codigo', 'x': 100, 'y': 30, 'rotacion': 90}])
+    anclada = plantilla.anclada(ancla, 842, 595, rotacion)
+    assert anclada.campos[0]['ancla'] == ancla
+    campo = anclada.campos_para(842, 595, rotacion)[0]
+    assert (campo['x'], campo['y']) == pytest.approx((100, 30))
+    assert campo['rotacion'] == 90
+    assert 'ancla' not in campo
+
+
+def test_sin_anclas_los_campos_no_se_copian():
+    plantilla = Plantilla([{'campo': 'codigo', 'x': 100, 'y': 30}])
+    assert plantilla.campos_para(595, 842, 90) is plantilla.campos
+
+
+@pytest.mark.parametrize('rotacion', ROTACIONES)
+def test_sello_anclado_en_pagina_rotada(rotacion):
+    doc = fitz.open()
+    pagina = doc.new_page(width=842, height=595)
+    pagina.set_rotation(rotacion)
+    plantilla = Plantilla([{'campo': 'codigo', 'ancla': 'inferior-derecha', 'x': 100, 'y': 50}])
+    SelloPreparado(plantilla=plantilla).aplicar(doc, {'codigo': 'EQ-1', 'sistema': '', 'subsistema': ''})
+
+    pagina = fitz.open(stream=doc.tobytes())[0]
+    linea = pagina.get_text('dict')['blocks'][0]['lines'][0]
+    assert linea['spans'][0]['text'] == 'EQ-1'
+    # Se mide sobre la página tal como se ve y el texto se lee derecho
+    origen = fitz.Point(linea['spans'][0]['origin']) * pagina.rotation_matrix
+    ancho, alto = pagina.rect.width, pagina.rect.height
+    assert (origen.x, origen.y) == pytest.approx((ancho - 100, alto - 50))
+    direccion = fitz.Point(linea['dir']) * pagina.rotation_matrix - fitz.Point(0, 0) * pagina.rotation_matrix
+    assert (direccion.x, direccion.y) == pytest.approx((1, 0))
+
+
+def test_nombre_papel_en_cualquier_orientacion():
+    assert nombre_papel(595, 842) == 'A4'
+    assert nombre_papel(842, 595) == 'A4'
+    assert nombre_papel(1684, 2384) == 'A1'
+    assert nombre_papel(500, 700) is None
+
+
+def test_variantes_gana_la_primera_que_coincide():
+    plantilla = Plantilla([{'campo': 'codigo', 'x': 0, 'y': 0}], VARIANTES)
+    assert _variante(plantilla, 2384, 1684) == 1    # A1 horizontal: también cumple la de papel
+    assert _variante(plantilla, 1684, 2384) == 2    # A1 vertical
+    assert _variante(plantilla, 1684, 1191) == 3    # A2 horizontal, de menos de 2000 de ancho
+    assert _variante(plantilla, 595, 842) == 0      # ninguna: campos principales
+
+
+def test_columnas_de_la_plantilla():
+    plantilla = Plantilla(
+        [
+            {'campo': 'codigo', 'x': 0, 'y': 0},
+            {'campo': 'sistema', 'columna': 'Sist.', 'x': 0, 'y': 0},
+            {'campo': 'revision', 'columna': 'Rev.', 'x': 0, 'y': 0},
+        ],
+        [{'cuando': {'pagina': 'horizontal'}, 'campos': [{'campo': 'fecha', 'x': 0, 'y': 0}]}]
+    )
+    assert plantilla.columnas() == {'sistema': 'Sist.', 'revision': 'Rev.', 'fecha': 'fecha'}
+
+
+def test_huella_cambia_con_la_plantilla():
+    una = Plantilla([{'campo': 'codigo', 'x': 0, 'y': 0}])
+    otra = Plantilla([{'campo': 'codigo', 'x': 0, 'y': 1}])
+    assert una.huella() == Plantilla.desde_dict(una.como_dict()).huella()
+    assert una.huella() != otra.huella()
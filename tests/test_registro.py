@@ -0,0 +1,75 @@
+# test_registro.py
+"""RegistroResultados: resultados en disco con índices y rebanadas"""
+import io
+import json
+
+import pytest
+
+from pdf_masivo import RegistroResultados
+from pdf_masivo.registro import escribir_json_con_lista
+
+
+def _resultado(i):
+    return {'nombre': f"P-{i:03d}.pdf", 'ruta': None, 'ok': i % 5 != 0, 'error': None if i % 5 else 'falla'}
+
+
+@pytest.fixture
+def registro(tmp_path):
+    registro = RegistroResultados(str(tmp_path / 'resultados.jsonl'), pagina=4)
+    for i in range(11):
+        registro.append(dict(_resultado(i), contenido=b'%PDF', omitido=i == 3))
+    yield registro
+    registro.borrar()
+
+
+def test_contadores(registro):
+    assert len(registro) == 11
+    assert registro.completados == 8
+    assert registro.errores == 3
+    assert registro.omitidos == 1
+
+
+def test_indices(registro):
+    assert registro[0]['nombre'] == 'P-000.pdf'
+    assert registro[5]['nombre'] == 'P-005.pdf'
+    assert registro[-1]['nombre'] == 'P-010.pdf'
+    assert 'contenido' not in registro[3] and registro[3]['omitido']
+    with pytest.raises(IndexError):
+        registro[11]
+    with pytest.raises(IndexError):
+        registro[-12]
+
+
+@pytest.mark.parametrize('inicio, fin', [(0, 4), (3, 9), (4, 8), (7, 11), (9, 20), (10, 11), (6, 6)])
+def test_rebanadas_entre_paginas(registro, inicio, fin):
+    assert [r['nombre'] for r in registro[inicio:fin]] == [f"P-{i:03d}.pdf" for i in range(inicio, min(fin, 11))]
+
+
+def test_rebanada_con_paso(registro):
+    with pytest.raises(ValueError):
+        registro[::2]
+
+
+def test_recorrer_y_leer_mientras_se_escribe(registro):
+    assert [r['nombre'] for r in registro] == [f"P-{i:03d}.pdf" for i in range(11)]
+    registro.append(_resultado(11))
+    assert registro[-1]['nombre'] == 'P-011.pdf'
+    with open(registro.ruta, encoding='utf-8') as f:
+        assert [json.loads(linea)['nombre'] for linea in f][-1] == 'P-011.pdf'
+
+
+def test_borrar_sin_ruta():
+    registro = RegistroResultados()
+    registro.append(_resultado(1))
+    registro.cerrar()
+    assert registro[0]['nombre'] == 'P-001.pdf'
+    registro.borrar()
+    registro.borrar()
+
+
+@pytest.mark.parametrize('elementos', [[], [{'nombre': 'Ñandú.pdf', 'metricas': {'total': 0.5}}, [1, [2]]]])
+def test_escribir_json_con_lista(elementos):
+    f = io.StringIO()
+    encabezado = {'resumen': {'archivos': 2, 'etapas': {}}, 'version': 'ñ'}
+    escribir_json_con_lista(f, encabezado, 'resultados', iter(elementos))
+    assert f.getvalue() == json.dumps({**encabezado, 'resultados': elementos}, indent=2, ensure_ascii=False)
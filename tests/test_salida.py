@@ -0,0 +1,124 @@
+# test_salida.py
+"""ZIP de salida y PDF de portadas unidas armados a medida que terminan los PDFs"""
+import io
+import zipfile
+
+import fitz  # PyMuPDF
+import pytest
+
+from pdf_masivo import escribir_en_zip, escribir_portadas
+from pdf_masivo.salida import PORTADAS_POR_PARTE, RENGLONES_INDICE
+
+# Más de una parte en disco y más de una hoja de índice
+CANTIDAD = PORTADAS_POR_PARTE + 5
+
+
+def _pdf(i, paginas=2):
+    doc = fitz.open()
+    for numero in range(paginas):
+        doc.new_page(width=300 + i % 7, height=400).insert_text((20, 40), f"doc {i} p {numero}")
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def _resultados(tmp_path):
+    """Resultados en memoria, uno con error y uno desde una ruta (como en un lote reanudable)"""
+    ruta = tmp_path / 'D0001.pdf'
+    ruta.write_bytes(_pdf(1))
+    for i in range(CANTIDAD):
+        if i == 3:
+            yield {'nombre': 'D0003.pdf', 'ruta': None, 'ok': False, 'error': 'falla', 'metricas': {}}
+        elif i == 1:
+            yield {'nombre': 'D0001.pdf', 'ruta': str(ruta), 'ok': True, 'error': None, 'metricas': {}}
+        else:
+            yield {'nombre': f"D{i:04d}.pdf", 'ruta': None, 'ok': True, 'error': None,
+                   'contenido': _pdf(i), 'metricas': {}}
+
+
+@pytest.mark.parametrize('comprimir, nivel, compresion', [
+    (False, None, zipfile.ZIP_STORED),
+    (True, None, zipfile.ZIP_DEFLATED),
+    (True, 1, zipfile.ZIP_DEFLATED),
+    (True, 9, zipfile.ZIP_DEFLATED),
+])
+def test_zip_ida_y_vuelta(tmp_path, comprimir, nivel, compresion):
+    pdfs = [_pdf(i) for i in range(4)]
+    ruta = tmp_path / 'D0001.pdf'
+    ruta.write_bytes(pdfs[1])
+    resultados = [
+        {'nombre': 'D0000.pdf', 'ruta': None, 'ok': True, 'error': None, 'contenido': pdfs[0], 'metricas': {}},
+        {'nombre': 'D0001.pdf', 'ruta': str(ruta), 'ok': True, 'error': None},
+        {'nombre': 'D0002.pdf', 'ruta': None, 'ok': False, 'error': 'falla', 'metricas': {}},
+        {'nombre': 'sub/D0003.pdf', 'ruta': None, 'ok': True, 'error': None, 'contenido': pdfs[3]},
+    ]
+    esperado = {'editados/D0000.pdf': pdfs[0], 'editados/D0001.pdf': pdfs[1], 'editados/sub/D0003.pdf': pdfs[3]}
+
+    destino = io.BytesIO()
+    escritos = list(escribir_en_zip(iter(resultados), destino, comprimir=comprimir, nivel=nivel))
+    assert [r['en_zip'] for r in escritos] == ['editados/D0000.pdf', 'editados/D0001.pdf', None,
+                                                'editados/sub/D0003.pdf']
+    # El contenido se libera al escribirlo y el tiempo queda en las métricas
+    assert not any('contenido' in r for r in escritos)
+    assert 'zip' in escritos[0]['metricas'] and 'zip' not in escritos[2]['metricas']
+
+    with zipfile.ZipFile(destino) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.namelist() == list(esperado)
+        for info in zipf.infolist():
+            assert info.compress_type == compresion
+            assert zipf.read(info) == esperado[info.filename]
+
+
+def test_zip_nivel_invalido(tmp_path):
+    with pytest.raises(ValueError, match='de 1 a 9'):
+        next(escribir_en_zip(iter([]), str(tmp_path / 'salida.zip'), comprimir=True, nivel=0))
+
+
+@pytest.mark.parametrize('indice', [False, True])
+def test_portadas_en_varias_partes(tmp_path, indice):
+    destino = tmp_path / 'portadas.pdf'
+    resultados = list(escribir_portadas(_resultados(tmp_path), str(destino), indice))
+
+    nombres = [r['nombre'] for r in resultados if r['ok']]
+    assert [r['en_portadas'] for r in resultados if r['ok']] == list(range(1, CANTIDAD))
+    assert next(r for r in resultados if not r['ok'])['en_portadas'] is None
+    # El contenido se deja para escribir_en_zip
+    assert 'contenido' in resultados[0]
+    assert all('portadas' in r['metricas'] for r in resultados if r['ok'])
+
+    doc = fitz.open(str(destino))
+    hojas = -(-len(nombres) // RENGLONES_INDICE) if indice else 0
+    assert len(doc) == hojas + len(nombres)
+
+    toc = doc.get_toc()
+    if indice:
+        assert toc[0] == [1, 'Índice', 1]
+        toc = toc[1:]
+    assert toc == [[1, nombre, hojas + i + 1] for i, nombre in enumerate(nombres)]
+    for i, nombre in enumerate(nombres):
+        numero = int(nombre[1:5])
+        assert f"doc {numero} p 0" in doc[hojas + i].get_text()
+
+    if indice:
+        enlaces = [enlace['page'] for hoja in range(hojas) for enlace in doc[hoja].get_links()]
+        assert enlaces == list(range(hojas, hojas + len(nombres)))
+        assert 'D0002.pdf' in doc[0].get_text()
+        assert nombres[-1] in doc[hojas - 1].get_text()
+
+
+def test_portadas_sin_resultados(tmp_path):
+    destino = tmp_path / 'portadas.pdf'
+    assert list(escribir_portadas(iter([]), str(destino), indice=True)) == []
+    # Un PDF sin páginas no se puede guardar: queda una hoja en blanco
+    assert len(fitz.open(str(destino))) == 1
+
+
+def test_portadas_canceladas_no_se_guardan(tmp_path):
+    destino = tmp_path / 'portadas.pdf'
+    lote = escribir_portadas(_resultados(tmp_path), str(destino))
+    for _ in range(PORTADAS_POR_PARTE + 2):
+        next(lote)
+    lote.close()
+    assert not destino.exists()
@@ -0,0 +1,66 @@
+# test_sello.py
+"""SelloPreparado: los operadores preparados se ven igual que insert_text"""
+import fitz  # PyMuPDF
+import pytest
+
+from pdf_masivo import POSICIONES_POR_DEFECTO, Plantilla, SelloPreparado
+from pdf_masivo.plantilla import ROTACIONES
+
+VALORES = {'codigo': 'EQ-0001', 'sistema': 'SIS-12', 'subsistema': 'SUB-345', 'revision': 'B'}
+
+PLANTILLA = Plantilla([
+    {'campo': 'codigo', 'x': 60, 'y': 40, 'ancla': 'inferior-derecha', 'fuente': 'hebo', 'tamano': 12},
+    {'campo': 'sistema', 'x': 0.1, 'y': 0.2, 'ancla': 'relativa', 'rotacion': 90, 'color': [1, 0, 0]},
+    {'campo': 'revision', 'x': 40, 'y': 60, 'formato': 'Rev. {}', 'fuente': 'tiro', 'rotacion': 270},
+])
+
+
+def _pdf(rotacion, recorte):
+    doc = fitz.open()
+    pagina = doc.new_page(width=595, height=842)
+    pagina.insert_text((50, 100), "contenido original", fontsize=14)
+    # Estado gráfico sin cerrar: el sello no debe heredarlo
+    doc.update_stream(pagina.get_contents()[0], doc.xref_stream(pagina.get_contents()[0]) + b"\n1 0 0 rg 2 0 0 2 0 0 cm\n")
+    if recorte:
+        pagina.set_cropbox(fitz.Rect(30, 40, 500, 800))
+    pagina.set_rotation(rotacion)
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def _imagen(contenido, sello):
+    doc = fitz.open(stream=contenido)
+    sello.aplicar(doc, VALORES)
+    # Se renderiza lo guardado, como lo vería quien abre el PDF
+    doc = fitz.open(stream=doc.tobytes())
+    return doc[0].get_pixmap(dpi=72)
+
+
+@pytest.mark.parametrize('recorte', [False, True])
+@pytest.mark.parametrize('rotacion', ROTACIONES)
+@pytest.mark.parametrize('argumentos', [
+    {'posiciones': POSICIONES_POR_DEFECTO['vertical'], 'orientacion': 'vertical'},
+    {'plantilla': PLANTILLA},
+], ids=['posiciones', 'plantilla'])
+def test_igual_que_insert_text(argumentos, rotacion, recorte):
+    contenido = _pdf(rotacion, recorte)
+    preparado = _imagen(contenido, SelloPreparado(**argumentos))
+    clasico = _imagen(contenido, SelloPreparado(**argumentos, clasico=True))
+    assert (preparado.width, preparado.height) == (clasico.width, clasico.height)
+    assert preparado.samples == clasico.samples
+    # El sello se ve: la página no quedó igual que sin estampar
+    doc = fitz.open(stream=contenido)
+    assert doc[0].get_pixmap(dpi=72).samples != preparado.samples
+
+
+def test_preparado_no_usa_insert_text(monkeypatch):
+    sello = SelloPreparado(plantilla=PLANTILLA)
+    # El primer documento arma los prefijos (con insert_text, en un PDF aparte)
+    sello.aplicar(fitz.open(stream=_pdf(0, False)), VALORES)
+    doc = fitz.open(stream=_pdf(0, False))
+
+    monkeypatch.setattr(fitz.Page, 'insert_text', lambda *a, **k: pytest.fail("usó insert_text"))
+    sello.aplicar(doc, dict(VALORES, codigo='EQ-0002'))
+    assert 'EQ-0002' in fitz.open(stream=doc.tobytes())[0].get_text()
@@ -0,0 +1,97 @@
+# test_tareas.py
+"""Tareas en segundo plano: estados finales y limpieza de lo que dejan en disco"""
+import os
+import threading
+import time
+
+import pytest
+
+from pdf_masivo import GestorTareas
+from pdf_masivo.tareas import CANCELADA, FALLIDA, TERMINADA
+
+
+def _resultado(i):
+    return {'nombre': f"P-{i}.pdf", 'ruta': None, 'ok': True, 'error': None}
+
+
+def _esperar(tarea, segundos=10):
+    limite = time.monotonic() + segundos
+    while not tarea.terminada:
+        assert time.monotonic() < limite, f"la tarea sigue {tarea.estado}"
+        time.sleep(0.01)
+    return tarea
+
+
+@pytest.fixture
+def gestor():
+    gestor = GestorTareas(max_tareas=1, workers_por_tarea=1)
+    yield gestor
+    gestor.cerrar()
+
+
+@pytest.mark.parametrize('en_disco', [False, True])
+def test_tarea_terminada(gestor, en_disco):
+    tarea = _esperar(gestor.enviar(lambda max_workers: map(_resultado, range(5)), 5, en_disco=en_disco))
+    assert tarea.estado == TERMINADA
+    assert tarea.progreso == 1.0 and tarea.completados == 5
+    assert [r['nombre'] for r in tarea.pagina_resultados(3, 10)] == ['P-3.pdf', 'P-4.pdf']
+    assert tarea.crear_lote is None
+
+
+def test_error_del_lote(gestor):
+    def lote(max_workers):
+        yield _resultado(0)
+        raise RuntimeError("se cortó")
+
+    tarea = _esperar(gestor.enviar(lote, 3))
+    assert tarea.estado == FALLIDA and tarea.error == "se cortó"
+    assert tarea.procesados == 1
+
+
+def test_error_al_cerrar_el_lote_no_deja_la_tarea_en_curso(gestor):
+    seguir = threading.Event()
+
+    def lote(max_workers):
+        try:
+            yield _resultado(0)
+            seguir.wait()
+            for i in range(1, 100):
+                yield _resultado(i)
+        finally:
+            raise OSError("no se pudo cerrar el ZIP")
+
+    # Se cancela con el lote empezado: se corta con close(), que falla
+    tarea = gestor.enviar(lote, 100)
+    while tarea.procesados == 0:
+        time.sleep(0.01)
+    tarea.cancelar()
+    seguir.set()
+    _esperar(tarea)
+    assert tarea.estado == FALLIDA
+    assert tarea.error == "no se pudo cerrar el ZIP"
+
+
+def test_cancelar_en_curso(gestor):
+    seguir = threading.Event()
+
+    def lote(max_workers):
+        for i in range(100):
+            seguir.wait()
+            yield _resultado(i)
+
+    tarea = gestor.enviar(lote, 100)
+    tarea.cancelar()
+    seguir.set()
+    assert _esperar(tarea).estado == CANCELADA
+    assert tarea.procesados <= 1
+
+
+def test_olvidar_borra_salida_y_registro(gestor, tmp_path):
+    archivo = tmp_path / 'salida.zip'
+    archivo.write_bytes(b'zip')
+    tarea = _esperar(gestor.enviar(lambda max_workers: map(_resultado, range(2)), 2, archivo=str(archivo),
+                                   en_disco=True))
+    registro = tarea.resultados.ruta
+    assert gestor.olvidar(tarea.id) is tarea
+    assert gestor.obtener(tarea.id) is None
+    assert not archivo.exists() and not os.path.exists(registro)
@@ -0,0 +1,27 @@
+# test_vista_previa.py
+"""Vista previa de la primera página con cuadrícula"""
+import fitz  # PyMuPDF
+
+from pdf_masivo import POSICIONES_POR_DEFECTO, generar_vista_previa
+
+
+def _pdf():
+    doc = fitz.open()
+    doc.new_page(width=842, height=595)
+    doc.new_page()
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def test_png_y_pdf_de_una_sola_vez():
+    posiciones = POSICIONES_POR_DEFECTO['vertical']
+    png, pdf = generar_vista_previa(_pdf(), posiciones, formato=('png', 'pdf'))
+    assert png == generar_vista_previa(_pdf(), posiciones, formato='png')
+    assert png.startswith(b'\x89PNG')
+
+    doc = fitz.open(stream=pdf)
+    assert len(doc) == 1 and doc[0].rect == fitz.Rect(0, 0, 842, 595)
+    texto = doc[0].get_text()
+    assert '(50,50)' in texto and 'SUBSISTEMA' in texto